@@ -0,0 +1,147 @@
+"""Generate large synthetic Souffle programs for the scaling benchmarks.
+
+Usage:
+
+    python -m benchmarks.generate OUTPUT_DIR --scale 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+from collections.abc import Sequence
+from dataclasses import dataclass, fields, replace
+
+
+@dataclass
+class ProgramShape:
+    relations: int = 20
+    rules: int = 40
+    # Subset types of number, used as attribute types.
+    types: int = 5
+    # Algebraic data types, each with a few branches.
+    adts: int = 1
+    # Number of files besides the main one, which includes all of them.
+    includes: int = 1
+    components: int = 1
+    # Number of atoms in the body of each rule.
+    fan_out: int = 3
+    seed: int = 0
+
+    def scaled(self, factor: int) -> ProgramShape:
+        # The fan-out is a property of the rules, so it does not grow.
+        return replace(
+            self,
+            relations=self.relations * factor,
+            rules=self.rules * factor,
+            types=self.types * factor,
+            adts=self.adts * factor,
+            includes=self.includes * factor,
+            components=self.components * factor,
+        )
+
+
+MAIN_FILE = "main.dl"
+
+
+def get_file_name(i: int) -> str:
+    return f"part{i}.dl"
+
+
+def generate_program(shape: ProgramShape) -> dict[str, str]:
+    # Returns the code of each file of the program. Declarations and rules
+    # are spread over the files, and rules use relations from any file.
+    rng = random.Random(shape.seed)
+    file_names = [MAIN_FILE] + [get_file_name(i) for i in range(shape.includes)]
+    chunks: dict[str, list[str]] = {file_name: [] for file_name in file_names}
+    chunks[MAIN_FILE].extend(f'#include "{file_name}"' for file_name in file_names[1:])
+
+    def add(code: str) -> None:
+        chunks[rng.choice(file_names)].append(code)
+
+    type_names = ["number"] + [f"T{i}" for i in range(shape.types)]
+    for i in range(shape.types):
+        add(f".type T{i} <: number")
+
+    for i in range(shape.adts):
+        add(
+            f".type A{i} = Leaf{i} {{val: number}}\n"
+            f"    | Pair{i} {{left: A{i}, right: A{i}}}\n"
+            f"    | Empty{i} {{}}"
+        )
+        add(f".decl holds{i}(value: A{i})")
+        add(f"holds{i}($Pair{i}($Leaf{i}(1), $Empty{i}())).")
+
+    arities = [rng.randint(1, 3) for _ in range(shape.relations)]
+    for i, arity in enumerate(arities):
+        attributes = ", ".join(f"a{j}: {rng.choice(type_names)}" for j in range(arity))
+        doc = f"/// Relation number {i}.\n"
+        doc += "".join(f"/// @attribute a{j} the attribute {j}\n" for j in range(arity))
+        add(f"{doc}.decl r{i}({attributes})")
+        if rng.random() < 0.3:
+            add(f"r{i}({', '.join(str(rng.randint(0, 99)) for _ in range(arity))}).")
+        if rng.random() < 0.1:
+            add(f".output r{i}")
+
+    for _ in range(shape.rules):
+        head = rng.randrange(shape.relations)
+        variables = [f"x{j}" for j in range(arities[head])]
+        body = []
+        for _ in range(shape.fan_out):
+            atom = rng.randrange(shape.relations)
+            arguments = [rng.choice(variables + ["_"]) for _ in range(arities[atom])]
+            body.append(f"r{atom}({', '.join(arguments)})")
+        body.append(f"{variables[0]} != {rng.randint(0, 99)}")
+        add(f"r{head}({', '.join(variables)}) :-\n    {', '.join(body)}.")
+
+    for i in range(shape.components):
+        add(
+            f".comp C{i} {{\n"
+            f"    .decl inner(x: number)\n"
+            f"    inner(1).\n"
+            f"    inner(x) :- inner(y), x = y + 1, x < 10.\n"
+            f"}}\n"
+            f".init c{i} = C{i}"
+        )
+
+    return {file_name: "\n\n".join(chunk) + "\n" for file_name, chunk in chunks.items()}
+
+
+def write_program(files: dict[str, str], output_dir: str) -> None:
+    os.makedirs(output_dir, exist_ok=True)
+    for file_name, code in files.items():
+        with open(os.path.join(output_dir, file_name), "w", encoding="utf-8") as f:
+            f.write(code)
+
+
+def add_shape_arguments(parser: argparse.ArgumentParser) -> None:
+    for field in fields(ProgramShape):
+        parser.add_argument(
+            f"--{field.name.replace('_', '-')}", type=int, default=field.default
+        )
+
+
+def get_shape(args: argparse.Namespace) -> ProgramShape:
+    return ProgramShape(
+        **{field.name: getattr(args, field.name) for field in fields(ProgramShape)}
+    )
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.generate")
+    parser.add_argument("output_dir")
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=1,
+        help="Multiply every count of the shape by this factor.",
+    )
+    add_shape_arguments(parser)
+    args = parser.parse_args(argv)
+    write_program(generate_program(get_shape(args).scaled(args.scale)), args.output_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
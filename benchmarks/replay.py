@@ -0,0 +1,194 @@
+"""Replay recorded LSP sessions against an in-process language server.
+
+A trace is a JSON lines file of the messages a client sent, as recorded with
+`souffle-analyzer server --record-trace`. Occurrences of `${root}` in a trace
+are replaced with the URI of the directory given by `--root`.
+
+Usage:
+
+    python -m benchmarks.replay benchmarks/traces/editing.jsonl
+    python -m benchmarks.replay TRACE --save-baseline baseline.json
+    python -m benchmarks.replay TRACE --compare baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import time
+import tracemalloc
+from collections import defaultdict
+from collections.abc import Sequence
+from pathlib import Path
+
+from lsprotocol.types import TEXT_DOCUMENT_DID_CHANGE
+
+from souffle_analyzer import metrics
+from souffle_analyzer.server import LanguageServer
+
+# Pseudo-methods for the work the server does outside of handling a message.
+PUBLISH_DIAGNOSTICS = "(publish diagnostics)"
+INDEX_WORKSPACE = "(index workspace)"
+
+PERCENTILES = [50, 95, 99]
+
+
+def load_trace(path: str, root_uri: str) -> list[dict]:
+    messages = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                messages.append(json.loads(line.replace("${root}", root_uri)))
+    return messages
+
+
+def replay(messages: list[dict], jobs: int) -> dict[str, list[float]]:
+    # Returns the latencies in seconds of each method. Messages are handled
+    # one after the other, as the server's handling loop would. Diagnostics
+    # are published once a burst of changes ends rather than after a delay,
+    # so that the replay does not depend on the timing of the recording.
+    latencies: dict[str, list[float]] = defaultdict(list)
+    with open(os.devnull, "wb") as out_stream:
+        server = LanguageServer(
+            in_stream=io.BytesIO(), out_stream=out_stream, jobs=jobs
+        )
+        for i, message in enumerate(messages):
+            method = message.get("method", "(response)")
+            start = time.perf_counter()
+            server.process_incoming_message(message)
+            latencies[method].append(time.perf_counter() - start)
+
+            if server.indexing_thread is not None:
+                server.indexing_thread.join()
+                latencies[INDEX_WORKSPACE].append(time.perf_counter() - start)
+                server.indexing_thread = None
+
+            next_method = (
+                messages[i + 1].get("method") if i + 1 < len(messages) else None
+            )
+            if (
+                server.get_diagnostics_wait_time() is not None
+                and next_method != TEXT_DOCUMENT_DID_CHANGE
+            ):
+                start = time.perf_counter()
+                server.publish_pending_diagnostics()
+                latencies[PUBLISH_DIAGNOSTICS].append(time.perf_counter() - start)
+    return latencies
+
+
+def get_percentile(samples: list[float], percentile: int) -> float:
+    return metrics.get_percentile(sorted(samples), percentile)
+
+
+def measure_peak_memory(messages: list[dict], jobs: int) -> int:
+    tracemalloc.start()
+    try:
+        replay(messages, jobs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_benchmark(messages: list[dict], repeat: int, jobs: int) -> dict:
+    latencies: dict[str, list[float]] = defaultdict(list)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for method, samples in replay(messages, jobs).items():
+            latencies[method].extend(samples)
+    elapsed = time.perf_counter() - start
+    return {
+        "messages": len(messages),
+        "repeat": repeat,
+        "throughput": len(messages) * repeat / elapsed,
+        "peak_memory": measure_peak_memory(messages, jobs),
+        "methods": {
+            method: {
+                "count": len(samples),
+                **{
+                    f"p{percentile}": get_percentile(samples, percentile)
+                    for percentile in PERCENTILES
+                },
+            }
+            for method, samples in sorted(latencies.items())
+        },
+    }
+
+
+def format_report(report: dict) -> list[str]:
+    lines = [f"{'method':<40} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for method, stats in report["methods"].items():
+        lines.append(
+            f"{method:<40} {stats['count']:>7}"
+            + "".join(f" {stats[f'p{p}'] * 1000:>9.3f}" for p in PERCENTILES)
+        )
+    lines.append(f"throughput: {report['throughput']:.1f} messages/s")
+    lines.append(f"peak memory: {report['peak_memory'] / 2**20:.1f} MiB")
+    return lines
+
+
+def compare_reports(report: dict, baseline: dict, threshold: float) -> list[str]:
+    # Returns a line for each percentile that got slower than the baseline by
+    # more than the threshold ratio.
+    regressions = []
+    for method, stats in report["methods"].items():
+        baseline_stats = baseline["methods"].get(method)
+        if baseline_stats is None:
+            continue
+        for percentile in PERCENTILES:
+            key = f"p{percentile}"
+            if baseline_stats[key] <= 0:
+                continue
+            ratio = stats[key] / baseline_stats[key]
+            if ratio > threshold:
+                regressions.append(f"{method} {key}: {ratio:.2f}x the baseline")
+    if report["peak_memory"] > baseline["peak_memory"] * threshold:
+        ratio = report["peak_memory"] / baseline["peak_memory"]
+        regressions.append(f"peak memory: {ratio:.2f}x the baseline")
+    return regressions
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay")
+    parser.add_argument("trace", help="JSON lines file of client messages.")
+    parser.add_argument(
+        "--root",
+        default=os.getcwd(),
+        help="Directory substituted for ${root} in the trace.",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-j", "--jobs", type=int, default=1)
+    parser.add_argument("--save-baseline", help="Write the results to this file.")
+    parser.add_argument("--compare", help="Compare the results with this baseline.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Slowdown ratio over the baseline reported as a regression.",
+    )
+    args = parser.parse_args(argv)
+
+    messages = load_trace(args.trace, Path(args.root).resolve().as_uri())
+    report = run_benchmark(messages, args.repeat, args.jobs)
+    print("\n".join(format_report(report)))
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.compare is not None:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.threshold)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
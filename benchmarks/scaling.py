@@ -0,0 +1,167 @@
+"""Measure how parsing, resolution and requests scale with the program size.
+
+Programs are generated with `benchmarks.generate`, growing every count of the
+shape by each of the given factors.
+
+Usage:
+
+    python -m benchmarks.scaling --scales 1,10,100,1000 --output scaling.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from collections.abc import Sequence
+
+import lsprotocol.types as lsptypes
+
+from benchmarks.generate import (
+    ProgramShape,
+    add_shape_arguments,
+    generate_program,
+    get_shape,
+)
+from benchmarks.replay import get_percentile
+from souffle_analyzer.analysis import AnalysisContext
+from souffle_analyzer.ast import Document, Node
+from souffle_analyzer.parser import Parser
+from souffle_analyzer.visitor.resolve_declaration_visitor import (
+    ResolveDeclarationVisitor,
+)
+from souffle_analyzer.visitor.type_check_visitor import TypeInferVisitor
+
+REQUEST_SAMPLES = 50
+
+
+def count_nodes(node: Node) -> int:
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+
+def parse_files(files: dict[str, str]) -> list[Document]:
+    return [Parser(uri=uri, code=code.encode()).parse() for uri, code in files.items()]
+
+
+def find_rule_body_position(files: dict[str, str]) -> tuple[str, lsptypes.Position]:
+    # Rules are generated with their body on the line after the head.
+    for uri, code in files.items():
+        lines = code.splitlines()
+        for line_no, line in enumerate(lines):
+            if line.endswith(":-"):
+                return uri, lsptypes.Position(line=line_no + 1, character=5)
+    raise ValueError("The program has no rule.")
+
+
+def time_requests(request) -> tuple[float, float]:
+    samples = []
+    for _ in range(REQUEST_SAMPLES):
+        start = time.perf_counter()
+        request()
+        samples.append(time.perf_counter() - start)
+    return get_percentile(samples, 50), get_percentile(samples, 95)
+
+
+def measure(shape: ProgramShape) -> dict:
+    files = generate_program(shape)
+
+    start = time.perf_counter()
+    documents = parse_files(files)
+    parse_time = time.perf_counter() - start
+    node_count = sum(count_nodes(document) for document in documents)
+
+    # Parsed again, as tracing allocations slows the parser down. The
+    # documents must still be alive when the memory is measured.
+    tracemalloc.start()
+    try:
+        reparsed_documents = parse_files(files)
+        memory, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del reparsed_documents
+
+    ctx = AnalysisContext()
+    for document in documents:
+        ctx.add_document(document)
+    uris = set(ctx.stale_uris)
+    ctx.stale_uris = set()
+    start = time.perf_counter()
+    ResolveDeclarationVisitor(ctx.workspace, uris).transform()
+    resolve_time = time.perf_counter() - start
+    start = time.perf_counter()
+    TypeInferVisitor(ctx.workspace, uris).process()
+    type_infer_time = time.perf_counter() - start
+
+    uri, position = find_rule_body_position(files)
+    context = lsptypes.CompletionContext(
+        trigger_kind=lsptypes.CompletionTriggerKind.Invoked
+    )
+    completion_p50, completion_p95 = time_requests(
+        lambda: ctx.get_completion_items(uri, position, context)
+    )
+    hover_p50, hover_p95 = time_requests(lambda: ctx.hover(uri, position))
+
+    return {
+        "files": len(files),
+        "lines": sum(code.count("\n") for code in files.values()),
+        "nodes": node_count,
+        "parse_s": parse_time,
+        "resolve_s": resolve_time,
+        "type_infer_s": type_infer_time,
+        "bytes_per_node": memory / node_count,
+        "completion_p50_ms": completion_p50 * 1000,
+        "completion_p95_ms": completion_p95 * 1000,
+        "hover_p50_ms": hover_p50 * 1000,
+        "hover_p95_ms": hover_p95 * 1000,
+    }
+
+
+def format_results(results: dict[int, dict]) -> list[str]:
+    columns = list(next(iter(results.values())))
+    lines = [" ".join(f"{column:>17}" for column in ["scale", *columns])]
+    for scale, result in results.items():
+        values = [f"{scale:>17}"]
+        for column in columns:
+            value = result[column]
+            if isinstance(value, float):
+                values.append(f"{value:>17.4f}")
+            else:
+                values.append(f"{value:>17}")
+        lines.append(" ".join(values))
+    return lines
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.scaling")
+    parser.add_argument(
+        "--scales",
+        default="1,10,100",
+        help="Comma-separated factors applied to the program shape.",
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    add_shape_arguments(parser)
+    args = parser.parse_args(argv)
+
+    shape = get_shape(args)
+    results = {}
+    for scale in [int(scale) for scale in args.scales.split(",")]:
+        results[scale] = measure(shape.scaled(scale))
+        print(f"measured scale {scale}", flush=True)
+    print("\n".join(format_results(results)))
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"shape": vars(shape), "results": results}, f, indent=2)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
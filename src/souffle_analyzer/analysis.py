@@ -1,19 +1,42 @@
+import itertools
 import os
-from collections.abc import Sequence
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import CancelledError, ProcessPoolExecutor
 from dataclasses import dataclass, field
-from pathlib import Path
-from urllib.parse import urlsplit
+from urllib.parse import unquote, urlsplit
 
 import lsprotocol.types as lsptypes
+import tree_sitter as ts
 
-from souffle_analyzer.ast import BUILTIN_TYPES, ErrorNode, Position, Range, Workspace
+from souffle_analyzer.ast import (
+    BUILTIN_TYPES,
+    Document,
+    DocumentSummary,
+    Position,
+    Range,
+    RelationDeclaration,
+    Workspace,
+    get_name_sort_key,
+)
+from souffle_analyzer.completion import MAX_COMPLETION_ITEMS, find_matching_names
+from souffle_analyzer.indexer import (
+    create_process_pool,
+    find_workspace_files,
+    parse_workspace_file,
+    parse_workspace_files,
+)
 from souffle_analyzer.logging import logger
+from souffle_analyzer.metrics import metrics
 from souffle_analyzer.parser import Parser
 from souffle_analyzer.sourceutil import (
-    get_before_token,
-    get_pair_symbol_score,
+    LineIndex,
+    get_point_after_insertion,
     get_words_in_consecutive_block_at_line,
 )
+from souffle_analyzer.textbuffer import TextBuffer
 from souffle_analyzer.visitor.code_action_visitor import CodeActionVisitor
 from souffle_analyzer.visitor.definition_visitor import DefinitionVisitor
 from souffle_analyzer.visitor.find_references_visitor import (
@@ -25,68 +48,348 @@ from souffle_analyzer.visitor.resolve_declaration_visitor import (
 )
 from souffle_analyzer.visitor.simple_semantic_check_visitor import (
     SimpleSemanticCheckVisitor,
+    check_summary,
 )
 from souffle_analyzer.visitor.type_check_visitor import TypeInferVisitor
 from souffle_analyzer.visitor.type_definition_visitor import TypeDefinitionVisitor
 
+# Number of documents merged into the workspace between two resolutions while
+# the workspace is loaded.
+WORKSPACE_SYNC_BATCH_SIZE = 64
+
+BUILTIN_TYPE_NAMES = {builtin_type.name: builtin_type for builtin_type in BUILTIN_TYPES}
+BUILTIN_TYPE_SORT_KEYS = sorted(get_name_sort_key(name) for name in BUILTIN_TYPE_NAMES)
+
+# Kinds of the names in the `data` of completion items, which is read back to
+# resolve their documentation.
+RELATION_COMPLETION = "r"
+TYPE_COMPLETION = "t"
+ADT_BRANCH_COMPLETION = "b"
+
+DIRECTIVE_COMPLETION_ITEMS = [
+    lsptypes.CompletionItem(
+        label="input",
+        documentation="input directive",
+    ),
+    lsptypes.CompletionItem(
+        label="output",
+        documentation="output directive",
+    ),
+    lsptypes.CompletionItem(
+        label="decl",
+        documentation="relation declaration directive",
+    ),
+    lsptypes.CompletionItem(
+        label="type",
+        documentation="type declaration directive",
+    ),
+]
+
 
 @dataclass
 class AnalysisContext:
     workspace: Workspace = field(default_factory=lambda: Workspace())
     root_uri: str | None = field(default=None)
+    # Syntax trees of the documents opened in the editor, retained so that
+    # incremental changes only reparse the edited regions.
+    trees: dict[str, ts.Tree] = field(default_factory=dict)
+    # Documents whose references and types have to be resolved again, either
+    # because they changed or because the declarations they use did.
+    stale_uris: set[str] = field(default_factory=set)
+    # Number of processes parsing the workspace. 0 means one per CPU.
+    jobs: int = field(default=1)
+    # Directory of the on-disk cache of parsed workspace files, if enabled.
+    cache_dir: str | None = field(default=None)
+    # Unit of the position columns exchanged with the client and stored in the
+    # AST, negotiated on initialization. UTF-16 is the default of the protocol.
+    position_encoding: lsptypes.PositionEncodingKind = field(
+        default=lsptypes.PositionEncodingKind.Utf16
+    )
+    # Held while the context is read or modified, since the workspace may be
+    # loaded in the background.
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    # Diagnostics of each document, dropped whenever the document goes stale.
+    diagnostics: dict[str, list[lsptypes.Diagnostic]] = field(default_factory=dict)
+    # Diagnostics last reported for each document, with the result ID a client
+    # sends back to ask whether they changed.
+    diagnostic_reports: dict[str, tuple[str, list[lsptypes.Diagnostic]]] = field(
+        default_factory=dict
+    )
+    diagnostic_result_ids: Iterator[int] = field(default_factory=itertools.count)
+    # Prefix of the result IDs, so that an ID a client kept from an earlier run
+    # of the server never matches one of this run.
+    diagnostic_session_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    # Documentation of the relations last focused in a completion list.
+    relation_docs: dict[str, tuple[RelationDeclaration, str | None]] = field(
+        default_factory=dict
+    )
+    # Set when the server stops, so that loading the workspace stops early.
+    stopped: threading.Event = field(default_factory=threading.Event)
+    # Processes parsing the workspace while it is being loaded.
+    executor: ProcessPoolExecutor | None = field(default=None)
 
-    def load_workspace(self, root_uri: str) -> None:
+    def load_workspace(
+        self,
+        root_uri: str,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> None:
+        # Files are parsed without holding the lock, so this can run in the
+        # background while requests are being served. The summaries of the
+        # parsed files are merged in batches, and each batch is resolved
+        # before the lock is released, so requests always see a consistent
+        # workspace. Syntax trees are only built for the documents that are
+        # opened or queried.
         self.root_uri = root_uri
         logger.info("Root URI provided: %s. Started loading workspace.", self.root_uri)
         if self.root_uri is None:
             return
-        root_path = urlsplit(self.root_uri).path
-        for path in Path(root_path).rglob("*.dl"):
-            uri = Path(os.path.abspath(path)).as_uri()
-            with open(path, encoding="utf-8") as f:
-                text = f.read()
-            self.load_document(uri, text)
-        resolve_reference_visitor = ResolveDeclarationVisitor(self.workspace)
-        resolve_reference_visitor.transform()
+        paths = find_workspace_files(get_uri_path(self.root_uri))
+        logger.info("Parsing %d file(s) with jobs=%d.", len(paths), self.jobs)
+        start = time.perf_counter()
+        executor = create_process_pool(self.jobs, len(paths))
+        self.executor = executor
+        try:
+            summaries = parse_workspace_files(
+                paths, executor, self.cache_dir, self.position_encoding
+            )
+            for i, summary in enumerate(summaries, start=1):
+                if self.stopped.is_set():
+                    break
+                with self.lock:
+                    # Documents opened in the editor are more recent than
+                    # their content on disk.
+                    if summary is not None and summary.uri not in self.trees:
+                        self.add_summary(summary)
+                    if i % WORKSPACE_SYNC_BATCH_SIZE == 0 or i == len(paths):
+                        self.sync_workspace()
+                if progress is not None:
+                    progress(i, len(paths))
+        except CancelledError:
+            # The pool was shut down by `stop`.
+            pass
+        finally:
+            self.executor = None
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        if self.stopped.is_set():
+            logger.info("Stopped loading workspace.")
+            return
+        metrics.record("analysis.load_workspace", time.perf_counter() - start)
+        metrics.increment("analysis.workspace_files", len(paths))
+        logger.info("Finished loading workspace.")
+
+    def stop(self) -> None:
+        # Files waiting to be parsed are dropped rather than waited for, so
+        # that the server exits promptly while the workspace is being loaded.
+        self.stopped.set()
+        executor = self.executor
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def sync_workspace(self) -> None:
-        resolve_reference_visitor = ResolveDeclarationVisitor(self.workspace)
-        resolve_reference_visitor.transform()
-        type_check_visitor = TypeInferVisitor(self.workspace)
-        type_check_visitor.process()
+        # Edits only reparse the changed documents. Anything reading the
+        # analysis results calls this first to resolve what became stale.
+        if not self.stale_uris:
+            return
+        for uri in self.stale_uris:
+            self.diagnostics.pop(uri, None)
+        uris = self.stale_uris & self.workspace.documents.keys()
+        summary_uris = self.stale_uris & self.workspace.summaries.keys()
+        self.stale_uris = set()
+        logger.debug("resolving %d document(s)", len(uris) + len(summary_uris))
+        metrics.increment("analysis.resolved_documents", len(uris))
+        metrics.increment("analysis.resolved_summaries", len(summary_uris))
+        with metrics.timed("analysis.resolve"):
+            resolve_reference_visitor = ResolveDeclarationVisitor(self.workspace, uris)
+            resolve_reference_visitor.transform()
+            for uri in summary_uris:
+                self.workspace.resolve_summary(self.workspace.summaries[uri])
+        with metrics.timed("analysis.type_infer"):
+            type_check_visitor = TypeInferVisitor(self.workspace, uris)
+            type_check_visitor.process()
 
-    def load_document(self, uri: str, text: str) -> None:
+    def load_document(
+        self, uri: str, text: str | TextBuffer, old_tree: ts.Tree | None = None
+    ) -> ts.Tree | None:
         logger.debug("loading document %s", uri)
-        parser = Parser(uri=uri, code=text.encode())
-        document = parser.parse()
-        self.workspace.documents[uri] = document
+        code = TextBuffer.from_bytes(text.encode()) if isinstance(text, str) else text
+        parser = Parser(uri=uri, code=code, position_encoding=self.position_encoding)
+        with metrics.timed("analysis.parse"):
+            document = parser.parse(old_tree)
+        self.add_document(document)
+        return parser.tree
 
-    def sync_document(self, uri, text: str) -> list[lsptypes.Diagnostic]:
-        self.load_document(uri, text)
-        self.sync_workspace()
-        simple_semantic_check_visitor = SimpleSemanticCheckVisitor(
-            self.workspace,
-            uri,
+    def add_document(self, document: Document) -> None:
+        self.stale_uris |= self.workspace.add_document(document)
+
+    def add_summary(self, summary: DocumentSummary) -> None:
+        self.stale_uris |= self.workspace.add_summary(summary)
+
+    def build_document(self, uri: str) -> None:
+        # Builds the syntax tree of a summarized document, which is needed to
+        # answer requests about its content.
+        summary = self.workspace.summaries.get(uri)
+        if summary is None:
+            return
+        parser = Parser(
+            uri=uri,
+            code=TextBuffer.from_bytes(summary.code),
+            position_encoding=self.position_encoding,
         )
-        diagnostics = simple_semantic_check_visitor.process()
+        with metrics.timed("analysis.parse"):
+            document = parser.parse()
+        # The declarations of the tree are the same as those of the summary,
+        # which the rest of the workspace already refers to.
+        document.relation_declarations = summary.relation_declarations
+        document.type_declarations = summary.type_declarations
+        self.workspace.add_summary_tree(document)
+        self.stale_uris.add(uri)
+
+    def sync_document(
+        self, uri, text: str | TextBuffer, old_tree: ts.Tree | None = None
+    ) -> list[lsptypes.Diagnostic]:
+        self.reload_document(uri, text, old_tree)
+        return self.get_diagnostics(uri)
+
+    def reload_document(
+        self, uri: str, text: str | TextBuffer, old_tree: ts.Tree | None = None
+    ) -> None:
+        tree = self.load_document(uri, text, old_tree)
+        if tree is not None:
+            self.trees[uri] = tree
+
+    def get_diagnostics(self, uri: str) -> list[lsptypes.Diagnostic]:
+        self.sync_workspace()
+        diagnostics = self.diagnostics.get(uri)
+        summary = self.workspace.summaries.get(uri)
+        if diagnostics is None and summary is not None:
+            diagnostics = check_summary(self.workspace, summary)
+            self.diagnostics[uri] = diagnostics
+        elif diagnostics is None:
+            with metrics.timed("analysis.semantic_check"):
+                simple_semantic_check_visitor = SimpleSemanticCheckVisitor(
+                    self.workspace,
+                    uri,
+                )
+                diagnostics = simple_semantic_check_visitor.process()
+            self.diagnostics[uri] = diagnostics
+        else:
+            metrics.increment("analysis.semantic_check_cache_hits")
         return diagnostics
 
-    def open_document(self, uri: str, text: str) -> list[lsptypes.Diagnostic]:
-        return self.sync_document(uri, text)
+    def get_diagnostic_report(self, uri: str) -> tuple[str, list[lsptypes.Diagnostic]]:
+        # The result ID only changes when the diagnostics do.
+        diagnostics = self.get_diagnostics(uri)
+        report = self.diagnostic_reports.get(uri)
+        if report is None or report[1] != diagnostics:
+            result_id = next(self.diagnostic_result_ids)
+            report = (f"{self.diagnostic_session_id}:{result_id}", diagnostics)
+            self.diagnostic_reports[uri] = report
+        return report
+
+    def open_document(self, uri: str, text: str) -> None:
+        self.reload_document(uri, text)
+
+    def close_document(self, uri: str) -> None:
+        # Edits that were not saved are dropped, so the document is read from
+        # disk again.
+        self.trees.pop(uri, None)
+        self.load_file(uri)
+
+    def load_file(self, uri: str) -> None:
+        # Reads a file of the workspace from disk, unless it is opened in the
+        # editor. A file that was deleted or is outside of the workspace is
+        # removed from it, along with what other documents resolved to it.
+        if uri in self.trees:
+            return
+        if not self.is_workspace_file(uri) or not os.path.isfile(get_uri_path(uri)):
+            self.remove_document(uri)
+            return
+        summary = parse_workspace_file(
+            get_uri_path(uri), self.cache_dir, self.position_encoding
+        )
+        if summary is None:
+            self.remove_document(uri)
+            return
+        self.add_summary(summary)
+
+    def remove_document(self, uri: str) -> None:
+        self.trees.pop(uri, None)
+        self.stale_uris |= self.workspace.remove_document(uri)
+        self.diagnostics.pop(uri, None)
+        self.diagnostic_reports.pop(uri, None)
+
+    def is_workspace_file(self, uri: str) -> bool:
+        # Files of the workspace are the `.dl` files found under its root.
+        if self.root_uri is None or urlsplit(uri).scheme != "file":
+            return False
+        root_path = get_uri_path(self.root_uri)
+        path = get_uri_path(uri)
+        return (
+            path.endswith(".dl") and os.path.commonpath([root_path, path]) == root_path
+        )
 
     def update_document(
         self, uri: str, changes: Sequence[lsptypes.TextDocumentContentChangeEvent]
-    ) -> list[lsptypes.Diagnostic]:
-        diagnostics: list[lsptypes.Diagnostic] = []
+    ) -> None:
+        # The line index of the document is reused for the first change, and
+        # the following ones index the code as edited by the previous change.
+        document = self.workspace.documents.get(uri)
+        line_index = (
+            document.get_line_index()
+            if document is not None
+            else LineIndex.from_code(b"")
+        )
+        code = line_index.code
+        tree = self.trees.get(uri)
         for change in changes:
             if isinstance(change, lsptypes.TextDocumentContentChangePartial):
-                pass
+                if line_index.code is not code:
+                    line_index = LineIndex.from_code(code)
+                code = self.apply_partial_change(line_index, tree, change)
             if isinstance(change, lsptypes.TextDocumentContentChangeWholeDocument):
-                logger.debug("update document")
-                diagnostics.extend(self.sync_document(uri, change.text))
-        return diagnostics
+                code = TextBuffer.from_bytes(change.text.encode())
+                # The whole text is replaced, so there is nothing to reuse.
+                tree = None
+        logger.debug("update document")
+        self.reload_document(uri, code, tree)
+
+    def apply_partial_change(
+        self,
+        line_index: LineIndex,
+        tree: ts.Tree | None,
+        change: lsptypes.TextDocumentContentChangePartial,
+    ) -> TextBuffer:
+        code = line_index.code
+        start = change.range.start
+        end = change.range.end
+        start_byte = line_index.get_byte_offset(
+            start.line, start.character, self.position_encoding
+        )
+        old_end_byte = line_index.get_byte_offset(
+            end.line, end.character, self.position_encoding
+        )
+        inserted = change.text.encode()
+        new_end_byte = start_byte + len(inserted)
+        if tree is not None:
+            start_point = line_index.get_position(
+                start_byte, lsptypes.PositionEncodingKind.Utf8
+            )
+            tree.edit(
+                start_byte=start_byte,
+                old_end_byte=old_end_byte,
+                new_end_byte=new_end_byte,
+                start_point=start_point,
+                old_end_point=line_index.get_position(
+                    old_end_byte, lsptypes.PositionEncodingKind.Utf8
+                ),
+                new_end_point=get_point_after_insertion(start_point, inserted),
+            )
+        return code.edit(start_byte, old_end_byte, inserted)
 
     def hover(self, uri: str, position: lsptypes.Position) -> tuple[str, Range] | None:
+        self.build_document(uri)
+        self.sync_workspace()
         hover_visitor = HoverVisitor(
             workspace=self.workspace,
             uri=uri,
@@ -100,6 +403,8 @@ class AnalysisContext:
     def get_definition(
         self, uri: str, position: lsptypes.Position
     ) -> lsptypes.Location | None:
+        self.build_document(uri)
+        self.sync_workspace()
         definition_visitor = DefinitionVisitor(
             workspace=self.workspace,
             uri=uri,
@@ -116,6 +421,8 @@ class AnalysisContext:
     def get_references(
         self, uri: str, position: lsptypes.Position
     ) -> list[lsptypes.Location]:
+        self.build_document(uri)
+        self.sync_workspace()
         find_references_visitor = FindDeclarationReferencesVisitor(
             workspace=self.workspace,
             uri=uri,
@@ -126,6 +433,8 @@ class AnalysisContext:
     def get_type_definition(
         self, uri: str, position: lsptypes.Position
     ) -> lsptypes.Location | None:
+        self.build_document(uri)
+        self.sync_workspace()
         type_definition_visitor = TypeDefinitionVisitor(
             workspace=self.workspace,
             uri=uri,
@@ -145,120 +454,175 @@ class AnalysisContext:
         position: lsptypes.Position,
         context: lsptypes.CompletionContext | None,
     ) -> list[lsptypes.CompletionItem]:
-        code = self.workspace.documents[uri].code
-        code_lines = code.splitlines()
+        return list(self.get_completion_list(uri, position, context).items)
+
+    def get_completion_list(
+        self,
+        uri: str,
+        position: lsptypes.Position,
+        context: lsptypes.CompletionContext | None,
+    ) -> lsptypes.CompletionList:
+        # Completion only looks at declarations and the text around the
+        # cursor, so it does not wait for the workspace to be resolved.
+        self.build_document(uri)
+        document = self.workspace.documents[uri]
+        code = document.code
+        lexical_index = document.get_lexical_index()
+        char_no = self.get_code_point_column(document, position)
+        offset = lexical_index.get_offset(position.line, char_no)
         if context is None:
-            return []
+            return lsptypes.CompletionList(is_incomplete=False, items=[])
         if context.trigger_character == ".":
-            if position.character == 1 or (
-                position.character >= 2
-                and code_lines[position.line][position.character - 2].isspace()
-            ):
-                return [
-                    lsptypes.CompletionItem(
-                        label="input",
-                        documentation="input directive",
-                    ),
-                    lsptypes.CompletionItem(
-                        label="output",
-                        documentation="output directive",
-                    ),
-                    lsptypes.CompletionItem(
-                        label="decl",
-                        documentation="relation declaration directive",
-                    ),
-                    lsptypes.CompletionItem(
-                        label="type",
-                        documentation="type declaration directive",
-                    ),
-                ]
+            if char_no == 1 or (char_no >= 2 and code[offset - 2].isspace()):
+                return lsptypes.CompletionList(
+                    is_incomplete=False, items=DIRECTIVE_COMPLETION_ITEMS
+                )
             else:
-                return []
+                return lsptypes.CompletionList(is_incomplete=False, items=[])
         else:
-            paren_scores = get_pair_symbol_score(code, ("(", ")"))
-            curly_bracket_scores = get_pair_symbol_score(code, ("{", "}"))
-            square_bracket_scores = get_pair_symbol_score(code, ("{", "}"))
-            before_token = get_before_token(
-                code,
-                position.line,
-                position.character,
-            )
+            before_token = lexical_index.get_before_token(offset)
+            word = lexical_index.get_word_before(offset)
+            if code[offset - len(word) - 1 : offset - len(word)] == "$":
+                return self.get_adt_branch_completion_list(word)
             if before_token.endswith(":"):
-                return self.get_type_name_completion_items(uri)
-            elif (
-                # This is essentially the score on the position before this.
-                # See the property of the get_bracket_scores function.
-                paren_scores[position.line][position.character] == 0
-                and curly_bracket_scores[position.line][position.character] == 0
-                and square_bracket_scores[position.line][position.character] == 0
-                and (
-                    before_token in [".input", ".output", ".printsize"]
-                    or before_token.endswith(",")
-                    or before_token.endswith(":-")
-                    or before_token.endswith(".")
-                    or before_token.endswith(")")
-                )
+                return self.get_type_name_completion_list(word)
+            elif lexical_index.is_outside_brackets(offset) and (
+                before_token in [".input", ".output", ".printsize"]
+                or before_token.endswith(",")
+                or before_token.endswith(":-")
+                or before_token.endswith(".")
+                or before_token.endswith(")")
             ):
-                return self.get_relation_name_completion_items(uri)
+                return self.get_relation_name_completion_list(word)
             else:
-                identifiers = {
-                    *[item.label for item in self.get_type_name_completion_items(uri)],
-                    *[
-                        item.label
-                        for item in self.get_relation_name_completion_items(uri)
-                    ],
-                }
                 words = get_words_in_consecutive_block_at_line(code, position.line)
                 suggested_words = []
                 for word in words:
-                    if word not in identifiers:
+                    if not self.is_declared_name(word):
                         suggested_words.append(word)
-                return [lsptypes.CompletionItem(label=word) for word in suggested_words]
+                return lsptypes.CompletionList(
+                    is_incomplete=False,
+                    items=[
+                        lsptypes.CompletionItem(label=word) for word in suggested_words
+                    ],
+                )
 
-    def get_type_name_completion_items(self, uri: str) -> list[lsptypes.CompletionItem]:
-        completions = []
-        for builtin_type in BUILTIN_TYPES:
-            completions.append(
+    def get_code_point_column(
+        self, document: Document, position: lsptypes.Position
+    ) -> int:
+        if self.position_encoding == lsptypes.PositionEncodingKind.Utf32:
+            return position.character
+        line_index = document.get_line_index()
+        byte_column = line_index.get_byte_column(
+            position.line, position.character, self.position_encoding
+        )
+        return line_index.get_column(
+            position.line, byte_column, lsptypes.PositionEncodingKind.Utf32
+        )
+
+    def is_declared_name(self, name: str) -> bool:
+        return (
+            name in BUILTIN_TYPE_NAMES
+            or name in self.workspace.type_symbols.declarations
+            or name in self.workspace.relation_symbols.declarations
+        )
+
+    def get_type_name_completion_list(self, word: str) -> lsptypes.CompletionList:
+        names, is_incomplete = find_matching_names(
+            [BUILTIN_TYPE_SORT_KEYS, self.workspace.type_symbols.sorted_names],
+            word,
+            MAX_COMPLETION_ITEMS,
+        )
+        return lsptypes.CompletionList(
+            is_incomplete=is_incomplete,
+            items=[
                 lsptypes.CompletionItem(
-                    label=builtin_type.name,
+                    label=name,
                     kind=lsptypes.CompletionItemKind.Reference,
-                    documentation=builtin_type.doc,
-                ),
-            )
-        for type_declaration in self.workspace.documents[uri].type_declarations:
-            type_name = type_declaration.name.inner
-            if isinstance(type_name, ErrorNode):
-                continue
-            completions.append(
+                    data=[TYPE_COMPLETION, name],
+                )
+                for name in names
+            ],
+        )
+
+    def get_relation_name_completion_list(self, word: str) -> lsptypes.CompletionList:
+        names, is_incomplete = find_matching_names(
+            [self.workspace.relation_symbols.sorted_names],
+            word,
+            MAX_COMPLETION_ITEMS,
+        )
+        return lsptypes.CompletionList(
+            is_incomplete=is_incomplete,
+            items=[
                 lsptypes.CompletionItem(
-                    label=type_name.val,
+                    label=name,
                     kind=lsptypes.CompletionItemKind.Reference,
-                    documentation="type",
-                ),
-            )
-        return completions
+                    data=[RELATION_COMPLETION, name],
+                )
+                for name in names
+            ],
+        )
 
-    def get_relation_name_completion_items(
-        self, uri: str
-    ) -> list[lsptypes.CompletionItem]:
-        completions = []
-        for relation_declaration in self.workspace.documents[uri].relation_declarations:
-            relation_name = relation_declaration.name.inner
-            if isinstance(relation_name, ErrorNode):
-                continue
-            relation_declaration.get_doc()
-            completions.append(
+    def get_adt_branch_completion_list(self, word: str) -> lsptypes.CompletionList:
+        names, is_incomplete = find_matching_names(
+            [self.workspace.adt_branch_symbols.sorted_names],
+            word,
+            MAX_COMPLETION_ITEMS,
+        )
+        return lsptypes.CompletionList(
+            is_incomplete=is_incomplete,
+            items=[
                 lsptypes.CompletionItem(
-                    label=relation_name.val,
-                    kind=lsptypes.CompletionItemKind.Reference,
-                    documentation=relation_declaration.get_doc(),
-                ),
-            )
-        return completions
+                    label=name,
+                    kind=lsptypes.CompletionItemKind.EnumMember,
+                    data=[ADT_BRANCH_COMPLETION, name],
+                )
+                for name in names
+            ],
+        )
+
+    def resolve_completion_item(
+        self, item: lsptypes.CompletionItem
+    ) -> lsptypes.CompletionItem:
+        # Adds the documentation of a name offered by completion once the user
+        # focuses it. Items without a name key are returned as they are.
+        data = item.data
+        if (
+            isinstance(data, list)
+            and len(data) == 2
+            and all(isinstance(_, str) for _ in data)
+        ):
+            item.documentation = self.get_completion_documentation(data[0], data[1])
+        return item
+
+    def get_completion_documentation(self, kind: str, name: str) -> str | None:
+        if kind == TYPE_COMPLETION:
+            builtin_type = BUILTIN_TYPE_NAMES.get(name)
+            if builtin_type is not None:
+                return builtin_type.doc
+            if name in self.workspace.type_symbols.declarations:
+                return "type"
+        elif kind == ADT_BRANCH_COMPLETION:
+            if name in self.workspace.adt_branch_symbols.declarations:
+                return "ADT branch"
+        elif kind == RELATION_COMPLETION:
+            relation_declaration = self.workspace.relation_symbols.get_first(name)
+            if relation_declaration is None:
+                return None
+            # Reparsing creates new declarations, which invalidates the entry.
+            cached = self.relation_docs.get(name)
+            if cached is not None and cached[0] is relation_declaration:
+                return cached[1]
+            doc = relation_declaration.get_doc()
+            self.relation_docs[name] = (relation_declaration, doc)
+            return doc
+        return None
 
     def get_code_actions(
         self, uri: str, position: lsptypes.Position
     ) -> list[lsptypes.TextEdit] | None:
+        self.build_document(uri)
+        self.sync_workspace()
         code_actions_visitor = CodeActionVisitor(
             workspace=self.workspace,
             uri=uri,
@@ -277,3 +641,7 @@ class AnalysisContext:
             )
             for range_, new_text in result
         ]
+
+
+def get_uri_path(uri: str) -> str:
+    return os.path.abspath(unquote(urlsplit(uri).path))
@@ -3,12 +3,16 @@ from __future__ import annotations
 import os
 import re
 from abc import abstractmethod
-from dataclasses import dataclass, field
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, field, fields
 from enum import Enum
 from typing import TYPE_CHECKING, Generic, Protocol, TypeVar
 
 import lsprotocol.types as lsptypes
 
+from souffle_analyzer.sourceutil import LexicalIndex, LineIndex
+from souffle_analyzer.textbuffer import TextBuffer
+
 if TYPE_CHECKING:
     from souffle_analyzer.visitor.visitor import Visitor
 
@@ -16,22 +20,22 @@ if TYPE_CHECKING:
 T = TypeVar("T")
 
 
-@dataclass
+@dataclass(slots=True)
 class SouffleType:
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class UnresolvedType(SouffleType):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class ErroneousType(SouffleType):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class BuiltinType(SouffleType):
     name: str
     doc: str
@@ -64,7 +68,7 @@ BUILTIN_TYPES = [
 ]
 
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     line: int
     character: int
@@ -100,8 +104,13 @@ class Position:
     def __repr__(self) -> str:
         return f"{self.line}:{self.character}"
 
+    def __reduce__(self) -> tuple[type, tuple[int, int]]:
+        # Positions are the most common objects in pickled summaries, so they
+        # are stored as bare arguments rather than with their field names.
+        return Position, (self.line, self.character)
+
 
-@dataclass
+@dataclass(slots=True)
 class Range:
     start: Position
     end: Position
@@ -109,6 +118,9 @@ class Range:
     def __repr__(self) -> str:
         return f"{self.start}-{self.end}"
 
+    def __reduce__(self) -> tuple[type, tuple[Position, Position]]:
+        return Range, (self.start, self.end)
+
     @classmethod
     def from_single_position(cls, position: Position) -> Range:
         return Range(
@@ -137,7 +149,7 @@ class Range:
         return self.start <= position < self.end
 
 
-@dataclass
+@dataclass(slots=True)
 class Location:
     uri: str
     range_: Range
@@ -145,6 +157,9 @@ class Location:
     def __repr__(self) -> str:
         return f"'{self.uri}#{self.range_}'"
 
+    def __reduce__(self) -> tuple[type, tuple[str, Range]]:
+        return Location, (self.uri, self.range_)
+
     @classmethod
     def from_lsp_type(cls, loc: lsptypes.Location) -> Location:
         return cls(uri=loc.uri, range_=Range.from_lsp_type(loc.range))
@@ -153,15 +168,20 @@ class Location:
         return lsptypes.Location(uri=self.uri, range=self.range_.to_lsp_type())
 
 
-@dataclass
+@dataclass(slots=True)
 class SyntaxIssue:
     location: Location
     message: str | None
 
 
-@dataclass
+@dataclass(slots=True)
 class Node:
     location: Location
+    # Child lists are not modified once a node is built, so the sorted
+    # children are computed on first access and kept for later traversals.
+    sorted_children: list[Node] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     @property
     def range_(self) -> Range:
@@ -169,11 +189,24 @@ class Node:
 
     @property
     def children_sorted_by_range(self) -> list[Node]:
-        return sorted(self.children, key=lambda child: child.location.range_.start)
+        if self.sorted_children is None:
+            self.sorted_children = sorted(
+                self.children, key=lambda child: child.location.range_.start
+            )
+        return self.sorted_children
 
     def covers_position(self, position: Position) -> bool:
         return self.location.range_.covers(position)
 
+    def __reduce__(self) -> tuple[type, tuple]:
+        # Nodes are pickled as the arguments of their constructor, which is
+        # more compact than their fields by name, and leaves out everything
+        # computed lazily. That includes `Document.child_intervals`, which is
+        # keyed by the IDs of the nodes and would be wrong once loaded.
+        return type(self), tuple(
+            getattr(self, name) for name in get_init_field_names(type(self))
+        )
+
     @property
     def children(self) -> list[Node]:
         return []
@@ -187,7 +220,7 @@ class IsDeclarationNode(Protocol):
     def get_declaration_name_location(self) -> Location | None: ...
 
 
-@dataclass
+@dataclass(slots=True)
 class ErrorNode(Node):
     msg: str
 
@@ -199,7 +232,7 @@ class ErrorNode(Node):
         return visitor.visit_error_node(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class ValidNode(Node):
     pass
 
@@ -207,7 +240,7 @@ class ValidNode(Node):
 ValidNodeT = TypeVar("ValidNodeT", bound=ValidNode, covariant=True)
 
 
-@dataclass
+@dataclass(slots=True)
 class ResultNode(Generic[ValidNodeT], Node):
     inner: ValidNodeT | ErrorNode
 
@@ -219,7 +252,7 @@ class ResultNode(Generic[ValidNodeT], Node):
         return visitor.visit_result_node(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class Atom(ValidNode):
     name: ResultNode[RelationReferenceName]
     arguments: list[Argument]
@@ -235,9 +268,272 @@ class Atom(ValidNode):
         ]
 
 
-@dataclass
+DeclarationT = TypeVar("DeclarationT")
+
+
+class SymbolKind(Enum):
+    RELATION = "relation"
+    TYPE = "type"
+    ADT_BRANCH = "adt_branch"
+
+
+SymbolKey = tuple[SymbolKind, str]
+
+
+# Names of the constructor arguments of each class of nodes.
+INIT_FIELD_NAMES: dict[type, list[str]] = {}
+
+
+def get_init_field_names(cls: type) -> list[str]:
+    names = INIT_FIELD_NAMES.get(cls)
+    if names is None:
+        names = [cls_field.name for cls_field in fields(cls) if cls_field.init]
+        INIT_FIELD_NAMES[cls] = names
+    return names
+
+
+def get_name_sort_key(name: str) -> tuple[str, str]:
+    # Names are matched regardless of case.
+    return name.casefold(), name
+
+
+@dataclass(slots=True)
+class SymbolTable(Generic[DeclarationT]):
+    # Declarations of one kind, keyed by name and then by the URI of the
+    # document that declares them. Keeping the contributions of each document
+    # apart lets a reparsed document swap its entries out without touching
+    # the rest of the table.
+    declarations: dict[str, dict[str, list[DeclarationT]]] = field(default_factory=dict)
+    names_by_document: dict[str, set[str]] = field(default_factory=dict)
+    # Every declared name, ordered by `get_name_sort_key` for completion.
+    sorted_names: list[tuple[str, str]] = field(default_factory=list)
+
+    def set_document_declarations(
+        self,
+        uri: str,
+        declarations: list[tuple[str, DeclarationT]],
+    ) -> None:
+        by_name: dict[str, list[DeclarationT]] = {}
+        for name, declaration in declarations:
+            by_name.setdefault(name, []).append(declaration)
+        for name in self.names_by_document.get(uri, set()) - by_name.keys():
+            self.remove_entry(name, uri)
+        for name, declarations_with_name in by_name.items():
+            if name not in self.declarations:
+                insort(self.sorted_names, get_name_sort_key(name))
+            # Replacing an existing entry in place keeps the order in which
+            # documents first declared the name.
+            self.declarations.setdefault(name, {})[uri] = declarations_with_name
+        self.names_by_document[uri] = set(by_name)
+
+    def remove_document(self, uri: str) -> None:
+        for name in self.names_by_document.pop(uri, set()):
+            self.remove_entry(name, uri)
+
+    def remove_entry(self, name: str, uri: str) -> None:
+        entries = self.declarations[name]
+        del entries[uri]
+        if len(entries) == 0:
+            del self.declarations[name]
+            key = get_name_sort_key(name)
+            del self.sorted_names[bisect_left(self.sorted_names, key)]
+
+    def get_first(self, name: str) -> DeclarationT | None:
+        entries = self.declarations.get(name)
+        if not entries:
+            return None
+        return next(iter(entries.values()))[0]
+
+
+@dataclass(slots=True)
+class DependencyGraph:
+    # The symbols each document looks up while being analyzed, whether or not
+    # the lookups succeed, together with the reverse map from each symbol to
+    # the documents looking it up.
+    dependencies: dict[str, set[SymbolKey]] = field(default_factory=dict)
+    dependents: dict[SymbolKey, set[str]] = field(default_factory=dict)
+
+    def add_dependency(self, uri: str, key: SymbolKey) -> None:
+        self.dependencies.setdefault(uri, set()).add(key)
+        self.dependents.setdefault(key, set()).add(uri)
+
+    def clear_document(self, uri: str) -> None:
+        for key in self.dependencies.pop(uri, set()):
+            dependents = self.dependents[key]
+            dependents.discard(uri)
+            if len(dependents) == 0:
+                del self.dependents[key]
+
+    def get_dependents(self, keys: set[SymbolKey]) -> set[str]:
+        uris: set[str] = set()
+        for key in keys:
+            uris.update(self.dependents.get(key, set()))
+        return uris
+
+
+@dataclass(slots=True)
+class ReferenceIndex:
+    # Locations of the resolved references to each declaration, grouped by
+    # the document containing them. Declarations are keyed by identity; each
+    # entry holds on to its declaration so that the key cannot be reused by
+    # another object while the entry exists.
+    references: dict[int, tuple[object, dict[str, list[Location]]]] = field(
+        default_factory=dict
+    )
+    declarations_by_document: dict[str, set[int]] = field(default_factory=dict)
+
+    def set_document_references(
+        self,
+        uri: str,
+        references: list[tuple[object, Location]],
+    ) -> None:
+        self.remove_document(uri)
+        declaration_keys = set()
+        for declaration, location in references:
+            key = id(declaration)
+            _, locations_by_document = self.references.setdefault(
+                key, (declaration, {})
+            )
+            locations_by_document.setdefault(uri, []).append(location)
+            declaration_keys.add(key)
+        self.declarations_by_document[uri] = declaration_keys
+
+    def remove_document(self, uri: str) -> None:
+        for key in self.declarations_by_document.pop(uri, set()):
+            _, locations_by_document = self.references[key]
+            del locations_by_document[uri]
+            if len(locations_by_document) == 0:
+                del self.references[key]
+
+    def get_references(self, declaration: object) -> list[Location]:
+        entry = self.references.get(id(declaration))
+        if entry is None:
+            return []
+        locations_by_document = entry[1]
+        locations: list[Location] = []
+        # Documents are resolved in no particular order, so sort them to keep
+        # the result stable.
+        for uri in sorted(locations_by_document):
+            locations.extend(locations_by_document[uri])
+        return locations
+
+
+@dataclass(slots=True)
 class Workspace:
     documents: dict[str, Document] = field(default_factory=dict)
+    # Documents of the workspace whose syntax trees have not been built, which
+    # are resolved and checked from their summaries alone.
+    summaries: dict[str, DocumentSummary] = field(default_factory=dict)
+    relation_symbols: SymbolTable[RelationDeclaration] = field(
+        default_factory=SymbolTable
+    )
+    type_symbols: SymbolTable[TypeDeclaration] = field(default_factory=SymbolTable)
+    adt_branch_symbols: SymbolTable[AbstractDataTypeBranch] = field(
+        default_factory=SymbolTable
+    )
+    dependency_graph: DependencyGraph = field(default_factory=DependencyGraph)
+    reference_index: ReferenceIndex = field(default_factory=ReferenceIndex)
+
+    def add_document(self, document: Document) -> set[str]:
+        # Returns the URIs of the documents that need to be analyzed again.
+        uri = document.location.uri
+        self.summaries.pop(uri, None)
+        self.documents[uri] = document
+        return self.set_declarations(
+            uri, document.relation_declarations, document.type_declarations
+        )
+
+    def add_summary(self, summary: DocumentSummary) -> set[str]:
+        # Returns the URIs of the documents that need to be analyzed again.
+        self.documents.pop(summary.uri, None)
+        self.summaries[summary.uri] = summary
+        return self.set_declarations(
+            summary.uri, summary.relation_declarations, summary.type_declarations
+        )
+
+    def add_summary_tree(self, document: Document) -> None:
+        # The tree of a summarized document, built with the declarations of
+        # the summary, so the symbol tables stay as they are.
+        uri = document.location.uri
+        del self.summaries[uri]
+        self.documents[uri] = document
+
+    def set_declarations(
+        self,
+        uri: str,
+        relation_declarations: list[RelationDeclaration],
+        type_declarations: list[TypeDeclaration],
+    ) -> set[str]:
+        changed_symbols = self.get_declared_symbols(uri)
+        self.relation_symbols.set_document_declarations(
+            uri, get_relation_symbols(relation_declarations)
+        )
+        self.type_symbols.set_document_declarations(
+            uri, get_type_symbols(type_declarations)
+        )
+        self.adt_branch_symbols.set_document_declarations(
+            uri, get_adt_branch_symbols(type_declarations)
+        )
+        changed_symbols |= self.get_declared_symbols(uri)
+        # Every declaration of the reparsed document is a new object, so the
+        # documents referring to any of its names must be resolved again, not
+        # only those referring to names that were added or removed.
+        return {uri} | self.get_affected_documents(changed_symbols)
+
+    def remove_document(self, uri: str) -> set[str]:
+        # Returns the URIs of the documents that need to be analyzed again.
+        changed_symbols = self.get_declared_symbols(uri)
+        self.documents.pop(uri, None)
+        self.summaries.pop(uri, None)
+        self.relation_symbols.remove_document(uri)
+        self.type_symbols.remove_document(uri)
+        self.adt_branch_symbols.remove_document(uri)
+        self.dependency_graph.clear_document(uri)
+        self.reference_index.remove_document(uri)
+        return self.get_affected_documents(changed_symbols)
+
+    def resolve_summary(self, summary: DocumentSummary) -> None:
+        # The counterpart of `ResolveDeclarationVisitor` for a document without
+        # a syntax tree.
+        uri = summary.uri
+        self.dependency_graph.clear_document(uri)
+        references: list[tuple[object, Location]] = []
+        for reference in summary.references:
+            key = (reference.kind, reference.name)
+            self.dependency_graph.add_dependency(uri, key)
+            declaration = self.get_symbol_table(reference.kind).get_first(
+                reference.name
+            )
+            if declaration is not None:
+                references.append((declaration, Location(uri, reference.get_range())))
+        self.reference_index.set_document_references(uri, references)
+
+    def has_document(self, uri: str) -> bool:
+        return uri in self.documents or uri in self.summaries
+
+    def get_uris(self) -> list[str]:
+        return [*self.documents, *self.summaries]
+
+    def get_symbol_table(self, kind: SymbolKind) -> SymbolTable:
+        if kind == SymbolKind.RELATION:
+            return self.relation_symbols
+        if kind == SymbolKind.TYPE:
+            return self.type_symbols
+        return self.adt_branch_symbols
+
+    def get_declared_symbols(self, uri: str) -> set[SymbolKey]:
+        symbols: set[SymbolKey] = set()
+        for kind in SymbolKind:
+            for name in self.get_symbol_table(kind).names_by_document.get(uri, set()):
+                symbols.add((kind, name))
+        return symbols
+
+    def get_affected_documents(self, symbols: set[SymbolKey]) -> set[str]:
+        return {
+            uri
+            for uri in self.dependency_graph.get_dependents(symbols)
+            if self.has_document(uri)
+        }
 
     def get_relation_declaration_with_name(
         self,
@@ -246,15 +542,7 @@ class Workspace:
         if len(name.parts) != 1:
             # TODO: support more complex names
             return None
-        # TODO: optimize this to only look for "related" documents
-        for document in self.documents.values():
-            for relation_declaration in document.relation_declarations:
-                relation_declaration_name = relation_declaration.name.inner
-                if isinstance(relation_declaration_name, ErrorNode):
-                    continue
-                if relation_declaration_name.val == name.parts[0].val:
-                    return relation_declaration
-        return None
+        return self.relation_symbols.get_first(name.parts[0].val)
 
     def get_type_declaration_with_name(
         self,
@@ -263,15 +551,7 @@ class Workspace:
         if len(name.parts) != 1:
             # TODO: support more complex names
             return None
-        # TODO: optimize this to only look for "related" documents
-        for document in self.documents.values():
-            for type_declaration in document.type_declarations:
-                type_declaration_name = type_declaration.name.inner
-                if not isinstance(type_declaration_name, ValidNode):
-                    continue
-                if type_declaration_name.val == name.parts[0].val:
-                    return type_declaration
-        return None
+        return self.type_symbols.get_first(name.parts[0].val)
 
     def get_adt_branch_with_name(
         self,
@@ -280,24 +560,45 @@ class Workspace:
         if len(name.parts) != 1:
             # TODO: support more complex names
             return None
-        # TODO: optimize this to only look for "related" documents
-        for document in self.documents.values():
-            for type_declaration in document.type_declarations:
-                type_expression_node = type_declaration.expression
-                if not isinstance(
-                    type_expression_node.inner, AbstractDataTypeExpression
-                ):
-                    continue
-                type_expression = type_expression_node.inner
-                adt_branch = type_expression.get_branch_with_name(name.parts[0].val)
-                if adt_branch is not None:
-                    return adt_branch
+        return self.adt_branch_symbols.get_first(name.parts[0].val)
+
+
+@dataclass(slots=True)
+class ChildIntervals:
+    # The children of a node in range order, with their start positions and
+    # the running maximum of their end positions. Both lists are sorted, which
+    # allows finding the first child covering a position by binary search.
+    children: list[Node]
+    starts: list[tuple[int, int]]
+    max_ends: list[tuple[int, int]]
+
+    @classmethod
+    def from_node(cls, node: Node) -> ChildIntervals:
+        children = node.children_sorted_by_range
+        starts = []
+        max_ends = []
+        max_end = (-1, -1)
+        for child in children:
+            start = child.range_.start
+            end = child.range_.end
+            starts.append((start.line, start.character))
+            max_end = max(max_end, (end.line, end.character))
+            max_ends.append(max_end)
+        return cls(children=children, starts=starts, max_ends=max_ends)
+
+    def get_first_covering(self, position: tuple[int, int]) -> Node | None:
+        # Children before `i` all end at or before the position, and children
+        # after `i` start after it whenever child `i` does.
+        i = bisect_right(self.max_ends, position)
+        if i < len(self.children) and self.starts[i] <= position:
+            return self.children[i]
         return None
 
 
-@dataclass
+@dataclass(slots=True)
 class Document(ValidNode):
-    code: str
+    # Edits to a document create a new buffer, so this one never changes.
+    buffer: TextBuffer
     relation_declarations: list[RelationDeclaration]
     type_declarations: list[TypeDeclaration]
     facts: list[ResultNode[Fact]]
@@ -305,6 +606,20 @@ class Document(ValidNode):
     directives: list[Directive]
     preprocessor_directives: list[ValidNode]
     comments: list[Comment]
+    # Built lazily, one node at a time, by `get_child_covering_position`.
+    child_intervals: dict[int, ChildIntervals] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    # Built lazily by `code`, `get_line_index` and `get_lexical_index`.
+    decoded_code: str | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    line_index: LineIndex | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    lexical_index: LexicalIndex | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     @property
     def children(self) -> list[Node]:
@@ -321,8 +636,132 @@ class Document(ValidNode):
     def accept(self, visitor: Visitor[T]) -> T:
         return visitor.visit_document(self)
 
+    def get_child_covering_position(
+        self, node: Node, position: Position
+    ) -> Node | None:
+        # Equivalent to returning the first child of `children_sorted_by_range`
+        # covering the position, for a node of this document.
+        child_intervals = self.child_intervals.get(id(node))
+        if child_intervals is None:
+            child_intervals = ChildIntervals.from_node(node)
+            self.child_intervals[id(node)] = child_intervals
+        return child_intervals.get_first_covering((position.line, position.character))
+
+    @property
+    def code(self) -> str:
+        if self.decoded_code is None:
+            self.decoded_code = self.buffer.to_bytes().decode()
+        return self.decoded_code
+
+    def get_line_index(self) -> LineIndex:
+        if self.line_index is None:
+            self.line_index = LineIndex.from_code(self.buffer)
+        return self.line_index
+
+    def get_lexical_index(self) -> LexicalIndex:
+        if self.lexical_index is None:
+            self.lexical_index = LexicalIndex.from_code(self.code)
+        return self.lexical_index
+
+
+@dataclass(slots=True)
+class SymbolReference:
+    # A single-part name looked up in the symbol table of its kind. Summaries
+    # hold many of them, so positions are kept as plain numbers, which load
+    # much faster than `Range` objects.
+    kind: SymbolKind
+    name: str
+    start_line: int
+    start_character: int
+    end_line: int
+    end_character: int
+    # For the name of an atom, the number of arguments of the atom, which is
+    # checked against the declaration, and the end of the atom. An atom
+    # starts with its name.
+    arity: int | None = None
+    atom_end_line: int = 0
+    atom_end_character: int = 0
+
+    def __reduce__(self) -> tuple[type, tuple]:
+        return SymbolReference, (
+            self.kind,
+            self.name,
+            self.start_line,
+            self.start_character,
+            self.end_line,
+            self.end_character,
+            self.arity,
+            self.atom_end_line,
+            self.atom_end_character,
+        )
+
+    def get_range(self) -> Range:
+        return Range(
+            start=Position(self.start_line, self.start_character),
+            end=Position(self.end_line, self.end_character),
+        )
+
+    def get_atom_range(self) -> Range:
+        return Range(
+            start=Position(self.start_line, self.start_character),
+            end=Position(self.atom_end_line, self.atom_end_character),
+        )
+
+
+@dataclass(slots=True)
+class DocumentSummary:
+    # What the analysis of the other documents needs from a document, which
+    # is much smaller than its syntax tree. The declarations are the nodes of
+    # the tree, and become part of it when the tree is built from the code.
+    uri: str
+    code: bytes
+    relation_declarations: list[RelationDeclaration]
+    type_declarations: list[TypeDeclaration]
+    # Names referred to by the document, in the order of the syntax tree.
+    references: list[SymbolReference]
+
+
+def get_relation_symbols(
+    relation_declarations: list[RelationDeclaration],
+) -> list[tuple[str, RelationDeclaration]]:
+    symbols = []
+    for relation_declaration in relation_declarations:
+        relation_declaration_name = relation_declaration.name.inner
+        if isinstance(relation_declaration_name, ErrorNode):
+            continue
+        symbols.append((relation_declaration_name.val, relation_declaration))
+    return symbols
+
+
+def get_type_symbols(
+    type_declarations: list[TypeDeclaration],
+) -> list[tuple[str, TypeDeclaration]]:
+    symbols = []
+    for type_declaration in type_declarations:
+        type_declaration_name = type_declaration.name.inner
+        if not isinstance(type_declaration_name, ValidNode):
+            continue
+        symbols.append((type_declaration_name.val, type_declaration))
+    return symbols
+
+
+def get_adt_branch_symbols(
+    type_declarations: list[TypeDeclaration],
+) -> list[tuple[str, AbstractDataTypeBranch]]:
+    symbols = []
+    for type_declaration in type_declarations:
+        type_expression = type_declaration.expression.inner
+        if not isinstance(type_expression, AbstractDataTypeExpression):
+            continue
+        for branch in type_expression.branches:
+            branch_name = branch.name.inner
+            if isinstance(branch_name, ErrorNode):
+                continue
+            symbols.append((branch_name.val, branch))
+    return symbols
+
 
-@dataclass
+@dataclass(slots=True)
 class TypeDeclaration(SouffleType, ValidNode):
     name: ResultNode[Identifier]
     op: ResultNode[TypeDeclarationOp]
@@ -345,22 +784,22 @@ class TypeDeclaration(SouffleType, ValidNode):
         return self.name.inner.location
 
 
-@dataclass
+@dataclass(slots=True)
 class SubsetType(TypeDeclaration):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class AliasType(TypeDeclaration):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class TypeExpression(ValidNode):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class UnionTypeExpression(TypeExpression):
     types: list[TypeReference]
 
@@ -374,7 +813,7 @@ class UnionTypeExpression(TypeExpression):
         return visitor.visit_union_type_expression(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class RecordTypeExpression(TypeExpression):
     attributes: list[Attribute]
 
@@ -388,7 +827,7 @@ class RecordTypeExpression(TypeExpression):
         return visitor.visit_record_type_expression(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class AbstractDataTypeExpression(TypeExpression):
     branches: list[AbstractDataTypeBranch]
 
@@ -411,7 +850,7 @@ class AbstractDataTypeExpression(TypeExpression):
         return None
 
 
-@dataclass
+@dataclass(slots=True)
 class AbstractDataTypeBranch(ValidNode):
     name: ResultNode[Identifier]
     attributes: list[Attribute]
@@ -460,7 +899,7 @@ class AbstractDataTypeBranch(ValidNode):
         return os.linesep.join(doc_lines)
 
 
-@dataclass
+@dataclass(slots=True)
 class TypeDeclarationOp(ValidNode):
     op: TypeRelationOpKind
 
@@ -476,7 +915,7 @@ class TypeRelationOpKind(Enum):
         return f"{self.name}({self.value})"
 
 
-@dataclass
+@dataclass(slots=True)
 class Rule(ValidNode):
     heads: list[RuleHead | SubsumptionHead]
     body: ResultNode[Disjunction]
@@ -492,7 +931,7 @@ class Rule(ValidNode):
         return visitor.visit_rule(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class RuleHead(ValidNode):
     relation_references: list[ResultNode[RelationReference]]
 
@@ -506,7 +945,7 @@ class RuleHead(ValidNode):
         return visitor.visit_rule_head(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class SubsumptionHead(ValidNode):
     first: ResultNode[RelationReference]
     second: ResultNode[RelationReference]
@@ -522,7 +961,7 @@ class SubsumptionHead(ValidNode):
         return visitor.visit_subsumption_head(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class NegOp(ValidNode):
     is_neg: bool
 
@@ -530,12 +969,12 @@ class NegOp(ValidNode):
         return visitor.visit_neg_op(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class Clause(ValidNode):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class Disjunction(Clause):
     conjunctions: list[Conjunction]
 
@@ -549,7 +988,7 @@ class Disjunction(Clause):
         return visitor.visit_disjunction(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class Conjunction(ValidNode):
     clauses: list[ResultNode[Clause]]
     neg: NegOp | None
@@ -566,7 +1005,7 @@ class Conjunction(ValidNode):
         return visitor.visit_conjunction(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class RelationReferenceClause(Clause):
     relation_reference: ResultNode[RelationReference]
 
@@ -580,7 +1019,7 @@ class RelationReferenceClause(Clause):
         return visitor.visit_relation_reference_clause(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class BinaryConstraint(Clause):
     lhs: ResultNode[Argument]
     op: ResultNode[BinaryConstraintOp]
@@ -600,7 +1039,7 @@ class BinaryConstraint(Clause):
         return visitor.visit_binary_constraint(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class BinaryConstraintOp(ValidNode):
     op: str
 
@@ -608,13 +1047,13 @@ class BinaryConstraintOp(ValidNode):
         return visitor.visit_binary_constraint_op(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class RelationReference(Atom):
     def accept(self, visitor: Visitor[T]) -> T:
         return visitor.visit_relation_reference(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class RelationDeclaration(ValidNode):
     name: ResultNode[Identifier]
     attributes: list[Attribute]
@@ -730,13 +1169,13 @@ class RelationDeclaration(ValidNode):
         return os.linesep.join(doc_lines)
 
 
-@dataclass
+@dataclass(slots=True)
 class Fact(Atom):
     def accept(self, visitor: Visitor[T]) -> T:
         return visitor.visit_fact(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class DirectiveQualifier(ValidNode):
     keyword: str
 
@@ -744,7 +1183,7 @@ class DirectiveQualifier(ValidNode):
         return visitor.visit_directive_qualifier(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class Directive(ValidNode):
     qualifier: DirectiveQualifier
     relation_names: list[RelationReferenceName]
@@ -760,7 +1199,7 @@ class Directive(ValidNode):
         return visitor.visit_directive(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class Attribute(ValidNode):
     name: ResultNode[Identifier]
     type_: ResultNode[TypeReference]
@@ -803,7 +1242,7 @@ class Attribute(ValidNode):
         return os.linesep.join(doc_lines)
 
 
-@dataclass
+@dataclass(slots=True)
 class QualifiedName(ValidNode):
     parts: list[Identifier]
 
@@ -817,7 +1256,7 @@ class QualifiedName(ValidNode):
         return visitor.visit_qualified_name(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class TypeReference(TypeExpression):
     # A sequence of dot-separated names
     name: ResultNode[TypeReferenceName]
@@ -832,7 +1271,7 @@ class TypeReference(TypeExpression):
         return visitor.visit_type_reference(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class RelationReferenceName(QualifiedName):
     declaration: RelationDeclaration | None = field(default=None)
 
@@ -840,7 +1279,7 @@ class RelationReferenceName(QualifiedName):
         return visitor.visit_relation_reference_name(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class TypeReferenceName(QualifiedName):
     declaration: TypeDeclaration | None = field(default=None)
 
@@ -848,7 +1287,7 @@ class TypeReferenceName(QualifiedName):
         return visitor.visit_type_reference_name(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class BranchInitName(QualifiedName):
     declaration: AbstractDataTypeBranch | None = field(default=None)
 
@@ -856,7 +1295,7 @@ class BranchInitName(QualifiedName):
         return visitor.visit_branch_init_name(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class Identifier(ValidNode):
     val: str
 
@@ -864,19 +1303,19 @@ class Identifier(ValidNode):
         return visitor.visit_identifier(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class Argument(ValidNode):
     ty: SouffleType
     # parent: ValidNode | None
 
 
-@dataclass
+@dataclass(slots=True)
 class Constant(Argument):
     def accept(self, visitor: Visitor[T]) -> T:
         return visitor.visit_constant(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class Variable(Argument):
     name: str
 
@@ -884,7 +1323,7 @@ class Variable(Argument):
         return visitor.visit_variable(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class RecordInit(Argument):
     arguments: list[Argument]
     definition: TypeDeclaration | None = field(default=None)
@@ -899,7 +1338,7 @@ class RecordInit(Argument):
         return visitor.visit_record_init(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class BranchInit(Argument):
     name: ResultNode[BranchInitName]
     arguments: list[Argument]
@@ -915,7 +1354,7 @@ class BranchInit(Argument):
         return visitor.visit_branch_init(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class BinaryOperation(Argument):
     lhs: ResultNode[Argument]
     op: ResultNode[BinaryOperator]
@@ -933,7 +1372,7 @@ class BinaryOperation(Argument):
         return visitor.visit_binary_operation(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class BinaryOperator(ValidNode):
     op: str
 
@@ -941,17 +1380,17 @@ class BinaryOperator(ValidNode):
         return visitor.visit_binary_operator(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class StringConstant(Constant):
     val: str
 
 
-@dataclass
+@dataclass(slots=True)
 class NumberConstant(Constant):
     val: int | float
 
 
-@dataclass
+@dataclass(slots=True)
 class PreprocInclude(ValidNode):
     path: ResultNode[StringConstant]
 
@@ -963,14 +1402,14 @@ class PreprocInclude(ValidNode):
         return visitor.visit_preproc_include(self)
 
 
-@dataclass
+@dataclass(slots=True)
 class Comment(ValidNode):
     @abstractmethod
     def get_text(self) -> list[str]:
         raise NotImplementedError()
 
 
-@dataclass
+@dataclass(slots=True)
 class BlockComment(Comment):
     content: str
 
@@ -1003,7 +1442,7 @@ class BlockComment(Comment):
         return text_lines[start:end]
 
 
-@dataclass
+@dataclass(slots=True)
 class LineComment(Comment):
     content: list[str]
 
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import contextlib
+import functools
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from importlib import metadata as importlib_metadata
+
+from lsprotocol.types import PositionEncodingKind
+
+from souffle_analyzer.ast import DocumentSummary
+from souffle_analyzer.logging import get_default_log_location, logger
+from souffle_analyzer.metadata import PROG
+
+# Bump this whenever the summary or AST classes change in a way that makes
+# previously pickled summaries invalid.
+CACHE_FORMAT_VERSION = 4
+
+# Age in seconds after which a temporary file in the cache directory is taken
+# to be left behind by a writer that was killed, rather than being written.
+STALE_TEMPORARY_FILE_AGE = 60 * 60
+
+
+def get_default_cache_dir() -> str:
+    return os.path.join(os.path.dirname(get_default_log_location()), "cache")
+
+
+@functools.cache
+def get_cache_version(position_encoding: PositionEncodingKind) -> str:
+    # Positions in the cached summaries count units of the position encoding.
+    return "-".join(
+        [
+            str(CACHE_FORMAT_VERSION),
+            position_encoding.value,
+            importlib_metadata.version(PROG),
+            importlib_metadata.version("tree-sitter-souffle"),
+            f"py{sys.version_info.major}.{sys.version_info.minor}",
+        ]
+    )
+
+
+@dataclass
+class CacheEntry:
+    version: str
+    mtime_ns: int
+    size: int
+    content_hash: str
+    summary: DocumentSummary
+
+    @classmethod
+    def create(
+        cls,
+        version: str,
+        stat: os.stat_result,
+        content_hash: str,
+        summary: DocumentSummary,
+    ) -> CacheEntry:
+        return cls(
+            version=version,
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            content_hash=content_hash,
+            summary=summary,
+        )
+
+    def matches_stat(self, stat: os.stat_result) -> bool:
+        return self.mtime_ns == stat.st_mtime_ns and self.size == stat.st_size
+
+
+@dataclass
+class IndexCache:
+    # Summaries of parsed documents stored on disk, one file per document URI.
+    # Entries are pickled, so the cache directory must only be writable by the
+    # user running the server.
+    cache_dir: str
+    position_encoding: PositionEncodingKind = PositionEncodingKind.Utf16
+
+    @property
+    def version(self) -> str:
+        return get_cache_version(self.position_encoding)
+
+    def get_entry_path(self, uri: str) -> str:
+        name = hashlib.sha256(uri.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.pickle")
+
+    def read_entry(self, uri: str) -> CacheEntry | None:
+        try:
+            with open(self.get_entry_path(uri), "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.debug("Ignoring unreadable cache entry for %s: %s", uri, e)
+            return None
+        if not isinstance(entry, CacheEntry) or entry.version != self.version:
+            return None
+        return entry
+
+    def write_entry(self, uri: str, entry: CacheEntry) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file first, so that concurrent readers
+            # never see a partially written entry.
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.get_entry_path(uri))
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp_path)
+                raise
+        except (OSError, pickle.PicklingError) as e:
+            logger.warning("Could not write cache entry for %s: %s", uri, e)
+
+    def remove_stale_temporary_files(self) -> None:
+        # Temporary files that are still recent may belong to another process
+        # writing to the same cache.
+        now = time.time()
+        try:
+            with os.scandir(self.cache_dir) as dir_entries:
+                for dir_entry in dir_entries:
+                    if not dir_entry.name.endswith(".tmp"):
+                        continue
+                    age = now - dir_entry.stat().st_mtime
+                    if age > STALE_TEMPORARY_FILE_AGE:
+                        os.unlink(dir_entry.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.debug("Could not clean up cache directory: %s", e)
+
+
+def hash_content(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
@@ -0,0 +1,151 @@
+import json
+import os
+from collections.abc import Iterator
+from importlib import metadata as importlib_metadata
+from pathlib import Path
+from typing import TextIO
+
+import lsprotocol.types as lsptypes
+
+from souffle_analyzer.analysis import AnalysisContext
+from souffle_analyzer.indexer import (
+    create_process_pool,
+    find_workspace_files,
+    parse_workspace_files,
+)
+from souffle_analyzer.metadata import PROG
+
+OUTPUT_FORMATS = ["text", "jsonl", "sarif"]
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+
+def find_check_files(paths: list[str]) -> list[str]:
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            files.update(find_workspace_files(path))
+        elif os.path.isfile(path):
+            files.add(os.path.abspath(path))
+        else:
+            raise FileNotFoundError(path)
+    return sorted(files)
+
+
+def check_files(
+    paths: list[str],
+    jobs: int = 0,
+    cache_dir: str | None = None,
+) -> Iterator[tuple[str, list[lsptypes.Diagnostic]]]:
+    # Files are parsed in parallel, but declarations are resolved across all
+    # of them, so they are checked once every file has been parsed.
+    ctx = AnalysisContext(jobs=jobs, cache_dir=cache_dir)
+    executor = create_process_pool(jobs, len(paths))
+    checked_paths = []
+    try:
+        summaries = parse_workspace_files(
+            paths, executor, cache_dir, ctx.position_encoding
+        )
+        for path, summary in zip(paths, summaries):
+            # Files that cannot be read are skipped with a warning.
+            if summary is not None:
+                ctx.add_summary(summary)
+                checked_paths.append(path)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    ctx.sync_workspace()
+    for path in checked_paths:
+        yield path, ctx.get_diagnostics(Path(path).as_uri())
+
+
+def format_text_diagnostic(path: str, diagnostic: lsptypes.Diagnostic) -> str:
+    start = diagnostic.range.start
+    return f"{path}:{start.line + 1}:{start.character + 1}: {diagnostic.message}"
+
+
+def format_jsonl_diagnostic(path: str, diagnostic: lsptypes.Diagnostic) -> str:
+    return json.dumps(
+        {
+            "path": path,
+            "range": {
+                "start": {
+                    "line": diagnostic.range.start.line,
+                    "character": diagnostic.range.start.character,
+                },
+                "end": {
+                    "line": diagnostic.range.end.line,
+                    "character": diagnostic.range.end.character,
+                },
+            },
+            "severity": "error",
+            "message": diagnostic.message,
+        }
+    )
+
+
+def gen_sarif_result(path: str, diagnostic: lsptypes.Diagnostic) -> dict:
+    # SARIF lines and columns are 1-based.
+    return {
+        "level": "error",
+        "message": {"text": diagnostic.message},
+        "locations": [
+            {
+                "physicalLocation": {
+                    "artifactLocation": {"uri": Path(path).as_uri()},
+                    "region": {
+                        "startLine": diagnostic.range.start.line + 1,
+                        "startColumn": diagnostic.range.start.character + 1,
+                        "endLine": diagnostic.range.end.line + 1,
+                        "endColumn": diagnostic.range.end.character + 1,
+                    },
+                }
+            }
+        ],
+    }
+
+
+def gen_sarif_log(results: list[dict]) -> dict:
+    return {
+        "$schema": SARIF_SCHEMA,
+        "version": "2.1.0",
+        "runs": [
+            {
+                "tool": {
+                    "driver": {
+                        "name": PROG,
+                        "version": importlib_metadata.version(PROG),
+                    }
+                },
+                "results": results,
+            }
+        ],
+    }
+
+
+def run_check(
+    paths: list[str],
+    out: TextIO,
+    output_format: str = "text",
+    jobs: int = 0,
+    cache_dir: str | None = None,
+) -> int:
+    # Returns 1 if any diagnostic is reported, and 0 otherwise. Text and JSON
+    # lines output is written file by file, as the results come in.
+    files = find_check_files(paths)
+    found_errors = False
+    sarif_results = []
+    for path, diagnostics in check_files(files, jobs, cache_dir):
+        for diagnostic in diagnostics:
+            found_errors = True
+            if output_format == "text":
+                print(format_text_diagnostic(path, diagnostic), file=out)
+            elif output_format == "jsonl":
+                print(format_jsonl_diagnostic(path, diagnostic), file=out)
+            elif output_format == "sarif":
+                sarif_results.append(gen_sarif_result(path, diagnostic))
+        out.flush()
+    if output_format == "sarif":
+        json.dump(gen_sarif_log(sarif_results), out, indent=2)
+        print(file=out)
+    return 1 if found_errors else 0
@@ -0,0 +1,56 @@
+import heapq
+import itertools
+import re
+from bisect import bisect_left
+from collections.abc import Iterator
+
+# Largest number of names offered by a completion request. The list is marked
+# incomplete when more names match, so clients ask again as the user types.
+MAX_COMPLETION_ITEMS = 100
+
+
+def iter_prefix_matches(
+    sorted_names: list[tuple[str, str]], prefix: str
+) -> Iterator[tuple[str, str]]:
+    # `sorted_names` holds the sort keys of `get_name_sort_key`, and `prefix`
+    # is case-folded.
+    for key in itertools.islice(
+        sorted_names, bisect_left(sorted_names, (prefix,)), None
+    ):
+        if not key[0].startswith(prefix):
+            return
+        yield key
+
+
+def get_subsequence_pattern(pattern: str) -> re.Pattern[str]:
+    # Matches names containing the characters of the pattern in order.
+    return re.compile(".*?".join(re.escape(char) for char in pattern))
+
+
+def find_matching_names(
+    name_lists: list[list[tuple[str, str]]], pattern: str, limit: int
+) -> tuple[list[str], bool]:
+    # Returns at most `limit` names matching the typed pattern, and whether
+    # some were left out. Names starting with the pattern come first, in
+    # alphabetical order, and only take a binary search to find. The other
+    # names containing the pattern as a subsequence are only scanned for when
+    # there is room left, the most compact matches first.
+    prefix = pattern.casefold()
+    prefix_matches = heapq.merge(
+        *(iter_prefix_matches(sorted_names, prefix) for sorted_names in name_lists)
+    )
+    matches = list(itertools.islice(prefix_matches, limit + 1))
+    if len(matches) <= limit and prefix:
+        subsequence_pattern = get_subsequence_pattern(prefix)
+        scored = []
+        for sorted_names in name_lists:
+            for key in sorted_names:
+                if key[0].startswith(prefix):
+                    continue
+                match = subsequence_pattern.search(key[0])
+                if match is not None:
+                    scored.append((match.end() - match.start(), len(key[0]), key))
+        matches.extend(
+            key for *_, key in heapq.nsmallest(limit + 1 - len(matches), scored)
+        )
+    return [name for _, name in matches[:limit]], len(matches) > limit
@@ -1,3 +1,4 @@
+from collections.abc import Sequence
 from importlib import metadata as importlib_metadata
 
 from lsprotocol.types import (
@@ -6,12 +7,18 @@ from lsprotocol.types import (
     CodeActionResponse,
     CompletionOptions,
     CompletionRequest,
+    CompletionResolveRequest,
+    CompletionResolveResponse,
     CompletionResponse,
     DefinitionRequest,
     DefinitionResponse,
     DiagnosticOptions,
     DidChangeTextDocumentNotification,
+    DidChangeWatchedFilesNotification,
+    DidCloseTextDocumentNotification,
     DidOpenTextDocumentNotification,
+    DocumentDiagnosticRequest,
+    DocumentDiagnosticResponse,
     Hover,
     HoverRequest,
     HoverResponse,
@@ -21,23 +28,48 @@ from lsprotocol.types import (
     MarkupContent,
     MarkupKind,
     OptionalVersionedTextDocumentIdentifier,
-    PublishDiagnosticsNotification,
-    PublishDiagnosticsParams,
+    PositionEncodingKind,
     ReferencesRequest,
     ReferencesResponse,
+    RelatedFullDocumentDiagnosticReport,
+    RelatedUnchangedDocumentDiagnosticReport,
     ServerCapabilities,
     ServerInfo,
     TextDocumentEdit,
     TextDocumentSyncKind,
     TypeDefinitionRequest,
     TypeDefinitionResponse,
+    WorkspaceDiagnosticReport,
+    WorkspaceDiagnosticRequest,
+    WorkspaceDiagnosticResponse,
+    WorkspaceDocumentDiagnosticReport,
     WorkspaceEdit,
+    WorkspaceFullDocumentDiagnosticReport,
+    WorkspaceUnchangedDocumentDiagnosticReport,
 )
 
 from souffle_analyzer.analysis import AnalysisContext
 from souffle_analyzer.logging import logger
 from souffle_analyzer.metadata import PROG
 
+# Position encodings the server supports, the most preferred first. Columns
+# are UTF-8 bytes in the syntax tree, so that one needs no conversion.
+SUPPORTED_POSITION_ENCODINGS = [
+    PositionEncodingKind.Utf8,
+    PositionEncodingKind.Utf32,
+    PositionEncodingKind.Utf16,
+]
+
+
+def negotiate_position_encoding(
+    client_encodings: Sequence[PositionEncodingKind | str] | None,
+) -> PositionEncodingKind:
+    # Clients that do not say which encodings they support only support UTF-16.
+    for encoding in SUPPORTED_POSITION_ENCODINGS:
+        if client_encodings is not None and encoding in client_encodings:
+            return encoding
+    return PositionEncodingKind.Utf16
+
 
 def handle_initialize_request(
     request: InitializeRequest, ctx: AnalysisContext
@@ -49,15 +81,28 @@ def handle_initialize_request(
         if client_info.version is not None:
             log_msg.extend(["version", client_info.version])
     logger.info(" ".join(log_msg))
-    root_uri = request.params.root_uri
-    if root_uri is not None:
-        ctx.load_workspace(root_uri)
+    initialization_options = request.params.initialization_options
+    if isinstance(initialization_options, dict):
+        jobs = initialization_options.get("jobs")
+        if isinstance(jobs, int):
+            ctx.jobs = jobs
+    general_capabilities = request.params.capabilities.general
+    ctx.position_encoding = negotiate_position_encoding(
+        general_capabilities.position_encodings
+        if general_capabilities is not None
+        else None
+    )
+    logger.info("Using position encoding %s.", ctx.position_encoding.value)
+    # The workspace is loaded in the background once the client confirms the
+    # connection, so that initialization does not depend on its size.
+    ctx.root_uri = request.params.root_uri
 
     return InitializeResponse(
         id=request.id,
         result=InitializeResult(
             capabilities=ServerCapabilities(
-                text_document_sync=TextDocumentSyncKind.Full,
+                position_encoding=ctx.position_encoding,
+                text_document_sync=TextDocumentSyncKind.Incremental,
                 hover_provider=True,
                 definition_provider=True,
                 type_definition_provider=True,
@@ -65,11 +110,11 @@ def handle_initialize_request(
                 code_action_provider=True,
                 completion_provider=CompletionOptions(
                     trigger_characters=["."],
+                    resolve_provider=True,
                 ),
                 diagnostic_provider=DiagnosticOptions(
-                    # TODO: update this once the server support these capabilities.
-                    inter_file_dependencies=False,
-                    workspace_diagnostics=False,
+                    inter_file_dependencies=True,
+                    workspace_diagnostics=True,
                 ),
             ),
             server_info=ServerInfo(
@@ -83,28 +128,90 @@ def handle_initialize_request(
 def handle_text_document_did_open_notification(
     request: DidOpenTextDocumentNotification,
     ctx: AnalysisContext,
-) -> PublishDiagnosticsNotification:
-    uri = request.params.text_document.uri
-    diagnostics = ctx.open_document(
-        uri=uri,
+) -> None:
+    # Diagnostics are published by the server, along with those of the other
+    # documents affected by this one.
+    ctx.open_document(
+        uri=request.params.text_document.uri,
         text=request.params.text_document.text,
     )
-    return PublishDiagnosticsNotification(
-        params=PublishDiagnosticsParams(uri=uri, diagnostics=diagnostics),
-    )
 
 
 def handle_text_document_did_change_notification(
     request: DidChangeTextDocumentNotification,
     ctx: AnalysisContext,
-) -> PublishDiagnosticsNotification:
-    uri = request.params.text_document.uri
-    diagnostics = ctx.update_document(
-        uri=uri,
+) -> None:
+    # Diagnostics are published by the server once the edits settle.
+    ctx.update_document(
+        uri=request.params.text_document.uri,
         changes=request.params.content_changes,
     )
-    return PublishDiagnosticsNotification(
-        params=PublishDiagnosticsParams(uri=uri, diagnostics=diagnostics),
+
+
+def handle_text_document_did_close_notification(
+    request: DidCloseTextDocumentNotification,
+    ctx: AnalysisContext,
+) -> None:
+    ctx.close_document(request.params.text_document.uri)
+
+
+def handle_workspace_did_change_watched_files_notification(
+    request: DidChangeWatchedFilesNotification,
+    ctx: AnalysisContext,
+) -> None:
+    # Created, changed and deleted files alike are read again from disk.
+    for change in request.params.changes:
+        ctx.load_file(change.uri)
+
+
+def handle_text_document_diagnostic_request(
+    request: DocumentDiagnosticRequest,
+    ctx: AnalysisContext,
+) -> DocumentDiagnosticResponse:
+    uri = request.params.text_document.uri
+    if not ctx.workspace.has_document(uri):
+        return DocumentDiagnosticResponse(
+            id=request.id,
+            result=RelatedFullDocumentDiagnosticReport(items=[]),
+        )
+    result_id, diagnostics = ctx.get_diagnostic_report(uri)
+    if request.params.previous_result_id == result_id:
+        return DocumentDiagnosticResponse(
+            id=request.id,
+            result=RelatedUnchangedDocumentDiagnosticReport(result_id=result_id),
+        )
+    return DocumentDiagnosticResponse(
+        id=request.id,
+        result=RelatedFullDocumentDiagnosticReport(
+            items=diagnostics, result_id=result_id
+        ),
+    )
+
+
+def handle_workspace_diagnostic_request(
+    request: WorkspaceDiagnosticRequest,
+    ctx: AnalysisContext,
+) -> WorkspaceDiagnosticResponse:
+    previous_result_ids = {
+        previous_result_id.uri: previous_result_id.value
+        for previous_result_id in request.params.previous_result_ids
+    }
+    items: list[WorkspaceDocumentDiagnosticReport] = []
+    for uri in sorted(ctx.workspace.get_uris()):
+        result_id, diagnostics = ctx.get_diagnostic_report(uri)
+        if previous_result_ids.get(uri) == result_id:
+            items.append(
+                WorkspaceUnchangedDocumentDiagnosticReport(uri=uri, result_id=result_id)
+            )
+        else:
+            items.append(
+                WorkspaceFullDocumentDiagnosticReport(
+                    uri=uri, items=diagnostics, result_id=result_id
+                )
+            )
+    return WorkspaceDiagnosticResponse(
+        id=request.id,
+        result=WorkspaceDiagnosticReport(items=items),
     )
 
 
@@ -188,13 +295,23 @@ def handle_text_document_completion_request(
     position = request.params.position
     context = request.params.context
     logger.debug(request)
-    result = ctx.get_completion_items(uri, position, context)
+    result = ctx.get_completion_list(uri, position, context)
     return CompletionResponse(
         id=request.id,
         result=result,
     )
 
 
+def handle_completion_item_resolve_request(
+    request: CompletionResolveRequest,
+    ctx: AnalysisContext,
+) -> CompletionResolveResponse:
+    return CompletionResolveResponse(
+        id=request.id,
+        result=ctx.resolve_completion_item(request.params),
+    )
+
+
 def handle_text_document_code_action_request(
     request: CodeActionRequest,
     ctx: AnalysisContext,
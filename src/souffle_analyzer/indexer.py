@@ -0,0 +1,134 @@
+import functools
+import multiprocessing
+import os
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from lsprotocol.types import PositionEncodingKind
+
+from souffle_analyzer.ast import Document, DocumentSummary
+from souffle_analyzer.cache import CacheEntry, IndexCache, hash_content
+from souffle_analyzer.logging import logger
+from souffle_analyzer.parser import Parser
+from souffle_analyzer.visitor.symbol_reference_visitor import SymbolReferenceVisitor
+
+# Below this number of files, starting worker processes costs more than it saves.
+MIN_FILES_FOR_PROCESS_POOL = 32
+
+# Number of files sent to a worker at once. Files already sent are still
+# parsed when the pool is shut down, so this bounds the time it takes to stop.
+PROCESS_POOL_CHUNK_SIZE = 8
+
+
+def find_workspace_files(root_path: str) -> list[str]:
+    return [os.path.abspath(path) for path in Path(root_path).rglob("*.dl")]
+
+
+def get_worker_count(jobs: int) -> int:
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def summarize_document(document: Document, code: bytes) -> DocumentSummary:
+    return DocumentSummary(
+        uri=document.location.uri,
+        code=code,
+        relation_declarations=document.relation_declarations,
+        type_declarations=document.type_declarations,
+        references=SymbolReferenceVisitor(document).process(),
+    )
+
+
+def parse_workspace_file(
+    path: str,
+    cache_dir: str | None = None,
+    position_encoding: PositionEncodingKind = PositionEncodingKind.Utf16,
+) -> DocumentSummary | None:
+    # Returns None for a file that cannot be read, such as one deleted since
+    # the workspace was listed, so that the other files are still indexed.
+    try:
+        return read_workspace_file(path, cache_dir, position_encoding)
+    except OSError as e:
+        logger.warning("Skipping unreadable workspace file %s: %s", path, e)
+        return None
+
+
+def read_workspace_file(
+    path: str,
+    cache_dir: str | None,
+    position_encoding: PositionEncodingKind,
+) -> DocumentSummary:
+    # A cached summary is used as is when the file has the same modification
+    # time and size as when it was stored, and otherwise only if the content
+    # hash still matches.
+    uri = Path(path).as_uri()
+    cache = None if cache_dir is None else IndexCache(cache_dir, position_encoding)
+    stat = os.stat(path)
+    entry = None if cache is None else cache.read_entry(uri)
+    if entry is not None and entry.matches_stat(stat):
+        return entry.summary
+    with open(path, "rb") as f:
+        content = f.read()
+    content_hash = hash_content(content)
+    if cache is not None and entry is not None:
+        if entry.content_hash == content_hash:
+            # The file was touched without being changed.
+            cache.write_entry(
+                uri,
+                CacheEntry.create(cache.version, stat, content_hash, entry.summary),
+            )
+            return entry.summary
+    # Translate newlines like reading the file in text mode would. Invalid
+    # UTF-8 is replaced, as text sent by the client is always valid.
+    code = (
+        content.decode("utf-8", errors="replace")
+        .replace("\r\n", "\n")
+        .replace("\r", "\n")
+        .encode()
+    )
+    document = Parser(uri=uri, code=code, position_encoding=position_encoding).parse()
+    summary = summarize_document(document, code)
+    if cache is not None:
+        cache.write_entry(
+            uri, CacheEntry.create(cache.version, stat, content_hash, summary)
+        )
+    return summary
+
+
+def create_process_pool(jobs: int, file_count: int) -> ProcessPoolExecutor | None:
+    # Returns None when the files are better parsed in the calling process.
+    worker_count = min(get_worker_count(jobs), file_count)
+    if worker_count <= 1 or file_count < MIN_FILES_FOR_PROCESS_POOL:
+        return None
+    # Workers are spawned rather than forked, since the server may be running
+    # other threads when the workspace gets indexed.
+    return ProcessPoolExecutor(
+        max_workers=worker_count,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def parse_workspace_files(
+    paths: list[str],
+    executor: ProcessPoolExecutor | None,
+    cache_dir: str | None = None,
+    position_encoding: PositionEncodingKind = PositionEncodingKind.Utf16,
+) -> Iterator[DocumentSummary | None]:
+    # Summaries are yielded in the order of `paths`, with None for the files
+    # that could not be read. Given a process pool, files are parsed in its
+    # workers, which only send back the summaries. The pool is left to the
+    # caller to shut down.
+    if cache_dir is not None:
+        IndexCache(cache_dir, position_encoding).remove_stale_temporary_files()
+    parse = functools.partial(
+        parse_workspace_file,
+        cache_dir=cache_dir,
+        position_encoding=position_encoding,
+    )
+    if executor is None:
+        for path in paths:
+            yield parse(path)
+        return
+    yield from executor.map(parse, paths, chunksize=PROCESS_POOL_CHUNK_SIZE)
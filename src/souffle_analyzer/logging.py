@@ -55,7 +55,7 @@ def gen_logging_config(log_file_path: str, verbose: bool) -> dict:
         },
         "loggers": {
             "": {  # Root logger
-                "level": "DEBUG",
+                "level": "DEBUG" if verbose else "INFO",
                 "handlers": [
                     "stderr",
                     "file",
@@ -1,14 +1,17 @@
 from __future__ import annotations
 
 import argparse
+import contextlib
 import os
 import sys
 from collections.abc import Sequence
 from importlib import metadata as importlib_metadata
 
+from souffle_analyzer.cache import get_default_cache_dir
+from souffle_analyzer.check import OUTPUT_FORMATS, run_check
 from souffle_analyzer.logging import configure_logging, get_default_log_location, logger
 from souffle_analyzer.metadata import PROG
-from souffle_analyzer.server import LanguageServer
+from souffle_analyzer.server import DEFAULT_DIAGNOSTICS_DELAY, LanguageServer
 
 
 def main(argv: Sequence[str] | None = None) -> int:
@@ -37,15 +40,117 @@ def main(argv: Sequence[str] | None = None) -> int:
         default=False,
         help="Enable verbose mode.",
     )
+    server_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=0,
+        help=(
+            "Number of processes used to parse the workspace. "
+            "Defaults to one per CPU. "
+            'Overridden by the "jobs" initialization option.'
+        ),
+    )
+    server_parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=get_default_cache_dir(),
+        help="Directory where parsed workspace files are cached between runs.",
+    )
+    server_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="Do not read or write the cache of parsed workspace files.",
+    )
+    server_parser.add_argument(
+        "--diagnostics-delay",
+        type=int,
+        default=int(DEFAULT_DIAGNOSTICS_DELAY * 1000),
+        help=(
+            "Milliseconds without edits before diagnostics are published. "
+            'Overridden by the "diagnosticsDelay" initialization option.'
+        ),
+    )
+    server_parser.add_argument(
+        "--record-trace",
+        type=str,
+        default=None,
+        help="Record the messages received from the client into this file.",
+    )
+    server_parser.add_argument(
+        "--stats-interval",
+        type=float,
+        default=None,
+        help="Log the collected timings every this many seconds.",
+    )
+
+    check_parser = subparsers.add_parser(
+        "check",
+        help="Check Souffle files for errors, without starting the language server.",
+    )
+    check_parser.add_argument(
+        "paths",
+        nargs="+",
+        help="Files to check. Directories are searched for .dl files.",
+    )
+    check_parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="text",
+        help="Output format of the reported errors.",
+    )
+    check_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=0,
+        help="Number of processes used to parse the files. Defaults to one per CPU.",
+    )
+    check_parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=get_default_cache_dir(),
+        help="Directory where parsed files are cached between runs.",
+    )
+    check_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="Do not read or write the cache of parsed files.",
+    )
     args = parser.parse_args(argv)
 
     if args.command == "server":
         configure_logging(args.log_file, args.verbose)
         logger.info(f"Started {PROG} in '{os.getcwd()}'.")
-        server = LanguageServer(
-            in_stream=sys.stdin.buffer,
-            out_stream=sys.stdout.buffer,
-        )
-        server.serve()
+        with contextlib.ExitStack() as stack:
+            trace_stream = None
+            if args.record_trace is not None:
+                trace_stream = stack.enter_context(
+                    open(args.record_trace, "w", encoding="utf-8")
+                )
+            server = LanguageServer(
+                in_stream=sys.stdin.buffer,
+                out_stream=sys.stdout.buffer,
+                jobs=args.jobs,
+                cache_dir=None if args.no_cache else args.cache_dir,
+                diagnostics_delay=args.diagnostics_delay / 1000,
+                trace_stream=trace_stream,
+                stats_interval=args.stats_interval,
+            )
+            server.serve()
+    elif args.command == "check":
+        try:
+            return run_check(
+                args.paths,
+                out=sys.stdout,
+                output_format=args.format,
+                jobs=args.jobs,
+                cache_dir=None if args.no_cache else args.cache_dir,
+            )
+        except FileNotFoundError as e:
+            print(f"{PROG}: error: no such file or directory: {e}", file=sys.stderr)
+            return 2
 
     return 0
@@ -0,0 +1,105 @@
+import contextlib
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+# Number of most recent samples of each timer kept to compute percentiles.
+MAX_RECENT_SAMPLES = 1024
+
+
+@dataclass
+class TimerStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    recent: deque[float] = field(
+        default_factory=lambda: deque(maxlen=MAX_RECENT_SAMPLES)
+    )
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def to_dict(self) -> dict:
+        recent = sorted(self.recent)
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000,
+            "max_ms": self.max * 1000,
+            "p50_ms": get_percentile(recent, 50) * 1000,
+            "p95_ms": get_percentile(recent, 95) * 1000,
+        }
+
+
+@dataclass
+class MetricsRegistry:
+    # Durations and counts of what the server does, kept in memory. Recording
+    # only takes a lock and updates a few numbers, so it is always enabled.
+    timers: dict[str, TimerStats] = field(default_factory=dict)
+    counters: dict[str, int] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, name: str, seconds: float) -> None:
+        with self.lock:
+            stats = self.timers.get(name)
+            if stats is None:
+                stats = self.timers[name] = TimerStats()
+            stats.record(seconds)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "timers": {
+                    name: stats.to_dict() for name, stats in sorted(self.timers.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def format(self) -> list[str]:
+        snapshot = self.snapshot()
+        lines = []
+        for name, stats in snapshot["timers"].items():
+            lines.append(
+                f"{name}: count={stats['count']} "
+                f"total={stats['total_ms']:.1f}ms "
+                f"p50={stats['p50_ms']:.2f}ms "
+                f"p95={stats['p95_ms']:.2f}ms "
+                f"max={stats['max_ms']:.2f}ms"
+            )
+        for name, value in snapshot["counters"].items():
+            lines.append(f"{name}: {value}")
+        return lines
+
+    def reset(self) -> None:
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+
+
+def get_percentile(ordered: list[float], percentile: int) -> float:
+    # Nearest-rank percentile of sorted samples.
+    if not ordered:
+        return 0.0
+    rank = math.ceil(percentile / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+metrics = MetricsRegistry()
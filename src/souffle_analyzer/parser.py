@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import functools
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
 from typing import TypeVar
 
 import tree_sitter as ts
 import tree_sitter_souffle
+from lsprotocol.types import PositionEncodingKind
 
 from souffle_analyzer.ast import (
     AbstractDataTypeBranch,
@@ -61,36 +66,110 @@ from souffle_analyzer.ast import (
     Variable,
 )
 from souffle_analyzer.logging import logger
+from souffle_analyzer.sourceutil import LineIndex
+from souffle_analyzer.textbuffer import TextBuffer
+
+
+@functools.cache
+def get_souffle_language() -> ts.Language:
+    return ts.Language(tree_sitter_souffle.language())
+
+
+class SyntaxParserPool:
+    # A tree-sitter parser must not be used by two threads at once, so each
+    # parse borrows one from the pool and returns it afterwards. Parsers are
+    # only created when all existing ones are in use.
+    def __init__(self) -> None:
+        self.parsers: list[ts.Parser] = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self) -> Iterator[ts.Parser]:
+        with self.lock:
+            parser = self.parsers.pop() if self.parsers else None
+        if parser is None:
+            parser = ts.Parser(get_souffle_language())
+        try:
+            yield parser
+        finally:
+            with self.lock:
+                self.parsers.append(parser)
+
+
+syntax_parser_pool = SyntaxParserPool()
+
+
+def parse_syntax_tree(code: TextBuffer, old_tree: ts.Tree | None = None) -> ts.Tree:
+    # When the previous tree is given, it must already have been edited with
+    # `Tree.edit` to match `code`, so that tree-sitter can reuse the unchanged
+    # parts of it. Edited buffers are read piece by piece rather than copied.
+    source = code.original if code.is_original() else code.read
+    with syntax_parser_pool.acquire() as parser:
+        if old_tree is None:
+            return parser.parse(source)
+        return parser.parse(source, old_tree)
 
 
 class Parser:
-    def __init__(self, uri: str, code: bytes):
-        souffle_language = ts.Language(tree_sitter_souffle.language())
-        self.parser = ts.Parser(souffle_language)
+    # Builds the AST of a document from its tree-sitter syntax tree.
+    def __init__(
+        self,
+        uri: str,
+        code: bytes | TextBuffer,
+        position_encoding: PositionEncodingKind = PositionEncodingKind.Utf16,
+    ):
         self.uri = uri
-        self.code = code
-
-    def parse(self) -> Document:
-        tree = self.parser.parse(self.code)
+        self.code = (
+            code if isinstance(code, TextBuffer) else TextBuffer.from_bytes(code)
+        )
+        # Encoding of the columns of the AST positions, which are compared
+        # with the positions sent by the client as they are.
+        self.position_encoding = position_encoding
+        self.line_index: LineIndex | None = None
+        self.tree: ts.Tree | None = None
+        self.locations: dict[tuple[int, int], Location] = {}
+
+    def parse(self, old_tree: ts.Tree | None = None) -> Document:
+        return self.parse_tree(parse_syntax_tree(self.code, old_tree))
+
+    def parse_tree(self, tree: ts.Tree) -> Document:
+        self.tree = tree
         document = self.parse_document(tree.root_node, self.code)
+        self.locations.clear()
         return document
 
     def get_text(self, node: ts.Node) -> str:
-        return node.text.decode() if node.text else ""
+        # `node.text` is not available when the tree was read from a callback.
+        return self.code.get_bytes(node.start_byte, node.end_byte).decode()
 
     def get_location(self, node: ts.Node) -> Location:
-        return Location(
+        # Many AST nodes span the same source range (e.g. a `ResultNode` and
+        # the node it wraps), so they share a single `Location` object.
+        key = (node.start_byte, node.end_byte)
+        location = self.locations.get(key)
+        if location is not None:
+            return location
+        location = Location(
             uri=self.uri,
             range_=Range(
-                start=Position(
-                    line=node.start_point[0],
-                    character=node.start_point[1],
-                ),
-                end=Position(
-                    line=node.end_point[0],
-                    # Tree-sitter range-end character on a line is always exclusive.
-                    character=node.end_point[1],
-                ),
+                start=self.get_position(node.start_point),
+                # Tree-sitter range-end character on a line is always exclusive.
+                end=self.get_position(node.end_point),
+            ),
+        )
+        self.locations[key] = location
+        return location
+
+    def get_position(self, point: ts.Point) -> Position:
+        line_no, byte_column = point
+        if self.position_encoding == PositionEncodingKind.Utf8:
+            return Position(line=line_no, character=byte_column)
+        if self.line_index is None:
+            self.line_index = LineIndex.from_code(self.code)
+        return Position(
+            line=line_no,
+            character=self.line_index.get_column(
+                line_no, byte_column, self.position_encoding
             ),
         )
 
@@ -117,7 +196,7 @@ class Parser:
                 )
         return syntax_errors
 
-    def parse_document(self, node: ts.Node, code: bytes) -> Document:
+    def parse_document(self, node: ts.Node, code: TextBuffer) -> Document:
         relation_declarations = [
             self.parse_relation_declaration(_)
             for _ in self.get_children_of_type(node, "relation_decl")
@@ -162,7 +241,7 @@ class Parser:
                     relation_declaration.parse_doc_comment(comment)
 
         return Document(
-            code=code.decode(),
+            buffer=code,
             location=self.get_location(node),
             relation_declarations=relation_declarations,
             type_declarations=type_declarations,
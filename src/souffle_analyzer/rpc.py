@@ -1,49 +1,85 @@
 import json
-from typing import BinaryIO
+import logging
+import threading
+from typing import Any, BinaryIO
 
 from souffle_analyzer.logging import logger
+from souffle_analyzer.metrics import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+
+def encode_json(message: object) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(message)
+        except TypeError:
+            # Such as lone surrogates or integers wider than 64 bits, which
+            # the standard library accepts.
+            pass
+    return json.dumps(message).encode()
+
+
+def decode_json(content: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except ValueError:
+            pass
+    return json.loads(content)
 
 
 class JsonRpcNode:
     def __init__(self, in_stream: BinaryIO, out_stream: BinaryIO) -> None:
         self.in_stream = in_stream
         self.out_stream = out_stream
+        # Messages may be written from several threads.
+        self.write_lock = threading.Lock()
 
-    def read_message(self) -> dict | None:
-        content_length_prefix = b"Content-Length:"
-        content_length = None
-        content_length_prefix_pos = -1
-
+    def read_headers(self) -> dict[bytes, bytes] | None:
+        headers: dict[bytes, bytes] = {}
         while True:
-            # Read until we find the Content-Length header or EOF.
             line = self.in_stream.readline()
             if not line:  # EOF
                 return None
-            content_length_prefix_pos = line.find(content_length_prefix)
-            if content_length_prefix_pos == -1:
+            line = line.rstrip(b"\r\n")
+            if not line:
+                if headers:
+                    return headers
                 continue
+            name, sep, value = line.partition(b":")
+            if not sep:
+                if headers:
+                    logger.warning("Invalid header line while reading message.")
+                    return None
+                # Skip anything before the first header.
+                continue
+            headers[name.strip().lower()] = value.strip()
 
-            try:
-                content_length = int(
-                    line[
-                        content_length_prefix_pos + len(content_length_prefix) :
-                    ].strip()
-                )
-            except ValueError:
-                logger.warning("Content-Length value in header is not a valid integer.")
-                return None
+    def read_message(self) -> dict | None:
+        headers = self.read_headers()
+        if headers is None:
+            return None
 
-            if len(self.in_stream.readline().strip()) != 0:  # second '\r\n'
-                logger.warning("Second \\r\\n not found while reading message.")
-                return None
+        try:
+            content_length = int(headers[b"content-length"])
+        except (KeyError, ValueError):
+            logger.warning("Content-Length value in header is not a valid integer.")
+            return None
 
-            body = self.in_stream.read(content_length)
-            break
+        body = self.in_stream.read(content_length)
+        if len(body) < content_length:
+            logger.warning("Unexpected end of stream while reading message.")
+            return None
 
         # Read the message from the body
         try:
-            message = json.loads(body)
-        except json.JSONDecodeError as e:
+            with metrics.timed("rpc.deserialize"):
+                message = decode_json(body)
+        except ValueError as e:
             logger.error("Error while decoding message: %s", e)
             logger.error("body is: %s", body)
             logger.error("content length is: %s", content_length)
@@ -52,12 +88,14 @@ class JsonRpcNode:
         return message
 
     def write_message(self, message: object) -> None:
-        logger.info("Replying with message: %s.", message)
-        encoded_msg = self.encode_message(message)
-        self.out_stream.write(encoded_msg)
-        self.out_stream.flush()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Replying with message: %s.", message)
+        with metrics.timed("rpc.serialize"):
+            encoded_msg = self.encode_message(message)
+        with self.write_lock:
+            self.out_stream.write(encoded_msg)
+            self.out_stream.flush()
 
     def encode_message(self, message: object) -> bytes:
-        content = json.dumps(message)
-        message = f"Content-Length: {len(content)}\r\n\r\n{content}".encode()
-        return message
+        content = encode_json(message)
+        return b"Content-Length: %d\r\n\r\n%b" % (len(content), content)
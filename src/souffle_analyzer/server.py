@@ -1,39 +1,266 @@
-from typing import BinaryIO
+import itertools
+import json
+import queue
+import threading
+import time
+from concurrent.futures import BrokenExecutor
+from typing import BinaryIO, TextIO
 
 from lsprotocol import converters
 from lsprotocol.types import (
+    CANCEL_REQUEST,
     METHOD_TO_TYPES,
+    TEXT_DOCUMENT_COMPLETION,
+    TEXT_DOCUMENT_HOVER,
+    WORKSPACE_DID_CHANGE_WATCHED_FILES,
     CodeActionRequest,
     CompletionRequest,
+    CompletionResolveRequest,
     DefinitionRequest,
+    DiagnosticRefreshRequest,
     DidChangeTextDocumentNotification,
+    DidChangeWatchedFilesNotification,
+    DidChangeWatchedFilesRegistrationOptions,
+    DidCloseTextDocumentNotification,
     DidOpenTextDocumentNotification,
+    DocumentDiagnosticRequest,
+    FileSystemWatcher,
     HoverRequest,
     InitializedNotification,
     InitializeRequest,
+    LSPErrorCodes,
+    MessageType,
+    ProgressNotification,
+    ProgressParams,
+    PublishDiagnosticsNotification,
+    PublishDiagnosticsParams,
     ReferencesRequest,
+    Registration,
+    RegistrationParams,
+    RegistrationRequest,
+    ResponseError,
+    ResponseErrorMessage,
+    ShowMessageNotification,
+    ShowMessageParams,
     TypeDefinitionRequest,
+    WorkDoneProgressBegin,
+    WorkDoneProgressCreateParams,
+    WorkDoneProgressCreateRequest,
+    WorkDoneProgressEnd,
+    WorkDoneProgressReport,
+    WorkspaceDiagnosticRequest,
 )
 
 from souffle_analyzer import handler
 from souffle_analyzer.analysis import AnalysisContext
 from souffle_analyzer.logging import logger
+from souffle_analyzer.metadata import PROG
+from souffle_analyzer.metrics import metrics
 from souffle_analyzer.rpc import JsonRpcNode
 
+# Requests answered from the state of a document at the time they are handled.
+# An older one is dropped when a newer one for the same document is waiting.
+SUPERSEDABLE_METHODS = {TEXT_DOCUMENT_HOVER, TEXT_DOCUMENT_COMPLETION}
+
+# Custom request answered with the metrics collected by the server.
+STATS_METHOD = "$/souffle/stats"
+
+# Seconds without edits before the diagnostics of changed documents are
+# published.
+DEFAULT_DIAGNOSTICS_DELAY = 0.2
+
 
 class LanguageServer(JsonRpcNode):
-    def __init__(self, in_stream: BinaryIO, out_stream: BinaryIO):
+    def __init__(
+        self,
+        in_stream: BinaryIO,
+        out_stream: BinaryIO,
+        jobs: int = 1,
+        cache_dir: str | None = None,
+        diagnostics_delay: float = DEFAULT_DIAGNOSTICS_DELAY,
+        trace_stream: TextIO | None = None,
+        stats_interval: float | None = None,
+    ):
         self.converter = converters.get_converter()
-        self.ctx = AnalysisContext()
+        self.ctx = AnalysisContext(jobs=jobs, cache_dir=cache_dir)
+        self.client_supports_work_done_progress = False
+        # Clients pulling diagnostics ask for them when they need them, so
+        # they are not pushed to such clients.
+        self.client_supports_pull_diagnostics = False
+        self.client_supports_diagnostic_refresh = False
+        self.client_supports_watched_files_registration = False
+        self.request_ids = itertools.count()
+        self.indexing_thread: threading.Thread | None = None
+        # Messages are read on a separate thread so that cancellations are
+        # seen while earlier requests are still being handled. None marks the
+        # end of the input.
+        self.incoming_messages: queue.Queue[dict | None] = queue.Queue()
+        self.reading_thread: threading.Thread | None = None
+        # Guards the request bookkeeping shared with the reading thread.
+        self.request_lock = threading.Lock()
+        self.pending_request_ids: set[int | str] = set()
+        self.cancelled_request_ids: set[int | str] = set()
+        self.latest_request_ids: dict[tuple[str, str], int | str] = {}
+        # Diagnostics are published once no edit has arrived for
+        # `diagnostics_delay` seconds, so a burst of edits is analyzed once.
+        self.diagnostics_delay = diagnostics_delay
+        self.diagnostics_deadline: float | None = None
+        # Result IDs of the diagnostics last published for each document.
+        self.published_result_ids: dict[str, str] = {}
+        # Where incoming messages are recorded as JSON lines, to be replayed by
+        # the benchmarks.
+        self.trace_stream = trace_stream
+        # Seconds between two dumps of the metrics to the log, if enabled.
+        self.stats_interval = stats_interval
+        self.stopped = threading.Event()
         super().__init__(in_stream, out_stream)
 
     def write_server_response(self, message: object) -> None:
         self.write_message(self.converter.unstructure(message))
 
+    def write_request_response(self, response: object) -> None:
+        # A request cancelled while it was being handled gets the error
+        # response instead, as the client no longer expects a result.
+        request_id = getattr(response, "id", None)
+        if request_id is not None and self.is_request_cancelled(request_id):
+            self.write_cancelled_response(request_id)
+            return
+        self.write_server_response(response)
+
+    def write_cancelled_response(self, request_id: int | str) -> None:
+        logger.debug("Request %s was cancelled.", request_id)
+        self.write_server_response(
+            ResponseErrorMessage(
+                id=request_id,
+                error=ResponseError(
+                    code=LSPErrorCodes.RequestCancelled,
+                    message="Request cancelled.",
+                ),
+            )
+        )
+
+    def start_workspace_indexing(self) -> None:
+        if self.ctx.root_uri is None:
+            return
+        self.indexing_thread = threading.Thread(
+            target=self.index_workspace,
+            args=(self.ctx.root_uri,),
+            name="workspace-indexing",
+            daemon=True,
+        )
+        self.indexing_thread.start()
+
+    def index_workspace(self, root_uri: str) -> None:
+        token = f"{PROG}/indexing"
+        if self.client_supports_work_done_progress:
+            self.write_server_response(
+                WorkDoneProgressCreateRequest(
+                    id=f"{PROG}/{next(self.request_ids)}",
+                    params=WorkDoneProgressCreateParams(token=token),
+                )
+            )
+        last_percentage = 0
+
+        def on_progress(done: int, total: int) -> None:
+            nonlocal last_percentage
+            if not self.client_supports_work_done_progress:
+                return
+            percentage = done * 100 // total
+            if percentage == last_percentage:
+                return
+            last_percentage = percentage
+            self.report_progress(
+                token,
+                WorkDoneProgressReport(
+                    message=f"{done}/{total} files",
+                    percentage=percentage,
+                ),
+            )
+
+        # Files that cannot be read are skipped while loading the workspace,
+        # so this only fails when the workspace cannot be listed or a worker
+        # process dies. The progress is ended whatever happens.
+        try:
+            if self.client_supports_work_done_progress:
+                self.report_progress(
+                    token,
+                    WorkDoneProgressBegin(title="Indexing workspace", percentage=0),
+                )
+            self.ctx.load_workspace(root_uri, progress=on_progress)
+        except (OSError, BrokenExecutor) as e:
+            logger.exception("Error while indexing the workspace.")
+            self.write_server_response(
+                ShowMessageNotification(
+                    params=ShowMessageParams(
+                        type=MessageType.Error,
+                        message=f"Indexing the workspace failed: {e}",
+                    )
+                )
+            )
+        finally:
+            if self.client_supports_work_done_progress:
+                self.report_progress(token, WorkDoneProgressEnd())
+        if self.ctx.stopped.is_set():
+            return
+
+        # Declarations found in the workspace may change the diagnostics of
+        # the documents already opened, and the workspace may have errors.
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self) -> None:
+        # Called when the diagnostics may have changed without the client
+        # editing anything.
+        if self.client_supports_pull_diagnostics:
+            if self.client_supports_diagnostic_refresh:
+                self.write_server_response(
+                    DiagnosticRefreshRequest(id=f"{PROG}/{next(self.request_ids)}")
+                )
+            return
+        self.publish_diagnostics()
+
+    def register_watched_files(self) -> None:
+        # Files of the workspace may be changed outside of the editor.
+        self.write_server_response(
+            RegistrationRequest(
+                id=f"{PROG}/{next(self.request_ids)}",
+                params=RegistrationParams(
+                    registrations=[
+                        Registration(
+                            id=f"{PROG}/watched-files",
+                            method=WORKSPACE_DID_CHANGE_WATCHED_FILES,
+                            register_options=DidChangeWatchedFilesRegistrationOptions(
+                                watchers=[FileSystemWatcher(glob_pattern="**/*.dl")]
+                            ),
+                        )
+                    ]
+                ),
+            )
+        )
+
+    def report_progress(self, token: str, value: object) -> None:
+        self.write_server_response(
+            ProgressNotification(params=ProgressParams(token=token, value=value))
+        )
+
     def handle_incoming_message(self, message: dict) -> None:
+        if "method" not in message:
+            # A response to a request sent by the server.
+            logger.debug("Got response: %s", message)
+            return None
+
         method = message["method"]
         logger.debug('Got request with method: "%s"', method)
 
+        if method == STATS_METHOD:
+            self.write_message(
+                {
+                    "jsonrpc": "2.0",
+                    "id": message.get("id"),
+                    "result": metrics.snapshot(),
+                }
+            )
+            return None
+
         request_type = get_request_type_from_method(method)
 
         if request_type is None:
@@ -43,57 +270,264 @@ class LanguageServer(JsonRpcNode):
 
         if isinstance(request, InitializeRequest):
             response = handler.handle_initialize_request(request, self.ctx)
+            window_capabilities = request.params.capabilities.window
+            self.client_supports_work_done_progress = bool(
+                window_capabilities is not None
+                and window_capabilities.work_done_progress
+            )
+            text_document_capabilities = request.params.capabilities.text_document
+            self.client_supports_pull_diagnostics = bool(
+                text_document_capabilities is not None
+                and text_document_capabilities.diagnostic is not None
+            )
+            workspace_capabilities = request.params.capabilities.workspace
+            self.client_supports_diagnostic_refresh = bool(
+                workspace_capabilities is not None
+                and workspace_capabilities.diagnostics is not None
+                and workspace_capabilities.diagnostics.refresh_support
+            )
+            self.client_supports_watched_files_registration = bool(
+                workspace_capabilities is not None
+                and workspace_capabilities.did_change_watched_files is not None
+                and workspace_capabilities.did_change_watched_files.dynamic_registration
+            )
+            initialization_options = request.params.initialization_options
+            if isinstance(initialization_options, dict):
+                delay = initialization_options.get("diagnosticsDelay")
+                if isinstance(delay, (int, float)):
+                    self.diagnostics_delay = delay / 1000
             self.write_server_response(response)
         elif isinstance(request, InitializedNotification):
             logger.info("Connection established successfully.")
+            if self.client_supports_watched_files_registration:
+                self.register_watched_files()
+            self.start_workspace_indexing()
         elif isinstance(request, DidOpenTextDocumentNotification):
-            diagnostic_notification = (
-                handler.handle_text_document_did_open_notification(request, self.ctx)
-            )
+            handler.handle_text_document_did_open_notification(request, self.ctx)
             logger.info("Opened: %s", request.params.text_document.uri)
-            self.write_server_response(diagnostic_notification)
+            if not self.client_supports_pull_diagnostics:
+                self.publish_diagnostics()
         elif isinstance(request, DidChangeTextDocumentNotification):
-            diagnostic_notification = (
-                handler.handle_text_document_did_change_notification(request, self.ctx)
-            )
+            handler.handle_text_document_did_change_notification(request, self.ctx)
             logger.info("Changed: %s", request.params.text_document.uri)
-            self.write_server_response(diagnostic_notification)
+            if not self.client_supports_pull_diagnostics:
+                self.schedule_diagnostics()
+        elif isinstance(request, DidCloseTextDocumentNotification):
+            handler.handle_text_document_did_close_notification(request, self.ctx)
+            logger.info("Closed: %s", request.params.text_document.uri)
+            if not self.client_supports_pull_diagnostics:
+                self.publish_diagnostics()
+        elif isinstance(request, DidChangeWatchedFilesNotification):
+            handler.handle_workspace_did_change_watched_files_notification(
+                request, self.ctx
+            )
+            self.refresh_diagnostics()
+        elif isinstance(request, DocumentDiagnosticRequest):
+            self.write_request_response(
+                handler.handle_text_document_diagnostic_request(request, self.ctx)
+            )
+        elif isinstance(request, WorkspaceDiagnosticRequest):
+            self.write_request_response(
+                handler.handle_workspace_diagnostic_request(request, self.ctx)
+            )
         elif isinstance(request, HoverRequest):
             response = handler.handle_text_document_hover_request(request, self.ctx)
-            self.write_server_response(response)
+            self.write_request_response(response)
         elif isinstance(request, DefinitionRequest):
             response = handler.handle_text_document_definition_request(
                 request, self.ctx
             )
-            self.write_server_response(response)
+            self.write_request_response(response)
         elif isinstance(request, ReferencesRequest):
             response = handler.handle_text_document_reference_request(
                 request,
                 self.ctx,
             )
-            self.write_server_response(response)
+            self.write_request_response(response)
         elif isinstance(request, TypeDefinitionRequest):
             response = handler.handle_text_document_type_definition_request(
                 request, self.ctx
             )
-            self.write_server_response(response)
+            self.write_request_response(response)
         elif isinstance(request, CompletionRequest):
             response = handler.handle_text_document_completion_request(
                 request, self.ctx
             )
-            self.write_server_response(response)
+            self.write_request_response(response)
+        elif isinstance(request, CompletionResolveRequest):
+            self.write_request_response(
+                handler.handle_completion_item_resolve_request(request, self.ctx)
+            )
         elif isinstance(request, CodeActionRequest):
             response = handler.handle_text_document_code_action_request(
                 request, self.ctx
             )
-            self.write_server_response(response)
+            self.write_request_response(response)
         else:
             logger.debug('Request: "%s"', request)
 
-    def serve(self) -> None:
-        while msg := self.read_message():
+    def read_incoming_messages(self) -> None:
+        try:
+            while msg := self.read_message():
+                if self.trace_stream is not None:
+                    self.trace_stream.write(json.dumps(msg) + "\n")
+                    self.trace_stream.flush()
+                if msg.get("method") == CANCEL_REQUEST:
+                    self.cancel_request(msg["params"]["id"])
+                    continue
+                if "method" in msg and "id" in msg:
+                    self.add_pending_request(msg)
+                self.incoming_messages.put(msg)
+        finally:
+            self.incoming_messages.put(None)
+
+    def add_pending_request(self, msg: dict) -> None:
+        with self.request_lock:
+            self.pending_request_ids.add(msg["id"])
+            key = get_supersede_key(msg)
+            if key is not None:
+                self.latest_request_ids[key] = msg["id"]
+
+    def finish_pending_request(self, msg: dict) -> None:
+        with self.request_lock:
+            self.pending_request_ids.discard(msg["id"])
+            self.cancelled_request_ids.discard(msg["id"])
+            key = get_supersede_key(msg)
+            if key is not None and self.latest_request_ids.get(key) == msg["id"]:
+                del self.latest_request_ids[key]
+
+    def cancel_request(self, request_id: int | str) -> None:
+        with self.request_lock:
+            # Requests that were already answered are not remembered.
+            if request_id in self.pending_request_ids:
+                self.cancelled_request_ids.add(request_id)
+
+    def is_request_cancelled(self, request_id: int | str) -> bool:
+        with self.request_lock:
+            return request_id in self.cancelled_request_ids
+
+    def is_request_superseded(self, msg: dict) -> bool:
+        key = get_supersede_key(msg)
+        if key is None:
+            return False
+        with self.request_lock:
+            return self.latest_request_ids.get(key, msg["id"]) != msg["id"]
+
+    def process_incoming_message(self, msg: dict) -> None:
+        if "method" not in msg or "id" not in msg:
+            self.handle_timed_message(msg)
+            return
+        try:
+            if self.is_request_cancelled(msg["id"]) or self.is_request_superseded(msg):
+                self.write_cancelled_response(msg["id"])
+                return
+            self.handle_timed_message(msg)
+        finally:
+            self.finish_pending_request(msg)
+
+    def handle_timed_message(self, msg: dict) -> None:
+        method = msg.get("method", "(response)")
+        with self.ctx.lock, metrics.timed(f"message.{method}"):
             self.handle_incoming_message(msg)
 
+    def log_stats_periodically(self) -> None:
+        assert self.stats_interval is not None
+        while not self.stopped.wait(self.stats_interval):
+            logger.info("Stats:\n%s", "\n".join(metrics.format()))
+
+    def serve(self) -> None:
+        if self.stats_interval is not None:
+            threading.Thread(
+                target=self.log_stats_periodically,
+                name="stats-logging",
+                daemon=True,
+            ).start()
+        self.reading_thread = threading.Thread(
+            target=self.read_incoming_messages,
+            name="message-reading",
+            daemon=True,
+        )
+        self.reading_thread.start()
+        try:
+            self.process_incoming_messages()
+        finally:
+            self.stopped.set()
+            self.ctx.stop()
+
+    def process_incoming_messages(self) -> None:
+        while True:
+            try:
+                msg = self.incoming_messages.get(
+                    timeout=self.get_diagnostics_wait_time()
+                )
+            except queue.Empty:
+                self.publish_pending_diagnostics()
+                continue
+            if msg is None:
+                break
+            self.process_incoming_message(msg)
+            # Messages may keep arriving faster than the delay, in which case
+            # the queue never runs empty.
+            if self.get_diagnostics_wait_time() == 0:
+                self.publish_pending_diagnostics()
+
+    def schedule_diagnostics(self) -> None:
+        self.diagnostics_deadline = time.monotonic() + self.diagnostics_delay
+
+    def get_diagnostics_wait_time(self) -> float | None:
+        if self.diagnostics_deadline is None:
+            return None
+        return max(0.0, self.diagnostics_deadline - time.monotonic())
+
+    def publish_pending_diagnostics(self) -> None:
+        self.diagnostics_deadline = None
+        self.publish_diagnostics()
+
+    def publish_diagnostics(self) -> None:
+        # An edit may break documents other than the edited one, so every
+        # document whose diagnostics changed since they were last published
+        # gets them again. Diagnostics are cached per document and only
+        # recomputed for the documents affected by the edits.
+        with self.ctx.lock:
+            # Documents removed from the workspace have their diagnostics
+            # cleared.
+            for uri in list(self.published_result_ids):
+                if self.ctx.workspace.has_document(uri):
+                    continue
+                del self.published_result_ids[uri]
+                self.write_server_response(
+                    PublishDiagnosticsNotification(
+                        params=PublishDiagnosticsParams(uri=uri, diagnostics=[]),
+                    )
+                )
+            for uri in self.ctx.workspace.get_uris():
+                result_id, diagnostics = self.ctx.get_diagnostic_report(uri)
+                published_result_id = self.published_result_ids.get(uri)
+                if published_result_id == result_id:
+                    continue
+                if (
+                    published_result_id is None
+                    and not diagnostics
+                    and uri not in self.ctx.trees
+                ):
+                    # Nothing to clear for a closed document without errors.
+                    continue
+                self.published_result_ids[uri] = result_id
+                self.write_server_response(
+                    PublishDiagnosticsNotification(
+                        params=PublishDiagnosticsParams(
+                            uri=uri,
+                            diagnostics=diagnostics,
+                        ),
+                    )
+                )
+
+
+def get_supersede_key(msg: dict) -> tuple[str, str] | None:
+    if msg.get("method") not in SUPERSEDABLE_METHODS:
+        return None
+    return msg["method"], msg["params"]["textDocument"]["uri"]
+
 
 def get_lsp_types_from_method(method: str) -> tuple[type, ...] | None:
     return METHOD_TO_TYPES.get(method)
@@ -1,5 +1,14 @@
+from __future__ import annotations
+
+import itertools
 import os
 import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+
+from lsprotocol.types import PositionEncodingKind
+
+from souffle_analyzer.textbuffer import TextBuffer
 
 
 def get_consecutive_block_at_line(
@@ -32,46 +41,161 @@ def get_words_in_consecutive_block_at_line(code: str, line_no: int) -> set[str]:
     return res
 
 
-def get_pair_symbol_score(code: str, symbol_pair: tuple[str, str]) -> list[list[int]]:
-    # On each line, there is always at least a value marking the
-    # bracket score at the "beginning" of the line before
-    # any character appears.
-    # This property helps dealing with empty lines.
-    scores = []
-    cur = 0
-    code_lines = code.splitlines()
-    for line in range(len(code_lines)):
-        scores.append([cur])
-        for character in range(len(code_lines[line])):
-            if code_lines[line][character] == symbol_pair[0]:
-                cur += 1
-            elif code_lines[line][character] == symbol_pair[1]:
-                cur -= 1
-            scores[line].append(cur)
-    return scores
-
-
-def get_before_token(
-    code: str,
-    line_no: int,
-    char_no: int,
-) -> str:
-    code_lines = code.splitlines(keepends=True)
-    j = 0
-    for i in range(line_no):
-        j += len(code_lines[i])
-    j += char_no
-    j -= 1  # start by go to last character before cursor position
-
-    while j > -1 and not code[j].isspace():
-        j -= 1
-    while j > -1 and code[j].isspace():
-        j -= 1
-
-    word_chars = []
-    while j > -1 and not code[j].isspace():
-        word_chars.append(code[j])
-        j -= 1
-    word_chars.reverse()
-    word = "".join(word_chars)
-    return word
+def get_point_after_insertion(
+    start_point: tuple[int, int],
+    inserted: bytes,
+) -> tuple[int, int]:
+    # Tree-sitter points are (row, byte column) pairs.
+    newline_count = inserted.count(b"\n")
+    if newline_count == 0:
+        return start_point[0], start_point[1] + len(inserted)
+    return start_point[0] + newline_count, len(inserted) - inserted.rfind(b"\n") - 1
+
+
+BRACKET_PAIRS = [("(", ")"), ("{", "}"), ("[", "]")]
+
+
+@dataclass(slots=True)
+class BracketDepths:
+    # Offsets of the brackets of one kind, and the depth after each of them.
+    offsets: list[int]
+    depths: list[int]
+
+    @classmethod
+    def from_code(cls, code: str, pair: tuple[str, str]) -> BracketDepths:
+        opening, closing = pair
+        offsets = []
+        steps = []
+        for match in re.finditer(f"[{re.escape(opening)}{re.escape(closing)}]", code):
+            offsets.append(match.start())
+            steps.append(1 if match.group() == opening else -1)
+        return cls(offsets=offsets, depths=list(itertools.accumulate(steps)))
+
+    def get_depth(self, offset: int) -> int:
+        # Depth before the character at the offset.
+        i = bisect_left(self.offsets, offset)
+        return self.depths[i - 1] if i > 0 else 0
+
+
+@dataclass(slots=True)
+class LexicalIndex:
+    # Built once per parse of a document and queried on each completion
+    # request. Offsets count code points from the start of the code.
+    code: str
+    line_starts: list[int]
+    brackets: dict[str, BracketDepths]
+
+    @classmethod
+    def from_code(cls, code: str) -> LexicalIndex:
+        line_starts = [0]
+        line_starts.extend(match.end() for match in re.finditer("\n", code))
+        return cls(
+            code=code,
+            line_starts=line_starts,
+            brackets={
+                pair[0]: BracketDepths.from_code(code, pair) for pair in BRACKET_PAIRS
+            },
+        )
+
+    def get_offset(self, line_no: int, char_no: int) -> int:
+        if line_no >= len(self.line_starts):
+            return len(self.code)
+        return min(self.line_starts[line_no] + char_no, len(self.code))
+
+    def is_outside_brackets(self, offset: int) -> bool:
+        return all(
+            brackets.get_depth(offset) == 0 for brackets in self.brackets.values()
+        )
+
+    def get_word_before(self, offset: int) -> str:
+        # The part of the identifier the offset is in that is before it.
+        code = self.code
+        j = offset
+        while j > 0 and (code[j - 1].isalnum() or code[j - 1] == "_"):
+            j -= 1
+        return code[j:offset]
+
+    def get_before_token(self, offset: int) -> str:
+        # The whitespace-separated word before the one the offset is in.
+        code = self.code
+        j = offset - 1  # start by go to last character before cursor position
+        while j > -1 and not code[j].isspace():
+            j -= 1
+        while j > -1 and code[j].isspace():
+            j -= 1
+        end = j + 1
+        while j > -1 and not code[j].isspace():
+            j -= 1
+        return code[j + 1 : end]
+
+
+@dataclass(slots=True)
+class LineIndex:
+    # Byte offsets at which the lines of the code start, used to convert
+    # between byte offsets, tree-sitter points and positions whose columns
+    # count units of a position encoding. Columns are in UTF-8 bytes in
+    # tree-sitter, so nothing is converted for UTF-8 or ASCII-only code.
+    code: TextBuffer
+    line_starts: list[int]
+    is_ascii: bool
+
+    @classmethod
+    def from_code(cls, code: bytes | TextBuffer) -> LineIndex:
+        if isinstance(code, bytes):
+            code = TextBuffer.from_bytes(code)
+        return cls(
+            code=code, line_starts=code.get_line_starts(), is_ascii=code.is_ascii()
+        )
+
+    def get_line(self, line_no: int) -> bytes:
+        # The line without its newline, or nothing past the end of the code.
+        if line_no >= len(self.line_starts):
+            return b""
+        start = self.line_starts[line_no]
+        if line_no + 1 < len(self.line_starts):
+            return self.code.get_bytes(start, self.line_starts[line_no + 1] - 1)
+        return self.code.get_bytes(start, len(self.code))
+
+    def get_byte_column(
+        self, line_no: int, column: int, encoding: PositionEncodingKind
+    ) -> int:
+        line = self.get_line(line_no)
+        if self.is_ascii or encoding == PositionEncodingKind.Utf8 or line.isascii():
+            return min(column, len(line))
+        text = line.decode(errors="replace")
+        if encoding == PositionEncodingKind.Utf16:
+            # A column in the middle of a surrogate pair is moved before it.
+            utf16 = text.encode("utf-16-le")[: 2 * column]
+            text = utf16.decode("utf-16-le", errors="ignore")
+        else:
+            text = text[:column]
+        return len(text.encode())
+
+    def get_column(
+        self, line_no: int, byte_column: int, encoding: PositionEncodingKind
+    ) -> int:
+        if self.is_ascii or encoding == PositionEncodingKind.Utf8:
+            return byte_column
+        prefix = self.get_line(line_no)[:byte_column]
+        if prefix.isascii():
+            return len(prefix)
+        text = prefix.decode(errors="replace")
+        if encoding == PositionEncodingKind.Utf16:
+            return len(text.encode("utf-16-le")) // 2
+        return len(text)
+
+    def get_byte_offset(
+        self, line_no: int, column: int, encoding: PositionEncodingKind
+    ) -> int:
+        if line_no >= len(self.line_starts):
+            return len(self.code)
+        return self.line_starts[line_no] + self.get_byte_column(
+            line_no, column, encoding
+        )
+
+    def get_position(
+        self, byte_offset: int, encoding: PositionEncodingKind
+    ) -> tuple[int, int]:
+        line_no = bisect_right(self.line_starts, byte_offset) - 1
+        byte_column = byte_offset - self.line_starts[line_no]
+        return line_no, self.get_column(line_no, byte_column, encoding)
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import itertools
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+
+# Above this number of pieces, an edit copies the text into a single piece
+# again, so that lookups stay fast however long a document is edited.
+MAX_PIECES = 512
+
+# Largest slice handed to tree-sitter at once, so that reading a few tokens
+# of a large piece does not copy all of it.
+READ_CHUNK_SIZE = 1 << 16
+
+NEWLINE = re.compile(b"\n")
+
+
+@dataclass(slots=True, frozen=True)
+class Piece:
+    # Range of either the original text or the added text.
+    in_added: bool
+    start: int
+    end: int
+    is_ascii: bool
+
+    def slice(self, start: int, end: int) -> Piece:
+        return Piece(
+            in_added=self.in_added,
+            start=self.start + start,
+            end=self.start + end,
+            is_ascii=self.is_ascii,
+        )
+
+
+@dataclass(slots=True)
+class TextBuffer:
+    # UTF-8 text of a document as a piece table over the original text and a
+    # buffer of all the text inserted since. Inserted text is only ever
+    # appended to the added buffer, which edits share, so an edit does not
+    # copy the text, and the buffers it is derived from remain unchanged.
+    original: bytes
+    added: bytearray
+    pieces: list[Piece]
+    # Offset in the text at which each piece starts.
+    piece_starts: list[int]
+    length: int
+
+    @classmethod
+    def from_bytes(cls, code: bytes) -> TextBuffer:
+        pieces = [Piece(False, 0, len(code), code.isascii())] if code else []
+        return cls(
+            original=code,
+            added=bytearray(),
+            pieces=pieces,
+            piece_starts=[0] * len(pieces),
+            length=len(code),
+        )
+
+    @classmethod
+    def from_pieces(
+        cls, original: bytes, added: bytearray, pieces: list[Piece]
+    ) -> TextBuffer:
+        lengths = [piece.end - piece.start for piece in pieces]
+        return cls(
+            original=original,
+            added=added,
+            pieces=pieces,
+            piece_starts=list(itertools.accumulate(lengths, initial=0))[:-1],
+            length=sum(lengths),
+        )
+
+    def __len__(self) -> int:
+        return self.length
+
+    def get_source(self, piece: Piece) -> bytes | bytearray:
+        return self.added if piece.in_added else self.original
+
+    def get_pieces(self, start: int, end: int) -> list[Piece]:
+        # The pieces covering the range, trimmed to it.
+        pieces = []
+        i = max(bisect_right(self.piece_starts, start) - 1, 0)
+        while i < len(self.pieces) and self.piece_starts[i] < end:
+            piece = self.pieces[i]
+            piece_start = self.piece_starts[i]
+            piece_length = piece.end - piece.start
+            pieces.append(
+                piece.slice(
+                    max(start - piece_start, 0),
+                    min(end - piece_start, piece_length),
+                )
+            )
+            i += 1
+        return [piece for piece in pieces if piece.end > piece.start]
+
+    def get_bytes(self, start: int, end: int) -> bytes:
+        return b"".join(
+            self.get_source(piece)[piece.start : piece.end]
+            for piece in self.get_pieces(start, end)
+        )
+
+    def is_original(self) -> bool:
+        # Pieces of the original text stay in order and are only ever
+        # shortened, so all of it is left if nothing else was added.
+        return self.length == len(self.original) and not any(
+            piece.in_added for piece in self.pieces
+        )
+
+    def to_bytes(self) -> bytes:
+        if self.is_original():
+            return self.original
+        return self.get_bytes(0, self.length)
+
+    def read(self, byte_offset: int, point: tuple[int, int] | None = None) -> bytes:
+        # Callback for `tree_sitter.Parser.parse`, returning the text from the
+        # offset up to the end of the piece it is in.
+        if byte_offset >= self.length:
+            return b""
+        i = bisect_right(self.piece_starts, byte_offset) - 1
+        piece = self.pieces[i]
+        start = piece.start + byte_offset - self.piece_starts[i]
+        end = min(piece.end, start + READ_CHUNK_SIZE)
+        return bytes(self.get_source(piece)[start:end])
+
+    def is_ascii(self) -> bool:
+        return all(piece.is_ascii for piece in self.pieces)
+
+    def get_line_starts(self) -> list[int]:
+        line_starts = [0]
+        for piece_start, piece in zip(self.piece_starts, self.pieces):
+            offset = piece_start - piece.start
+            line_starts.extend(
+                offset + match.end()
+                for match in NEWLINE.finditer(
+                    self.get_source(piece), piece.start, piece.end
+                )
+            )
+        return line_starts
+
+    def edit(self, start: int, end: int, inserted: bytes) -> TextBuffer:
+        # Returns the buffer with the bytes in the range replaced.
+        before = self.get_pieces(0, start)
+        after = self.get_pieces(end, self.length)
+        if inserted:
+            added_start = len(self.added)
+            self.added.extend(inserted)
+            piece = Piece(True, added_start, len(self.added), inserted.isascii())
+            if before and before[-1].in_added and before[-1].end == added_start:
+                # Typing appends to the piece inserted by the previous edit.
+                last = before.pop()
+                piece = Piece(
+                    True, last.start, piece.end, last.is_ascii and piece.is_ascii
+                )
+            before.append(piece)
+        buffer = TextBuffer.from_pieces(self.original, self.added, before + after)
+        if len(buffer.pieces) > MAX_PIECES:
+            return TextBuffer.from_bytes(buffer.to_bytes())
+        return buffer
@@ -40,7 +40,9 @@ class CodeActionVisitor(Visitor[CodeActionResult]):
         return [(Range(pos, pos), os.linesep.join(doc_text_template))]
 
     def generic_visit(self, node: Node) -> CodeActionResult:
-        for child in node.children_sorted_by_range:
-            if child.covers_position(self.position):
-                return child.accept(self)
-        return None
+        child = self.workspace.documents[self.uri].get_child_covering_position(
+            node, self.position
+        )
+        if child is None:
+            return None
+        return child.accept(self)
@@ -13,9 +13,6 @@ from souffle_analyzer.ast import (
     TypeReferenceName,
     Workspace,
 )
-from souffle_analyzer.visitor.collect_declaration_references_visitor import (
-    CollectDeclarationReferencesVisitor,
-)
 from souffle_analyzer.visitor.visitor import Visitor
 
 FindDeclarationReferencesResult = Optional[IsDeclarationNode]
@@ -35,9 +32,7 @@ class FindDeclarationReferencesVisitor(Visitor[FindDeclarationReferencesResult])
             if declaration_name_location is not None:
                 references.append(declaration_name_location)
             references.extend(
-                CollectDeclarationReferencesVisitor(
-                    workspace=self.workspace, declaration=declaration
-                ).process()
+                self.workspace.reference_index.get_references(declaration)
             )
         return references
 
@@ -85,7 +80,9 @@ class FindDeclarationReferencesVisitor(Visitor[FindDeclarationReferencesResult])
         return self.generic_visit(branch_init_name)
 
     def generic_visit(self, node: Node) -> FindDeclarationReferencesResult:
-        for child in node.children_sorted_by_range:
-            if child.covers_position(self.position):
-                return child.accept(self)
-        return None
+        child = self.workspace.documents[self.uri].get_child_covering_position(
+            node, self.position
+        )
+        if child is None:
+            return None
+        return child.accept(self)
@@ -1,35 +1,68 @@
+from collections.abc import Iterable
+
 from souffle_analyzer.ast import (
     BranchInitName,
+    Location,
     Node,
+    QualifiedName,
     RelationReferenceName,
+    SymbolKind,
     TypeReferenceName,
+    Workspace,
 )
 from souffle_analyzer.visitor.visitor import Visitor
 
 
 class ResolveDeclarationVisitor(Visitor[None]):
+    def __init__(self, workspace: Workspace, uris: Iterable[str] | None = None) -> None:
+        super().__init__(workspace)
+        self.uris = list(workspace.documents) if uris is None else list(uris)
+        self.uri: str | None = None
+        self.references: list[tuple[object, Location]] = []
+
     def transform(self) -> None:
-        for document in self.workspace.documents.values():
-            document.accept(self)
+        for uri in self.uris:
+            self.uri = uri
+            self.references = []
+            self.workspace.dependency_graph.clear_document(uri)
+            self.workspace.documents[uri].accept(self)
+            self.workspace.reference_index.set_document_references(uri, self.references)
+
+    def add_reference(self, declaration: object | None, name: QualifiedName) -> None:
+        if declaration is not None:
+            self.references.append((declaration, name.location))
+
+    def add_dependency(self, kind: SymbolKind, name: QualifiedName) -> None:
+        if self.uri is None or len(name.parts) != 1:
+            return
+        self.workspace.dependency_graph.add_dependency(
+            self.uri, (kind, name.parts[0].val)
+        )
 
     def visit_relation_reference_name(
         self, relation_reference_name: RelationReferenceName
     ) -> None:
+        self.add_dependency(SymbolKind.RELATION, relation_reference_name)
         relation_reference_name.declaration = (
             self.workspace.get_relation_declaration_with_name(
                 name=relation_reference_name,
             )
         )
+        self.add_reference(relation_reference_name.declaration, relation_reference_name)
 
     def visit_type_reference_name(self, type_reference_name: TypeReferenceName) -> None:
+        self.add_dependency(SymbolKind.TYPE, type_reference_name)
         type_reference_name.declaration = self.workspace.get_type_declaration_with_name(
             name=type_reference_name
         )
+        self.add_reference(type_reference_name.declaration, type_reference_name)
 
     def visit_branch_init_name(self, branch_init_name: BranchInitName) -> None:
+        self.add_dependency(SymbolKind.ADT_BRANCH, branch_init_name)
         branch_init_name.declaration = self.workspace.get_adt_branch_with_name(
             branch_init_name
         )
+        self.add_reference(branch_init_name.declaration, branch_init_name)
 
     def generic_visit(self, node: Node) -> None:
         for child in node.children_sorted_by_range:
@@ -2,10 +2,13 @@ from lsprotocol.types import Diagnostic
 
 from souffle_analyzer.ast import (
     Atom,
+    DocumentSummary,
     ErrorNode,
     Fact,
     Node,
+    Range,
     RelationReference,
+    SymbolKind,
     Workspace,
 )
 from souffle_analyzer.visitor.visitor import Visitor
@@ -36,13 +39,8 @@ class SimpleSemanticCheckVisitor(Visitor[None]):
             return
         if len(relation.attributes) != len(atom.arguments):
             self.diagnostics.append(
-                Diagnostic(
-                    range=atom.range_.to_lsp_type(),
-                    message=(
-                        "Number of arguments: "
-                        f"have {len(atom.arguments)}, "
-                        f"want {len(relation.attributes)}."
-                    ),
+                get_argument_count_diagnostic(
+                    atom.range_, len(atom.arguments), len(relation.attributes)
                 )
             )
             return
@@ -50,3 +48,29 @@ class SimpleSemanticCheckVisitor(Visitor[None]):
     def generic_visit(self, node: Node) -> None:
         for child in node.children_sorted_by_range:
             child.accept(self)
+
+
+def check_summary(workspace: Workspace, summary: DocumentSummary) -> list[Diagnostic]:
+    # The checks of `SimpleSemanticCheckVisitor`, for a document without a
+    # syntax tree.
+    diagnostics = []
+    for reference in summary.references:
+        if reference.kind != SymbolKind.RELATION or reference.arity is None:
+            continue
+        relation = workspace.relation_symbols.get_first(reference.name)
+        if relation is not None and len(relation.attributes) != reference.arity:
+            diagnostics.append(
+                get_argument_count_diagnostic(
+                    reference.get_atom_range(),
+                    reference.arity,
+                    len(relation.attributes),
+                )
+            )
+    return diagnostics
+
+
+def get_argument_count_diagnostic(range_: Range, have: int, want: int) -> Diagnostic:
+    return Diagnostic(
+        range=range_.to_lsp_type(),
+        message=f"Number of arguments: have {have}, want {want}.",
+    )
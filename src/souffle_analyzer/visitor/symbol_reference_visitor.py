@@ -0,0 +1,79 @@
+import sys
+
+from souffle_analyzer.ast import (
+    Atom,
+    BranchInitName,
+    Document,
+    Fact,
+    Node,
+    QualifiedName,
+    RelationReference,
+    RelationReferenceName,
+    SymbolKind,
+    SymbolReference,
+    TypeReferenceName,
+)
+from souffle_analyzer.visitor.visitor import Visitor
+
+
+class SymbolReferenceVisitor(Visitor[None]):
+    # Collects the names that `ResolveDeclarationVisitor` looks up, in the same
+    # order, for the summary of a document.
+    def __init__(self, document: Document) -> None:
+        self.document = document
+        self.atom: Atom | None = None
+        self.references: list[SymbolReference] = []
+
+    def process(self) -> list[SymbolReference]:
+        self.document.accept(self)
+        return self.references
+
+    def add_reference(
+        self, kind: SymbolKind, name: QualifiedName, atom: Atom | None = None
+    ) -> None:
+        if len(name.parts) != 1:
+            return
+        reference = SymbolReference(
+            kind=kind,
+            # The same names are referred to many times, and are only pickled
+            # once if they are the same object.
+            name=sys.intern(name.parts[0].val),
+            start_line=name.range_.start.line,
+            start_character=name.range_.start.character,
+            end_line=name.range_.end.line,
+            end_character=name.range_.end.character,
+        )
+        if atom is not None:
+            reference.arity = len(atom.arguments)
+            reference.atom_end_line = atom.range_.end.line
+            reference.atom_end_character = atom.range_.end.character
+        self.references.append(reference)
+
+    def visit_fact(self, fact: Fact) -> None:
+        return self.visit_atom(fact)
+
+    def visit_relation_reference(self, relation_reference: RelationReference) -> None:
+        return self.visit_atom(relation_reference)
+
+    def visit_atom(self, atom: Atom) -> None:
+        self.atom = atom
+        self.generic_visit(atom)
+        self.atom = None
+
+    def visit_relation_reference_name(
+        self, relation_reference_name: RelationReferenceName
+    ) -> None:
+        atom = self.atom
+        if atom is not None and atom.name.inner is not relation_reference_name:
+            atom = None
+        self.add_reference(SymbolKind.RELATION, relation_reference_name, atom)
+
+    def visit_type_reference_name(self, type_reference_name: TypeReferenceName) -> None:
+        self.add_reference(SymbolKind.TYPE, type_reference_name)
+
+    def visit_branch_init_name(self, branch_init_name: BranchInitName) -> None:
+        self.add_reference(SymbolKind.ADT_BRANCH, branch_init_name)
+
+    def generic_visit(self, node: Node) -> None:
+        for child in node.children_sorted_by_range:
+            child.accept(self)
@@ -1,3 +1,5 @@
+from collections.abc import Iterable
+
 from lsprotocol.types import Diagnostic
 
 from souffle_analyzer.ast import (
@@ -6,6 +8,8 @@ from souffle_analyzer.ast import (
     Fact,
     Node,
     RelationReference,
+    SymbolKind,
+    TypeDeclaration,
     UnresolvedType,
     Workspace,
 )
@@ -13,13 +17,16 @@ from souffle_analyzer.visitor.visitor import Visitor
 
 
 class TypeInferVisitor(Visitor[None]):
-    def __init__(self, workspace: Workspace) -> None:
+    def __init__(self, workspace: Workspace, uris: Iterable[str] | None = None) -> None:
         self.workspace = workspace
+        self.uris = list(workspace.documents) if uris is None else list(uris)
+        self.uri: str | None = None
         self.diagnostics: list[Diagnostic] = []
 
     def process(self) -> None:
-        for document in self.workspace.documents.values():
-            document.accept(self)
+        for uri in self.uris:
+            self.uri = uri
+            self.workspace.documents[uri].accept(self)
 
     def visit_fact(self, fact: Fact) -> None:
         return self.visit_atom(fact)
@@ -28,6 +35,11 @@ class TypeInferVisitor(Visitor[None]):
         return self.visit_atom(relation_reference)
 
     def visit_atom(self, atom: Atom) -> None:
+        for argument in atom.arguments:
+            # Types inferred by a previous pass may come from declarations
+            # that have been replaced since then.
+            if isinstance(argument.ty, TypeDeclaration):
+                argument.ty = UnresolvedType()
         relation_name = atom.name.inner
         if isinstance(relation_name, ErrorNode):
             return
@@ -47,6 +59,10 @@ class TypeInferVisitor(Visitor[None]):
             type_name = type_reference.name.inner
             if isinstance(type_name, ErrorNode):
                 continue
+            if self.uri is not None and len(type_name.parts) == 1:
+                self.workspace.dependency_graph.add_dependency(
+                    self.uri, (SymbolKind.TYPE, type_name.parts[0].val)
+                )
             ty = self.workspace.get_type_declaration_with_name(type_name)
             if ty is not None:
                 argument.ty = ty
@@ -47,7 +47,9 @@ class TypeDefinitionVisitor(Visitor[TypeDefinitionResult]):
         return None
 
     def generic_visit(self, node: Node) -> TypeDefinitionResult:
-        for child in node.children_sorted_by_range:
-            if child.covers_position(self.position):
-                return child.accept(self)
-        return None
+        child = self.workspace.documents[self.uri].get_child_covering_position(
+            node, self.position
+        )
+        if child is None:
+            return None
+        return child.accept(self)
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from souffle_analyzer.ast import Node, Position
+from souffle_analyzer.parser import Parser
+from souffle_analyzer.printer import get_positions_in_range
+
+
+def get_first_covering_child(node: Node, position: Position) -> Node | None:
+    for child in node.children_sorted_by_range:
+        if child.covers_position(position):
+            return child
+    return None
+
+
+@pytest.mark.parametrize(
+    ("filename"),
+    [
+        ("example1.dl"),
+        ("example2.dl"),
+        ("types2.dl"),
+    ],
+)
+def test_get_child_covering_position(test_data_dir: str, filename: str) -> None:
+    with open(os.path.join(test_data_dir, filename), "rb") as f:
+        code = f.read()
+    document = Parser(uri=filename, code=code).parse()
+    positions = get_positions_in_range(document.range_, code.decode().splitlines())
+
+    for position in positions:
+        node: Node | None = document
+        while node is not None:
+            expected = get_first_covering_child(node, position)
+            assert document.get_child_covering_position(node, position) is expected
+            node = expected
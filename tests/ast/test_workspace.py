@@ -0,0 +1,41 @@
+from souffle_analyzer.ast import Workspace
+from souffle_analyzer.parser import Parser
+
+
+def parse(uri: str, code: str):
+    return Parser(uri=uri, code=code.encode()).parse()
+
+
+def test_symbols_from_multiple_documents():
+    workspace = Workspace()
+    workspace.add_document(parse("a.dl", ".decl A(x: number)\n.type T <: number"))
+    workspace.add_document(parse("b.dl", ".type E = Foo {} | Bar {x: number}"))
+
+    assert set(workspace.relation_symbols.declarations) == {"A"}
+    assert set(workspace.type_symbols.declarations) == {"T", "E"}
+    assert set(workspace.adt_branch_symbols.declarations) == {"Foo", "Bar"}
+
+
+def test_reparsed_document_replaces_its_symbols():
+    workspace = Workspace()
+    workspace.add_document(parse("a.dl", ".decl A(x: number)\n.decl B(x: number)"))
+    workspace.add_document(parse("b.dl", ".decl B(y: symbol)"))
+    workspace.add_document(parse("a.dl", ".decl B(x: number)\n.decl C(x: number)"))
+
+    assert set(workspace.relation_symbols.declarations) == {"B", "C"}
+    assert workspace.relation_symbols.sorted_names == [("b", "B"), ("c", "C")]
+    # The first document declaring a name keeps precedence after a reparse.
+    first_b = workspace.relation_symbols.get_first("B")
+    assert first_b is not None
+    assert first_b.location.uri == "a.dl"
+
+
+def test_removed_document_drops_its_symbols():
+    workspace = Workspace()
+    workspace.add_document(parse("a.dl", ".decl A(x: number)"))
+    workspace.add_document(parse("b.dl", ".decl A(x: number)\n.decl B(x: number)"))
+    workspace.remove_document("b.dl")
+
+    assert set(workspace.relation_symbols.declarations) == {"A"}
+    assert workspace.relation_symbols.names_by_document == {"a.dl": {"A"}}
+    assert workspace.relation_symbols.sorted_names == [("a", "A")]
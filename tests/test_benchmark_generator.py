@@ -0,0 +1,45 @@
+from benchmarks.generate import ProgramShape, generate_program
+from benchmarks.scaling import measure
+from souffle_analyzer.analysis import AnalysisContext
+from souffle_analyzer.ast import ErrorNode, Node, RelationReferenceName
+
+
+def walk(node: Node):
+    yield node
+    for child in node.children:
+        yield from walk(child)
+
+
+def test_generated_program_is_valid() -> None:
+    files = generate_program(ProgramShape().scaled(2))
+    assert len(files) == 3
+    ctx = AnalysisContext()
+    for uri, code in files.items():
+        ctx.load_document(uri, code)
+    ctx.sync_workspace()
+
+    for uri, document in ctx.workspace.documents.items():
+        nodes = list(walk(document))
+        assert not any(isinstance(node, ErrorNode) for node in nodes)
+        assert all(
+            node.declaration is not None
+            for node in nodes
+            if isinstance(node, RelationReferenceName)
+        )
+        assert ctx.get_diagnostics(uri) == []
+
+
+def test_generated_program_is_deterministic() -> None:
+    assert generate_program(ProgramShape(seed=1)) == generate_program(
+        ProgramShape(seed=1)
+    )
+    assert generate_program(ProgramShape(seed=1)) != generate_program(
+        ProgramShape(seed=2)
+    )
+
+
+def test_measure_scaling() -> None:
+    result = measure(ProgramShape(relations=5, rules=5))
+    assert result["files"] == 2
+    assert result["nodes"] > 0
+    assert result["bytes_per_node"] > 0
@@ -0,0 +1,140 @@
+import os
+import pickle
+from pathlib import Path
+
+import pytest
+
+from souffle_analyzer import cache as cache_module
+from souffle_analyzer import indexer
+from souffle_analyzer.ast import Identifier, Position
+from souffle_analyzer.cache import STALE_TEMPORARY_FILE_AGE, IndexCache
+from souffle_analyzer.parser import Parser
+
+
+@pytest.fixture
+def source_path(tmp_path: Path) -> str:
+    path = tmp_path / "src" / "a.dl"
+    path.parent.mkdir()
+    path.write_text(".decl A(x: number)\n")
+    return str(path)
+
+
+def count_parses(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    parsed: list[str] = []
+    parse = indexer.Parser.parse
+
+    def counting_parse(self, *args, **kwargs):
+        parsed.append(self.uri)
+        return parse(self, *args, **kwargs)
+
+    monkeypatch.setattr(indexer.Parser, "parse", counting_parse)
+    return parsed
+
+
+def test_unchanged_file_is_loaded_from_cache(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, source_path: str
+) -> None:
+    cache_dir = str(tmp_path / "cache")
+    parsed = count_parses(monkeypatch)
+    summary = indexer.parse_workspace_file(source_path, cache_dir)
+    cached = indexer.parse_workspace_file(source_path, cache_dir)
+
+    assert len(parsed) == 1
+    assert cached == summary
+
+
+def test_touched_file_is_loaded_from_cache(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, source_path: str
+) -> None:
+    cache_dir = str(tmp_path / "cache")
+    parsed = count_parses(monkeypatch)
+    indexer.parse_workspace_file(source_path, cache_dir)
+    stat = os.stat(source_path)
+    os.utime(source_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    indexer.parse_workspace_file(source_path, cache_dir)
+
+    assert len(parsed) == 1
+    entry = IndexCache(cache_dir).read_entry(Path(source_path).as_uri())
+    assert entry is not None
+    assert entry.mtime_ns == stat.st_mtime_ns + 10**9
+
+
+def test_changed_file_is_parsed_again(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, source_path: str
+) -> None:
+    cache_dir = str(tmp_path / "cache")
+    parsed = count_parses(monkeypatch)
+    indexer.parse_workspace_file(source_path, cache_dir)
+    with open(source_path, "w") as f:
+        f.write(".decl B(x: number)\n")
+    summary = indexer.parse_workspace_file(source_path, cache_dir)
+
+    assert len(parsed) == 2
+    assert summary is not None
+    names = [decl.name.inner for decl in summary.relation_declarations]
+    assert all(isinstance(name, Identifier) for name in names)
+    assert [name.val for name in names if isinstance(name, Identifier)] == ["B"]
+
+
+def test_unreadable_entry_is_ignored(tmp_path: Path, source_path: str) -> None:
+    cache_dir = str(tmp_path / "cache")
+    indexer.parse_workspace_file(source_path, cache_dir)
+    cache = IndexCache(cache_dir)
+    uri = Path(source_path).as_uri()
+    with open(cache.get_entry_path(uri), "wb") as f:
+        f.write(b"not a pickle")
+
+    assert cache.read_entry(uri) is None
+    summary = indexer.parse_workspace_file(source_path, cache_dir)
+    assert summary is not None
+    names = [decl.name.inner for decl in summary.relation_declarations]
+    assert all(isinstance(name, Identifier) for name in names)
+    assert [name.val for name in names if isinstance(name, Identifier)] == ["A"]
+
+
+@pytest.mark.parametrize(
+    "error", [pickle.PicklingError("cannot pickle"), OSError("disk full")]
+)
+def test_failed_write_leaves_no_temporary_file(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    source_path: str,
+    error: Exception,
+) -> None:
+    def failing_dump(*args: object, **kwargs: object) -> None:
+        raise error
+
+    monkeypatch.setattr(cache_module.pickle, "dump", failing_dump)
+    cache_dir = tmp_path / "cache"
+    summary = indexer.parse_workspace_file(source_path, str(cache_dir))
+
+    assert summary is not None
+    assert list(cache_dir.iterdir()) == []
+
+
+def test_stale_temporary_files_are_removed(tmp_path: Path, source_path: str) -> None:
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    stale_path = cache_dir / "stale.tmp"
+    stale_path.write_bytes(b"")
+    stale_time = stale_path.stat().st_mtime - STALE_TEMPORARY_FILE_AGE - 1
+    os.utime(stale_path, (stale_time, stale_time))
+    # A recent one may still be written by another process.
+    recent_path = cache_dir / "recent.tmp"
+    recent_path.write_bytes(b"")
+
+    list(indexer.parse_workspace_files([source_path], None, str(cache_dir)))
+
+    assert not stale_path.exists()
+    assert recent_path.exists()
+
+
+def test_pickled_document_drops_child_intervals() -> None:
+    document = Parser(uri="a.dl", code=b".decl A(x: number)\n").parse()
+    document.get_child_covering_position(document, Position(0, 7))
+    assert document.child_intervals
+
+    loaded = pickle.loads(pickle.dumps(document))
+
+    assert loaded.child_intervals == {}
+    assert loaded == document
@@ -0,0 +1,56 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from souffle_analyzer.main import main
+
+
+@pytest.fixture
+def check_dir(tmp_path: Path) -> Path:
+    (tmp_path / "decl.dl").write_text(".decl edge(x: number, y: number)\n")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "use.dl").write_text("edge(1, 2).\nedge(1).\n")
+    return tmp_path
+
+
+def run_main(argv: list[str], capsys: pytest.CaptureFixture) -> tuple[int, str]:
+    exit_code = main(["check", "--no-cache", "-j", "1", *argv])
+    return exit_code, capsys.readouterr().out
+
+
+def test_check_text(check_dir: Path, capsys: pytest.CaptureFixture) -> None:
+    exit_code, out = run_main([str(check_dir)], capsys)
+    use_path = check_dir / "sub" / "use.dl"
+    assert exit_code == 1
+    assert out == f"{use_path}:2:1: Number of arguments: have 1, want 2.\n"
+
+
+def test_check_jsonl(check_dir: Path, capsys: pytest.CaptureFixture) -> None:
+    exit_code, out = run_main(["--format", "jsonl", str(check_dir)], capsys)
+    assert exit_code == 1
+    results = [json.loads(line) for line in out.splitlines()]
+    assert [(result["path"], result["range"]["start"]) for result in results] == [
+        (str(check_dir / "sub" / "use.dl"), {"line": 1, "character": 0})
+    ]
+
+
+def test_check_sarif(check_dir: Path, capsys: pytest.CaptureFixture) -> None:
+    exit_code, out = run_main(["--format", "sarif", str(check_dir)], capsys)
+    assert exit_code == 1
+    sarif = json.loads(out)
+    [result] = sarif["runs"][0]["results"]
+    location = result["locations"][0]["physicalLocation"]
+    assert location["artifactLocation"]["uri"] == (check_dir / "sub/use.dl").as_uri()
+    assert location["region"]["startLine"] == 2
+
+
+def test_check_without_errors(check_dir: Path, capsys: pytest.CaptureFixture) -> None:
+    exit_code, out = run_main([str(check_dir / "decl.dl")], capsys)
+    assert exit_code == 0
+    assert out == ""
+
+
+def test_check_missing_path(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    exit_code, _ = run_main([str(tmp_path / "missing.dl")], capsys)
+    assert exit_code == 2
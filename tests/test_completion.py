@@ -1,7 +1,9 @@
 import pytest
-from lsprotocol.types import CompletionContext, CompletionTriggerKind
+from lsprotocol.types import CompletionContext, CompletionList, CompletionTriggerKind
 
+from souffle_analyzer import analysis
 from souffle_analyzer.analysis import AnalysisContext
+from souffle_analyzer.ast import BuiltinTypes
 from tests.util.helper import parse_code_with_cursor_position
 
 
@@ -115,3 +117,147 @@ def test_completion_with_trigger_character() -> None:
     )
     completion_labels = [_.label for _ in completion_items]
     assert {"decl", "input", "output", "type"}.issubset(completion_labels)
+
+
+def test_no_relation_completion_inside_square_brackets() -> None:
+    code, cursor_position = parse_code_with_cursor_position(
+        """
+        .decl foo(x: number)
+        .type Edge = [from: number, t
+                                     ^
+        """,
+    )
+    ctx = AnalysisContext()
+    uri = "main.dl"
+    ctx.sync_document(uri=uri, text=code)
+    completion_items = ctx.get_completion_items(
+        uri=uri,
+        position=cursor_position.to_lsp_type(),
+        context=CompletionContext(
+            trigger_kind=CompletionTriggerKind.Invoked,
+            trigger_character=None,
+        ),
+    )
+    assert "foo" not in [_.label for _ in completion_items]
+
+
+def get_invoked_completion_list(
+    ctx: AnalysisContext, uri: str, code_with_cursor_position: str
+) -> CompletionList:
+    code, cursor_position = parse_code_with_cursor_position(code_with_cursor_position)
+    ctx.sync_document(uri=uri, text=code)
+    return ctx.get_completion_list(
+        uri=uri,
+        position=cursor_position.to_lsp_type(),
+        context=CompletionContext(
+            trigger_kind=CompletionTriggerKind.Invoked,
+            trigger_character=None,
+        ),
+    )
+
+
+def test_relation_completion_covers_the_workspace() -> None:
+    ctx = AnalysisContext()
+    ctx.load_document("other.dl", ".decl edge(x: number, y: number)\n")
+    completion_list = get_invoked_completion_list(
+        ctx,
+        "main.dl",
+        """
+        .decl path(x: number, y: number)
+        path(x, y) :- e
+                       ^
+        """,
+    )
+    assert [_.label for _ in completion_list.items] == ["edge"]
+    assert not completion_list.is_incomplete
+
+
+def test_completion_matches_subsequences_after_prefixes() -> None:
+    ctx = AnalysisContext()
+    completion_list = get_invoked_completion_list(
+        ctx,
+        "main.dl",
+        """
+        .decl edge(x: number, y: number)
+        .decl derived_edge(x: number, y: number)
+        .decl edges_reversed(x: number, y: number)
+        .decl path(x: number, y: number)
+        path(x, y) :- edg
+                         ^
+        """,
+    )
+    assert [_.label for _ in completion_list.items] == [
+        "edge",
+        "edges_reversed",
+        "derived_edge",
+    ]
+
+
+def test_completion_is_capped(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(analysis, "MAX_COMPLETION_ITEMS", 2)
+    ctx = AnalysisContext()
+    completion_list = get_invoked_completion_list(
+        ctx,
+        "main.dl",
+        """
+        .decl r1(x: number)
+        .decl r2(x: number)
+        .decl r3(x: number)
+        r
+         ^
+        """,
+    )
+    assert [_.label for _ in completion_list.items] == ["r1", "r2"]
+    assert completion_list.is_incomplete
+
+
+def test_adt_branch_completion() -> None:
+    ctx = AnalysisContext()
+    completion_list = get_invoked_completion_list(
+        ctx,
+        "main.dl",
+        """
+        .type Tree = Leaf {x: number} | Node {l: Tree, r: Tree}
+        .decl tree(t: Tree)
+        tree($L
+               ^
+        """,
+    )
+    assert [_.label for _ in completion_list.items] == ["Leaf"]
+
+
+def test_completion_documentation_is_resolved_lazily() -> None:
+    ctx = AnalysisContext()
+    completion_list = get_invoked_completion_list(
+        ctx,
+        "main.dl",
+        """
+        /// The edges.
+        .decl edge(x: number, y: number)
+        e
+         ^
+        """,
+    )
+    items = {item.label: item for item in completion_list.items}
+    assert items["edge"].documentation is None
+    assert items["edge"].data == ["r", "edge"]
+
+    resolved = ctx.resolve_completion_item(items["edge"])
+    declaration = ctx.workspace.relation_symbols.get_first("edge")
+    assert declaration is not None
+    assert resolved.documentation == declaration.get_doc()
+    assert ctx.relation_docs["edge"][0] is declaration
+
+
+def test_completion_documentation_of_builtin_type() -> None:
+    ctx = AnalysisContext()
+    completion_list = get_invoked_completion_list(
+        ctx,
+        "main.dl",
+        """
+        .decl edge(x: num
+                         ^
+        """,
+    )
+    (item,) = [item for item in completion_list.items if item.label == "number"]
+    assert ctx.resolve_completion_item(item).documentation == (BuiltinTypes.NUMBER.doc)
@@ -1,8 +1,22 @@
 import os
 
 import pytest
-from lsprotocol.types import Diagnostic
+from lsprotocol.types import (
+    Diagnostic,
+    DocumentDiagnosticParams,
+    DocumentDiagnosticRequest,
+    PositionEncodingKind,
+    PreviousResultId,
+    RelatedFullDocumentDiagnosticReport,
+    RelatedUnchangedDocumentDiagnosticReport,
+    TextDocumentIdentifier,
+    WorkspaceDiagnosticParams,
+    WorkspaceDiagnosticRequest,
+    WorkspaceFullDocumentDiagnosticReport,
+    WorkspaceUnchangedDocumentDiagnosticReport,
+)
 
+from souffle_analyzer import handler
 from souffle_analyzer.analysis import AnalysisContext
 from souffle_analyzer.ast import Range
 from souffle_analyzer.printer import format_souffle_code_range
@@ -64,3 +78,108 @@ def test_diagnostic(
         with open(out_file) as f:
             output = f.read()
         assert result == output
+
+
+def request_document_diagnostics(
+    ctx: AnalysisContext, uri: str, previous_result_id: str | None = None
+):
+    request = DocumentDiagnosticRequest(
+        id=0,
+        params=DocumentDiagnosticParams(
+            text_document=TextDocumentIdentifier(uri=uri),
+            previous_result_id=previous_result_id,
+        ),
+    )
+    return handler.handle_text_document_diagnostic_request(request, ctx).result
+
+
+def test_document_diagnostic_result_ids() -> None:
+    ctx = AnalysisContext()
+    ctx.sync_document("decl.dl", ".decl edge(x: number, y: number)\n")
+    ctx.sync_document("use.dl", "edge(1, 2).\n")
+
+    report = request_document_diagnostics(ctx, "use.dl")
+    assert isinstance(report, RelatedFullDocumentDiagnosticReport)
+    assert report.items == []
+    assert report.result_id is not None
+
+    unchanged = request_document_diagnostics(ctx, "use.dl", report.result_id)
+    assert isinstance(unchanged, RelatedUnchangedDocumentDiagnosticReport)
+    assert unchanged.result_id == report.result_id
+
+    # Changing the arity in another document breaks the fact.
+    ctx.sync_document("decl.dl", ".decl edge(x: number)\n")
+    changed = request_document_diagnostics(ctx, "use.dl", report.result_id)
+    assert isinstance(changed, RelatedFullDocumentDiagnosticReport)
+    assert len(changed.items) == 1
+    assert changed.result_id != report.result_id
+
+
+def test_result_ids_of_another_context_do_not_match() -> None:
+    # A client may keep result IDs across a restart of the server.
+    old_ctx = AnalysisContext()
+    old_ctx.sync_document("use.dl", "edge(1, 2).\n")
+    old_report = request_document_diagnostics(old_ctx, "use.dl")
+    assert isinstance(old_report, RelatedFullDocumentDiagnosticReport)
+
+    ctx = AnalysisContext()
+    ctx.sync_document("use.dl", ".decl edge(x: number)\nedge(1, 2).\n")
+    report = request_document_diagnostics(ctx, "use.dl", old_report.result_id)
+    assert isinstance(report, RelatedFullDocumentDiagnosticReport)
+    assert len(report.items) == 1
+    assert report.result_id != old_report.result_id
+
+
+def test_workspace_diagnostic_result_ids() -> None:
+    ctx = AnalysisContext()
+    ctx.sync_document("decl.dl", ".decl edge(x: number, y: number)\n")
+    ctx.sync_document("use.dl", "edge(1).\n")
+
+    request = WorkspaceDiagnosticRequest(
+        id=0, params=WorkspaceDiagnosticParams(previous_result_ids=[])
+    )
+    reports = handler.handle_workspace_diagnostic_request(request, ctx).result.items
+    assert [report.uri for report in reports] == ["decl.dl", "use.dl"]
+    full_reports = [
+        report
+        for report in reports
+        if isinstance(report, WorkspaceFullDocumentDiagnosticReport)
+    ]
+    assert len(full_reports) == len(reports)
+    assert [len(report.items) for report in full_reports] == [0, 1]
+
+    previous_result_ids = []
+    for report in full_reports:
+        assert report.result_id is not None
+        previous_result_ids.append(
+            PreviousResultId(uri=report.uri, value=report.result_id)
+        )
+    request = WorkspaceDiagnosticRequest(
+        id=1,
+        params=WorkspaceDiagnosticParams(previous_result_ids=previous_result_ids),
+    )
+    reports = handler.handle_workspace_diagnostic_request(request, ctx).result.items
+    assert all(
+        isinstance(report, WorkspaceUnchangedDocumentDiagnosticReport)
+        for report in reports
+    )
+
+
+@pytest.mark.parametrize(
+    ("encoding", "start", "end"),
+    [
+        pytest.param(PositionEncodingKind.Utf8, 26, 33, id="utf-8"),
+        pytest.param(PositionEncodingKind.Utf16, 24, 31, id="utf-16"),
+        pytest.param(PositionEncodingKind.Utf32, 23, 30, id="utf-32"),
+    ],
+)
+def test_diagnostic_columns_use_position_encoding(
+    encoding: PositionEncodingKind, start: int, end: int
+) -> None:
+    ctx = AnalysisContext(position_encoding=encoding)
+    diagnostics = ctx.sync_document(
+        "main.dl", '.decl A(s: symbol)\nA(s) :- A(s), s = "😀", A(1, 2).\n'
+    )
+    assert [(d.range.start.character, d.range.end.character) for d in diagnostics] == [
+        (start, end)
+    ]
@@ -0,0 +1,97 @@
+from pathlib import Path
+
+import pytest
+
+from souffle_analyzer import indexer
+from souffle_analyzer.analysis import AnalysisContext
+from souffle_analyzer.ast import IsDeclarationNode
+from souffle_analyzer.printer import format_souffle_ast
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_load_workspace(
+    monkeypatch: pytest.MonkeyPatch, test_data_dir: str, jobs: int
+) -> None:
+    monkeypatch.setattr(indexer, "MIN_FILES_FOR_PROCESS_POOL", 1)
+    ctx = AnalysisContext(jobs=jobs)
+    ctx.load_workspace(Path(test_data_dir).as_uri())
+
+    expected_ctx = AnalysisContext()
+    paths = indexer.find_workspace_files(test_data_dir)
+    for path in paths:
+        with open(path) as f:
+            expected_ctx.load_document(Path(path).as_uri(), f.read())
+    expected_ctx.sync_workspace()
+
+    # Documents are resolved and checked from their summaries.
+    uris = list(expected_ctx.workspace.documents)
+    assert ctx.workspace.get_uris() == uris
+    assert ctx.workspace.documents == {}
+    assert ctx.stale_uris == set()
+    for uri in uris:
+        assert ctx.get_diagnostics(uri) == expected_ctx.get_diagnostics(uri)
+
+    # Syntax trees are built when the documents are queried.
+    for uri in uris:
+        expected = expected_ctx.workspace.documents[uri]
+        declarations: list[IsDeclarationNode] = [
+            *expected.relation_declarations,
+            *expected.type_declarations,
+        ]
+        for declaration in declarations:
+            location = declaration.get_declaration_name_location()
+            if location is None:
+                continue
+            position = location.range_.start.to_lsp_type()
+            assert ctx.get_references(uri, position) == (
+                expected_ctx.get_references(uri, position)
+            )
+        ctx.build_document(uri)
+        ctx.sync_workspace()
+        assert format_souffle_ast(ctx.workspace.documents[uri]) == (
+            format_souffle_ast(expected)
+        )
+    assert ctx.workspace.summaries == {}
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_load_workspace_stops_early(
+    monkeypatch: pytest.MonkeyPatch, test_data_dir: str, jobs: int
+) -> None:
+    monkeypatch.setattr(indexer, "MIN_FILES_FOR_PROCESS_POOL", 1)
+    monkeypatch.setattr(indexer, "PROCESS_POOL_CHUNK_SIZE", 1)
+    ctx = AnalysisContext(jobs=jobs)
+
+    def on_progress(done: int, total: int) -> None:
+        ctx.stop()
+
+    ctx.load_workspace(Path(test_data_dir).as_uri(), progress=on_progress)
+
+    assert len(ctx.workspace.get_uris()) == 1
+    assert len(indexer.find_workspace_files(test_data_dir)) > 1
+    assert ctx.executor is None
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_load_workspace_skips_bad_files(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, jobs: int
+) -> None:
+    monkeypatch.setattr(indexer, "MIN_FILES_FOR_PROCESS_POOL", 1)
+    (tmp_path / "a.dl").write_text(".decl A(x: number)\n")
+    (tmp_path / "b.dl").write_bytes(b"\xff\xfe.decl B(x: number)\n")
+    # A directory named like a source file cannot be read.
+    (tmp_path / "c.dl").mkdir()
+    ctx = AnalysisContext(jobs=jobs)
+    ctx.load_workspace(tmp_path.as_uri())
+
+    # Invalid UTF-8 is replaced rather than dropping the file.
+    assert sorted(ctx.workspace.get_uris()) == [
+        (tmp_path / "a.dl").as_uri(),
+        (tmp_path / "b.dl").as_uri(),
+    ]
+    assert ctx.workspace.relation_symbols.get_first("A") is not None
+    assert ctx.workspace.relation_symbols.get_first("B") is not None
+
+
+def test_deleted_file_is_skipped(tmp_path: Path) -> None:
+    assert indexer.parse_workspace_file(str(tmp_path / "a.dl")) is None
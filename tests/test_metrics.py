@@ -0,0 +1,42 @@
+from souffle_analyzer.analysis import AnalysisContext
+from souffle_analyzer.metrics import MetricsRegistry, get_percentile, metrics
+
+
+def test_registry_snapshot() -> None:
+    registry = MetricsRegistry()
+    for seconds in [0.001, 0.002, 0.003, 0.004]:
+        registry.record("phase", seconds)
+    registry.increment("things", 2)
+    registry.increment("things")
+
+    snapshot = registry.snapshot()
+    stats = snapshot["timers"]["phase"]
+    assert stats["count"] == 4
+    assert round(stats["total_ms"], 6) == 10
+    assert round(stats["p50_ms"], 6) == 2
+    assert round(stats["max_ms"], 6) == 4
+    assert snapshot["counters"] == {"things": 3}
+    assert registry.format()[-1] == "things: 3"
+
+
+def test_get_percentile() -> None:
+    assert get_percentile([], 50) == 0.0
+    assert get_percentile([1.0, 2.0, 3.0], 50) == 2.0
+    assert get_percentile([1.0, 2.0, 3.0], 99) == 3.0
+
+
+def test_analysis_phases_are_timed() -> None:
+    metrics.reset()
+    ctx = AnalysisContext()
+    ctx.sync_document("a.dl", ".decl A(x: number)\nA(1, 2).\n")
+    ctx.get_diagnostics("a.dl")
+
+    snapshot = metrics.snapshot()
+    for name in [
+        "analysis.parse",
+        "analysis.resolve",
+        "analysis.type_infer",
+        "analysis.semantic_check",
+    ]:
+        assert snapshot["timers"][name]["count"] == 1
+    assert snapshot["counters"]["analysis.semantic_check_cache_hits"] == 1
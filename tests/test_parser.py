@@ -2,7 +2,7 @@ import os
 
 import pytest
 
-from souffle_analyzer.parser import Parser
+from souffle_analyzer.parser import Parser, SyntaxParserPool
 from souffle_analyzer.printer import (
     format_souffle_ast,
     format_souffle_code,
@@ -104,3 +104,13 @@ def test_parser_on_incomplete_files(
                         ],
                     )
                 )
+
+
+def test_syntax_parser_pool_reuses_parsers() -> None:
+    pool = SyntaxParserPool()
+    with pool.acquire() as parser:
+        with pool.acquire() as other_parser:
+            assert parser is not other_parser
+    with pool.acquire() as reused_parser:
+        assert reused_parser in (parser, other_parser)
+    assert len(pool.parsers) == 2
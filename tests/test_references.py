@@ -65,3 +65,23 @@ def test_references(
         with open(out_file) as f:
             output = f.read()
         assert result == output
+
+
+def test_references_across_documents() -> None:
+    ctx = AnalysisContext()
+    ctx.load_document("decl.dl", ".decl edge(x: number, y: number)\n")
+    ctx.load_document("use1.dl", ".decl path(x: number)\npath(x) :- edge(x, _).\n")
+    ctx.load_document("use2.dl", "edge(1, 2).\n")
+    ctx.sync_workspace()
+
+    def get_reference_uris() -> list[str]:
+        references = ctx.get_references(
+            "decl.dl", lsptypes.Position(line=0, character=7)
+        )
+        return [location.uri for location in references]
+
+    assert get_reference_uris() == ["decl.dl", "use1.dl", "use2.dl"]
+
+    ctx.sync_document("use2.dl", "\n")
+
+    assert get_reference_uris() == ["decl.dl", "use1.dl"]
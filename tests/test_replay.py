@@ -0,0 +1,22 @@
+import os
+
+from benchmarks import replay
+
+
+def test_replay_editing_trace(tmp_path) -> None:
+    trace = os.path.join(os.path.dirname(replay.__file__), "traces", "editing.jsonl")
+    baseline = str(tmp_path / "baseline.json")
+    assert replay.main([trace, "--repeat", "1", "--save-baseline", baseline]) == 0
+    assert (
+        replay.main(
+            [trace, "--repeat", "1", "--compare", baseline, "--threshold", "1e9"]
+        )
+        == 0
+    )
+
+
+def test_get_percentile() -> None:
+    samples = [float(i) for i in range(1, 101)]
+    assert replay.get_percentile(samples, 50) == 50.0
+    assert replay.get_percentile(samples, 99) == 99.0
+    assert replay.get_percentile([3.0], 95) == 3.0
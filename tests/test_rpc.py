@@ -5,6 +5,7 @@ import pytest
 from hypothesis import given
 from hypothesis import strategies as st
 
+from souffle_analyzer import rpc
 from souffle_analyzer.server import JsonRpcNode
 
 arbitrary_json_msgs = st.recursive(
@@ -85,3 +86,48 @@ def test_read_invalid_message(raw_text: str):
         out_stream=io.BytesIO(),
     )
     assert server.read_message() is None
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+@pytest.mark.parametrize(
+    "sent_msg",
+    [
+        pytest.param({"text": "é\nü 😀"}, id="non-ascii text"),
+        pytest.param({"text": "\ud800"}, id="lone surrogate"),
+        pytest.param({"id": 2**70}, id="wide integer"),
+    ],
+)
+def test_json_rpc_roundtrip_with_codec(
+    monkeypatch: pytest.MonkeyPatch, use_orjson: bool, sent_msg: dict
+):
+    if not use_orjson:
+        monkeypatch.setattr(rpc, "orjson", None)
+    node = JsonRpcNode(in_stream=io.BytesIO(), out_stream=io.BytesIO())
+    data = node.encode_message(sent_msg)
+    header, content = data.split(b"\r\n\r\n", 1)
+    assert header == f"Content-Length: {len(content)}".encode()
+
+    node = JsonRpcNode(in_stream=io.BytesIO(data * 2), out_stream=io.BytesIO())
+    assert node.read_message() == sent_msg
+    assert node.read_message() == sent_msg
+
+
+def test_read_message_with_content_type_header():
+    content = b'{"id": 1}'
+    node = JsonRpcNode(
+        in_stream=io.BytesIO(
+            b"Content-Length: %d\r\n"
+            b"Content-Type: application/vscode-jsonrpc; charset=utf-8\r\n"
+            b"\r\n%b" % (len(content), content)
+        ),
+        out_stream=io.BytesIO(),
+    )
+    assert node.read_message() == {"id": 1}
+
+
+def test_read_truncated_message():
+    node = JsonRpcNode(
+        in_stream=io.BytesIO(b'Content-Length: 42\r\n\r\n{"id": 1}'),
+        out_stream=io.BytesIO(),
+    )
+    assert node.read_message() is None
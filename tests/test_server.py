@@ -0,0 +1,470 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from souffle_analyzer.rpc import JsonRpcNode
+from souffle_analyzer.server import LanguageServer
+
+
+def encode_messages(messages: list[dict]) -> bytes:
+    node = JsonRpcNode(in_stream=io.BytesIO(), out_stream=io.BytesIO())
+    return b"".join(node.encode_message(message) for message in messages)
+
+
+def decode_messages(data: bytes) -> list[dict]:
+    node = JsonRpcNode(in_stream=io.BytesIO(data), out_stream=io.BytesIO())
+    messages = []
+    while message := node.read_message():
+        messages.append(message)
+    return messages
+
+
+def test_workspace_is_indexed_in_the_background(test_data_dir: str) -> None:
+    root_uri = Path(test_data_dir).as_uri()
+    out_stream = io.BytesIO()
+    server = LanguageServer(in_stream=io.BytesIO(), out_stream=out_stream)
+    messages: list[dict] = [
+        {
+            "jsonrpc": "2.0",
+            "id": 0,
+            "method": "initialize",
+            "params": {
+                "processId": None,
+                "rootUri": root_uri,
+                "capabilities": {"window": {"workDoneProgress": True}},
+            },
+        },
+        {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+        # A response from the client to the server-initiated request.
+        {"jsonrpc": "2.0", "id": "souffle-analyzer/0", "result": None},
+    ]
+    # The input is kept open, as indexing stops once it ends.
+    for message in messages:
+        server.process_incoming_message(message)
+    assert server.indexing_thread is not None
+    server.indexing_thread.join()
+
+    messages = decode_messages(out_stream.getvalue())
+    assert messages[0]["id"] == 0
+    assert "capabilities" in messages[0]["result"]
+    assert messages[1]["method"] == "window/workDoneProgress/create"
+    progress_kinds = [
+        message["params"]["value"]["kind"]
+        for message in messages
+        if message.get("method") == "$/progress"
+    ]
+    assert progress_kinds[0] == "begin"
+    assert progress_kinds[-1] == "end"
+    assert server.ctx.workspace.has_document(f"{root_uri}/example1.dl")
+
+
+def test_indexing_errors_are_shown_to_the_client(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    out_stream = io.BytesIO()
+    server = LanguageServer(in_stream=io.BytesIO(), out_stream=out_stream)
+
+    def load_workspace(*args: object, **kwargs: object) -> None:
+        raise PermissionError("Permission denied")
+
+    monkeypatch.setattr(server.ctx, "load_workspace", load_workspace)
+    messages: list[dict] = [
+        {
+            "jsonrpc": "2.0",
+            "id": 0,
+            "method": "initialize",
+            "params": {
+                "processId": None,
+                "rootUri": tmp_path.as_uri(),
+                "capabilities": {"window": {"workDoneProgress": True}},
+            },
+        },
+        {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+    ]
+    for message in messages:
+        server.process_incoming_message(message)
+    assert server.indexing_thread is not None
+    server.indexing_thread.join()
+
+    messages = decode_messages(out_stream.getvalue())
+    shown = [
+        message["params"]
+        for message in messages
+        if message.get("method") == "window/showMessage"
+    ]
+    assert shown == [
+        {
+            "type": 1,
+            "message": "Indexing the workspace failed: Permission denied",
+        }
+    ]
+    progress_kinds = [
+        message["params"]["value"]["kind"]
+        for message in messages
+        if message.get("method") == "$/progress"
+    ]
+    assert progress_kinds == ["begin", "end"]
+
+
+def test_indexing_stops_at_the_end_of_the_input(test_data_dir: str) -> None:
+    in_stream = io.BytesIO(
+        encode_messages(
+            [
+                {
+                    "jsonrpc": "2.0",
+                    "id": 0,
+                    "method": "initialize",
+                    "params": {
+                        "processId": None,
+                        "rootUri": Path(test_data_dir).as_uri(),
+                        "capabilities": {},
+                    },
+                },
+                {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+            ]
+        )
+    )
+    server = LanguageServer(in_stream=in_stream, out_stream=io.BytesIO())
+    # Holding the lock keeps the indexing thread from merging a document
+    # before the input ends.
+    with server.ctx.lock:
+        server.serve()
+    assert server.indexing_thread is not None
+    server.indexing_thread.join()
+
+    assert server.ctx.stopped.is_set()
+    assert server.ctx.executor is None
+    assert len(server.ctx.workspace.get_uris()) <= 1
+
+
+def test_cancelled_and_superseded_requests(test_data_dir: str) -> None:
+    uri = Path(test_data_dir, "example1.dl").as_uri()
+    with open(Path(test_data_dir, "example1.dl")) as f:
+        text = f.read()
+    position = {"line": 0, "character": 0}
+    in_stream = io.BytesIO(
+        encode_messages(
+            [
+                {
+                    "jsonrpc": "2.0",
+                    "id": 0,
+                    "method": "initialize",
+                    "params": {"processId": None, "capabilities": {}},
+                },
+                {
+                    "jsonrpc": "2.0",
+                    "method": "textDocument/didOpen",
+                    "params": {
+                        "textDocument": {
+                            "uri": uri,
+                            "languageId": "souffle",
+                            "version": 0,
+                            "text": text,
+                        }
+                    },
+                },
+                {
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "method": "textDocument/hover",
+                    "params": {"textDocument": {"uri": uri}, "position": position},
+                },
+                {
+                    "jsonrpc": "2.0",
+                    "id": 2,
+                    "method": "textDocument/hover",
+                    "params": {"textDocument": {"uri": uri}, "position": position},
+                },
+                {
+                    "jsonrpc": "2.0",
+                    "id": 3,
+                    "method": "textDocument/references",
+                    "params": {
+                        "textDocument": {"uri": uri},
+                        "position": position,
+                        "context": {"includeDeclaration": True},
+                    },
+                },
+                {"jsonrpc": "2.0", "method": "$/cancelRequest", "params": {"id": 3}},
+                # Cancelling a request that was never sent is ignored.
+                {"jsonrpc": "2.0", "method": "$/cancelRequest", "params": {"id": 9}},
+            ]
+        )
+    )
+    out_stream = io.BytesIO()
+    server = LanguageServer(in_stream=in_stream, out_stream=out_stream)
+    # Read all messages before handling any, as if they arrived while the
+    # server was busy.
+    server.read_incoming_messages()
+    server.process_incoming_messages()
+
+    responses = {
+        message["id"]: message
+        for message in decode_messages(out_stream.getvalue())
+        if "id" in message
+    }
+    assert responses[1]["error"]["code"] == -32800
+    assert "error" not in responses[2]
+    assert responses[3]["error"]["code"] == -32800
+    assert server.pending_request_ids == set()
+    assert server.cancelled_request_ids == set()
+    assert server.latest_request_ids == {}
+
+
+def open_document(server: LanguageServer, uri: str, text: str) -> None:
+    server.process_incoming_message(
+        {
+            "jsonrpc": "2.0",
+            "method": "textDocument/didOpen",
+            "params": {
+                "textDocument": {
+                    "uri": uri,
+                    "languageId": "souffle",
+                    "version": 0,
+                    "text": text,
+                }
+            },
+        }
+    )
+
+
+def insert_line(server: LanguageServer, uri: str, line: int, text: str) -> None:
+    position = {"line": line, "character": 0}
+    server.process_incoming_message(
+        {
+            "jsonrpc": "2.0",
+            "method": "textDocument/didChange",
+            "params": {
+                "textDocument": {"uri": uri, "version": line + 1},
+                "contentChanges": [
+                    {"range": {"start": position, "end": position}, "text": text}
+                ],
+            },
+        }
+    )
+
+
+def test_diagnostics_are_published_once_after_a_burst_of_edits() -> None:
+    uri = "file:///main.dl"
+    out_stream = io.BytesIO()
+    server = LanguageServer(in_stream=io.BytesIO(), out_stream=out_stream)
+    open_document(server, uri, "")
+    insert_line(server, uri, 0, ".decl A(x: number)\n")
+    insert_line(server, uri, 1, "A(1, 2).\n")
+    assert server.get_diagnostics_wait_time() is not None
+    assert server.ctx.stale_uris == {uri}
+
+    server.publish_pending_diagnostics()
+
+    assert server.get_diagnostics_wait_time() is None
+    notifications = decode_messages(out_stream.getvalue())
+    assert [n["method"] for n in notifications] == [
+        "textDocument/publishDiagnostics"
+    ] * 2
+    assert notifications[0]["params"]["diagnostics"] == []
+    assert len(notifications[1]["params"]["diagnostics"]) == 1
+
+
+def test_diagnostics_are_published_for_affected_documents() -> None:
+    out_stream = io.BytesIO()
+    server = LanguageServer(in_stream=io.BytesIO(), out_stream=out_stream)
+    server.ctx.load_document("file:///use.dl", "edge(1, 2).\nnode(1).\n")
+    server.ctx.load_document("file:///other.dl", ".decl other(x: number)\n")
+    open_document(server, "file:///decl.dl", ".decl edge(x: number, y: number)\n")
+    insert_line(server, "file:///decl.dl", 1, ".decl node(x: number, y: number)\n")
+    server.publish_pending_diagnostics()
+    # Documents that do not use the edited declarations are not recomputed,
+    # and unchanged diagnostics are not published again.
+    insert_line(server, "file:///decl.dl", 2, ".decl unused(x: number)\n")
+    assert "file:///other.dl" not in server.ctx.stale_uris
+    assert "file:///other.dl" in server.ctx.diagnostics
+    server.publish_pending_diagnostics()
+
+    notifications = decode_messages(out_stream.getvalue())
+    published = [
+        (n["params"]["uri"], len(n["params"]["diagnostics"])) for n in notifications
+    ]
+    assert published == [("file:///decl.dl", 0), ("file:///use.dl", 1)]
+
+
+def test_incoming_messages_are_recorded() -> None:
+    messages: list[dict] = [
+        {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+        {"jsonrpc": "2.0", "method": "exit"},
+    ]
+    trace_stream = io.StringIO()
+    server = LanguageServer(
+        in_stream=io.BytesIO(encode_messages(messages)),
+        out_stream=io.BytesIO(),
+        trace_stream=trace_stream,
+    )
+    server.serve()
+    assert [json.loads(line) for line in trace_stream.getvalue().splitlines()] == (
+        messages
+    )
+
+
+def test_stats_request() -> None:
+    messages = [
+        {
+            "jsonrpc": "2.0",
+            "id": 0,
+            "method": "initialize",
+            "params": {"processId": None, "capabilities": {}},
+        },
+        {"jsonrpc": "2.0", "id": 1, "method": "$/souffle/stats"},
+    ]
+    out_stream = io.BytesIO()
+    server = LanguageServer(
+        in_stream=io.BytesIO(encode_messages(messages)), out_stream=out_stream
+    )
+    server.serve()
+
+    response = decode_messages(out_stream.getvalue())[1]
+    assert response["id"] == 1
+    assert response["result"]["timers"]["message.initialize"]["count"] >= 1
+    assert response["result"]["timers"]["rpc.serialize"]["count"] >= 1
+
+
+@pytest.mark.parametrize(
+    ("client_encodings", "encoding"),
+    [
+        pytest.param(None, "utf-16", id="not given"),
+        pytest.param(["utf-16"], "utf-16", id="utf-16 only"),
+        pytest.param(["utf-16", "utf-32"], "utf-32", id="utf-32 over utf-16"),
+        pytest.param(["utf-16", "utf-8"], "utf-8", id="utf-8 preferred"),
+    ],
+)
+def test_position_encoding_is_negotiated(
+    client_encodings: list[str] | None, encoding: str
+) -> None:
+    capabilities: dict = {}
+    if client_encodings is not None:
+        capabilities["general"] = {"positionEncodings": client_encodings}
+    messages = [
+        {
+            "jsonrpc": "2.0",
+            "id": 0,
+            "method": "initialize",
+            "params": {"processId": None, "capabilities": capabilities},
+        },
+    ]
+    out_stream = io.BytesIO()
+    server = LanguageServer(
+        in_stream=io.BytesIO(encode_messages(messages)), out_stream=out_stream
+    )
+    server.serve()
+
+    response = decode_messages(out_stream.getvalue())[0]
+    assert response["result"]["capabilities"]["positionEncoding"] == encoding
+    assert server.ctx.position_encoding == encoding
+
+
+def test_completion_item_resolve_request() -> None:
+    out_stream = io.BytesIO()
+    server = LanguageServer(in_stream=io.BytesIO(), out_stream=out_stream)
+    server.ctx.load_document("file:///main.dl", "/// Edges.\n.decl edge(x: number)\n")
+    server.process_incoming_message(
+        {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "completionItem/resolve",
+            "params": {"label": "edge", "data": ["r", "edge"]},
+        }
+    )
+    (response,) = decode_messages(out_stream.getvalue())
+    assert response["id"] == 1
+    assert response["result"]["label"] == "edge"
+    assert "Edges." in json.dumps(response["result"]["documentation"])
+
+
+def test_due_diagnostics_are_published_while_messages_are_queued() -> None:
+    uri = "file:///main.dl"
+    out_stream = io.BytesIO()
+    server = LanguageServer(
+        in_stream=io.BytesIO(), out_stream=out_stream, diagnostics_delay=0
+    )
+    open_document(server, uri, ".decl A(x: number)\n")
+    position = {"line": 1, "character": 0}
+    server.incoming_messages.put(
+        {
+            "jsonrpc": "2.0",
+            "method": "textDocument/didChange",
+            "params": {
+                "textDocument": {"uri": uri, "version": 1},
+                "contentChanges": [
+                    {"range": {"start": position, "end": position}, "text": "A(1, 2)."}
+                ],
+            },
+        }
+    )
+    server.incoming_messages.put(
+        {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "textDocument/hover",
+            "params": {"textDocument": {"uri": uri}, "position": position},
+        }
+    )
+    # The queue never runs empty before the server stops.
+    server.incoming_messages.put(None)
+    server.process_incoming_messages()
+
+    notifications = [
+        message
+        for message in decode_messages(out_stream.getvalue())
+        if message.get("method") == "textDocument/publishDiagnostics"
+    ]
+    assert len(notifications[-1]["params"]["diagnostics"]) == 1
+
+
+def test_diagnostics_of_closed_documents_outside_of_the_workspace_are_cleared() -> None:
+    out_stream = io.BytesIO()
+    server = LanguageServer(in_stream=io.BytesIO(), out_stream=out_stream)
+    open_document(server, "untitled:1", ".decl edge(x: number)\nedge(1, 2).\n")
+    server.process_incoming_message(
+        {
+            "jsonrpc": "2.0",
+            "method": "textDocument/didClose",
+            "params": {"textDocument": {"uri": "untitled:1"}},
+        }
+    )
+
+    notifications = decode_messages(out_stream.getvalue())
+    published = [
+        (n["params"]["uri"], len(n["params"]["diagnostics"])) for n in notifications
+    ]
+    assert published == [("untitled:1", 1), ("untitled:1", 0)]
+    assert not server.ctx.workspace.has_document("untitled:1")
+
+
+def test_watched_files_are_registered() -> None:
+    out_stream = io.BytesIO()
+    server = LanguageServer(in_stream=io.BytesIO(), out_stream=out_stream)
+    messages: list[dict] = [
+        {
+            "jsonrpc": "2.0",
+            "id": 0,
+            "method": "initialize",
+            "params": {
+                "processId": None,
+                "rootUri": None,
+                "capabilities": {
+                    "workspace": {
+                        "didChangeWatchedFiles": {"dynamicRegistration": True}
+                    }
+                },
+            },
+        },
+        {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+    ]
+    for message in messages:
+        server.process_incoming_message(message)
+
+    request = decode_messages(out_stream.getvalue())[1]
+    assert request["method"] == "client/registerCapability"
+    registration = request["params"]["registrations"][0]
+    assert registration["method"] == "workspace/didChangeWatchedFiles"
+    assert registration["registerOptions"] == {"watchers": [{"globPattern": "**/*.dl"}]}
@@ -1,7 +1,12 @@
 import pytest
+from lsprotocol.types import PositionEncodingKind
 
 from souffle_analyzer.sourceutil import (
+    BRACKET_PAIRS,
+    LexicalIndex,
+    LineIndex,
     get_consecutive_block_at_line,
+    get_point_after_insertion,
     get_words_in_consecutive_block_at_line,
 )
 from tests.util.helper import clean_multiline_string
@@ -113,3 +118,104 @@ def test_get_words_in_consecutive_block_at_line(
 ) -> None:
     code = clean_multiline_string(code)
     assert get_words_in_consecutive_block_at_line(code, line_no) == words
+
+
+@pytest.mark.parametrize(
+    ("code", "line_no", "char_no", "offset"),
+    [
+        pytest.param("foo\nbar", 0, 0, 0, id="beginning of file"),
+        pytest.param("foo\nbar", 1, 2, 6, id="second line"),
+        pytest.param("foo\nbar", 1, 3, 7, id="end of file"),
+        pytest.param("foo\nbar", 0, 9, 3, id="past the end of the line"),
+        pytest.param("foo\nbar\n", 2, 0, 8, id="after trailing newline"),
+        pytest.param("foo\n", 5, 0, 4, id="past the end of file"),
+        pytest.param("é\nüx", 1, 1, 5, id="multi-byte characters"),
+    ],
+)
+def test_line_index_get_byte_offset(
+    code: str, line_no: int, char_no: int, offset: int
+) -> None:
+    line_index = LineIndex.from_code(code.encode())
+    assert line_index.get_byte_offset(line_no, char_no, PositionEncodingKind.Utf32) == (
+        offset
+    )
+
+
+@pytest.mark.parametrize(
+    ("encoding", "columns"),
+    [
+        pytest.param(PositionEncodingKind.Utf8, [0, 1, 3, 7, 8], id="utf-8"),
+        pytest.param(PositionEncodingKind.Utf16, [0, 1, 2, 4, 5], id="utf-16"),
+        pytest.param(PositionEncodingKind.Utf32, [0, 1, 2, 3, 4], id="utf-32"),
+    ],
+)
+def test_line_index_columns(encoding: PositionEncodingKind, columns: list[int]) -> None:
+    # The characters of the second line take 1, 2 and 4 bytes in UTF-8, and
+    # the last one is a surrogate pair in UTF-16.
+    code = "ab\naé😀b\n".encode()
+    byte_columns = [0, 1, 3, 7, 8]
+    line_index = LineIndex.from_code(code)
+    for byte_column, column in zip(byte_columns, columns):
+        assert line_index.get_column(1, byte_column, encoding) == column
+        assert line_index.get_byte_column(1, column, encoding) == byte_column
+        assert line_index.get_position(3 + byte_column, encoding) == (1, column)
+
+
+def test_line_index_utf16_column_inside_surrogate_pair() -> None:
+    line_index = LineIndex.from_code("😀b".encode())
+    assert line_index.get_byte_column(0, 1, PositionEncodingKind.Utf16) == 0
+
+
+@pytest.mark.parametrize(
+    ("start_point", "inserted", "end_point"),
+    [
+        pytest.param((1, 2), "", (1, 2), id="empty insertion"),
+        pytest.param((1, 2), "abc", (1, 5), id="single line"),
+        pytest.param((1, 2), "a\nbc", (2, 2), id="multiple lines"),
+        pytest.param((1, 2), "a\né", (2, 2), id="multi-byte characters"),
+    ],
+)
+def test_get_point_after_insertion(
+    start_point: tuple[int, int],
+    inserted: str,
+    end_point: tuple[int, int],
+) -> None:
+    assert get_point_after_insertion(start_point, inserted.encode()) == end_point
+
+
+def get_naive_bracket_depth(code: str, offset: int, pair: tuple[str, str]) -> int:
+    return code[:offset].count(pair[0]) - code[:offset].count(pair[1])
+
+
+def get_naive_before_token(code: str, offset: int) -> str:
+    words = code[:offset].split()
+    if code[:offset] and not code[offset - 1].isspace():
+        words = words[:-1]
+    return words[-1] if words else ""
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "",
+        "path(x, y) :- edge(x, z), path(z, y).\n",
+        ".type E = A {x: number} | B {r: [a: number, b: T]}\n\n.decl e(x: E)\n",
+        "e(1, (2 + 3)).\n  )( }{ ][\n",
+    ],
+)
+def test_lexical_index(code: str) -> None:
+    index = LexicalIndex.from_code(code)
+    for offset in range(len(code) + 1):
+        for pair in BRACKET_PAIRS:
+            assert index.brackets[pair[0]].get_depth(offset) == (
+                get_naive_bracket_depth(code, offset, pair)
+            )
+        assert index.get_before_token(offset) == get_naive_before_token(code, offset)
+
+
+def test_lexical_index_offsets() -> None:
+    index = LexicalIndex.from_code("ab\n\ncd\n")
+    assert index.get_offset(0, 1) == 1
+    assert index.get_offset(2, 1) == 5
+    assert index.get_offset(3, 0) == 7
+    assert index.get_offset(9, 0) == 7
@@ -0,0 +1,115 @@
+import os
+
+import lsprotocol.types as lsptypes
+import pytest
+
+from souffle_analyzer.analysis import AnalysisContext
+from souffle_analyzer.printer import format_souffle_ast
+
+
+def make_change(
+    start: tuple[int, int],
+    end: tuple[int, int],
+    text: str,
+) -> lsptypes.TextDocumentContentChangePartial:
+    return lsptypes.TextDocumentContentChangePartial(
+        range=lsptypes.Range(
+            start=lsptypes.Position(line=start[0], character=start[1]),
+            end=lsptypes.Position(line=end[0], character=end[1]),
+        ),
+        text=text,
+    )
+
+
+@pytest.mark.parametrize(
+    ("filename", "changes", "replacement"),
+    [
+        pytest.param(
+            "example1.dl",
+            [make_change((0, 0), (0, 0), "// header\n")],
+            ("/* A is", "// header\n/* A is"),
+            id="insert at beginning",
+        ),
+        pytest.param(
+            "example1.dl",
+            [make_change((1, 0), (3, 0), "")],
+            (
+                "/* A is a relation. */\n.decl A(x: number, y: number)\n\n/**",
+                "/* A is a relation. */\n/**",
+            ),
+            id="delete lines",
+        ),
+        pytest.param(
+            "example1.dl",
+            [
+                make_change((0, 0), (0, 0), ".decl foo(x: number)\n"),
+                make_change((1, 0), (1, 0), "foo(1).\n"),
+            ],
+            ("/* A is", ".decl foo(x: number)\nfoo(1).\n/* A is"),
+            id="consecutive changes",
+        ),
+        pytest.param(
+            "types2.dl",
+            [make_change((2, 3), (2, 5), "é\nü")],
+            ("\n          | Add", "\n   é\nü     | Add"),
+            id="replace with multi-line non-ascii text",
+        ),
+    ],
+)
+def test_incremental_change_matches_full_sync(
+    test_data_dir: str,
+    filename: str,
+    changes: list[lsptypes.TextDocumentContentChangePartial],
+    replacement: tuple[str, str],
+) -> None:
+    # The expected text replaces the first occurrence of a snippet, which
+    # does not depend on how positions are converted.
+    with open(os.path.join(test_data_dir, filename)) as f:
+        code = f.read()
+    old, new = replacement
+    assert old in code
+    expected_code = code.replace(old, new, 1)
+
+    ctx = AnalysisContext()
+    ctx.sync_document(filename, code)
+    ctx.update_document(filename, changes)
+    ctx.sync_workspace()
+    incremental = ctx.workspace.documents[filename]
+    assert incremental.code == expected_code
+
+    expected_ctx = AnalysisContext()
+    expected_ctx.sync_document(filename, expected_code)
+    expected = expected_ctx.workspace.documents[filename]
+
+    assert format_souffle_ast(incremental) == format_souffle_ast(expected)
+
+
+def test_whole_document_change_replaces_text() -> None:
+    ctx = AnalysisContext()
+    ctx.sync_document("main.dl", ".decl foo(x: number)\n")
+    ctx.update_document(
+        "main.dl",
+        [lsptypes.TextDocumentContentChangeWholeDocument(text=".decl bar()\n")],
+    )
+    assert ctx.workspace.documents["main.dl"].code == ".decl bar()\n"
+
+
+@pytest.mark.parametrize(
+    "encoding",
+    [
+        lsptypes.PositionEncodingKind.Utf8,
+        lsptypes.PositionEncodingKind.Utf16,
+        lsptypes.PositionEncodingKind.Utf32,
+    ],
+)
+def test_change_columns_use_position_encoding(
+    encoding: lsptypes.PositionEncodingKind,
+) -> None:
+    # The symbol takes 4 bytes, 2 UTF-16 code units and 1 code point.
+    width = {"utf-8": 4, "utf-16": 2, "utf-32": 1}[encoding.value]
+    ctx = AnalysisContext(position_encoding=encoding)
+    ctx.sync_document("main.dl", '.decl A(s: symbol)\nA("😀x").\n')
+    ctx.update_document("main.dl", [make_change((1, 3 + width), (1, 4 + width), "yz")])
+    assert ctx.workspace.documents["main.dl"].code == (
+        '.decl A(s: symbol)\nA("😀yz").\n'
+    )
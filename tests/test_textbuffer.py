@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from souffle_analyzer import textbuffer
+from souffle_analyzer.textbuffer import TextBuffer
+
+
+def read_all(buffer: TextBuffer) -> bytes:
+    chunks: list[bytes] = []
+    while chunk := buffer.read(sum(len(chunk) for chunk in chunks), None):
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def test_edits_match_bytes() -> None:
+    rng = random.Random(0)
+    code = "path(x, y) :- edge(x, z), path(z, y).\n".encode()
+    buffer = TextBuffer.from_bytes(code)
+    for _ in range(200):
+        start = rng.randint(0, len(code))
+        end = rng.randint(start, min(start + 5, len(code)))
+        inserted = rng.choice(["", "a", "é\n", "x(1).\n"]).encode()
+        code = code[:start] + inserted + code[end:]
+        buffer = buffer.edit(start, end, inserted)
+        assert len(buffer) == len(code)
+        assert buffer.to_bytes() == code
+        assert read_all(buffer) == code
+        assert code.isascii() or not buffer.is_ascii()
+        assert buffer.get_line_starts() == [0] + [
+            i + 1 for i, c in enumerate(code) if c == ord("\n")
+        ]
+        i = rng.randint(0, len(code))
+        j = rng.randint(i, len(code))
+        assert buffer.get_bytes(i, j) == code[i:j]
+
+
+def test_edit_leaves_previous_buffer_unchanged() -> None:
+    buffer = TextBuffer.from_bytes(b"abc")
+    edited = buffer.edit(1, 2, b"xyz")
+    edited.edit(0, 1, b"")
+    assert buffer.to_bytes() == b"abc"
+    assert buffer.is_original()
+    assert edited.to_bytes() == b"axyzc"
+    assert not edited.is_original()
+
+
+def test_consecutive_insertions_extend_one_piece() -> None:
+    buffer = TextBuffer.from_bytes(b"ab")
+    for i, char in enumerate(b"xyz", start=1):
+        buffer = buffer.edit(i, i, bytes([char]))
+    assert buffer.to_bytes() == b"axyzb"
+    assert len(buffer.pieces) == 3
+
+
+def test_many_pieces_are_compacted(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(textbuffer, "MAX_PIECES", 4)
+    buffer = TextBuffer.from_bytes(b"abcdef")
+    for i in range(0, 6, 2):
+        buffer = buffer.edit(i, i + 1, b"X")
+    assert buffer.to_bytes() == b"XbXdXf"
+    assert buffer.is_original()
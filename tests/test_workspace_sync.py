@@ -0,0 +1,104 @@
+from pathlib import Path
+
+from souffle_analyzer.analysis import AnalysisContext
+from souffle_analyzer.ast import Disjunction, RelationReferenceClause, TypeDeclaration
+
+
+def get_first_body_atom(ctx: AnalysisContext, uri: str):
+    rule = ctx.workspace.documents[uri].rules[0]
+    disjunction = rule.body.inner
+    assert isinstance(disjunction, Disjunction)
+    clause = disjunction.conjunctions[0].clauses[0].inner
+    assert isinstance(clause, RelationReferenceClause)
+    return clause.relation_reference.inner
+
+
+def test_edit_re_resolves_dependent_documents() -> None:
+    ctx = AnalysisContext()
+    ctx.load_document("decl.dl", ".type Id <: number\n.decl edge(x: Id, y: Id)\n")
+    ctx.load_document("use.dl", ".decl path(x: number)\npath(x) :- edge(x, _).\n")
+    ctx.sync_workspace()
+
+    ctx.sync_document("decl.dl", ".type Id <: number\n.decl edge(a: Id, b: Id)\n")
+
+    atom = get_first_body_atom(ctx, "use.dl")
+    declaration = atom.name.inner.declaration
+    assert declaration is ctx.workspace.documents["decl.dl"].relation_declarations[0]
+    assert isinstance(atom.arguments[0].ty, TypeDeclaration)
+    assert (
+        atom.arguments[0].ty is ctx.workspace.documents["decl.dl"].type_declarations[0]
+    )
+
+
+def test_new_declaration_resolves_previously_unresolved_reference() -> None:
+    ctx = AnalysisContext()
+    ctx.sync_document("use.dl", ".decl path(x: number)\npath(x) :- edge(x, _).\n")
+    assert get_first_body_atom(ctx, "use.dl").name.inner.declaration is None
+
+    ctx.sync_document("decl.dl", ".decl edge(x: number, y: number)\n")
+
+    assert get_first_body_atom(ctx, "use.dl").name.inner.declaration is not None
+
+
+def test_removed_document_unresolves_references() -> None:
+    ctx = AnalysisContext()
+    ctx.load_document("decl.dl", ".decl edge(x: number, y: number)\n")
+    ctx.sync_document("use.dl", ".decl path(x: number)\npath(x) :- edge(x, _).\n")
+
+    ctx.stale_uris |= ctx.workspace.remove_document("decl.dl")
+    ctx.sync_workspace()
+
+    assert get_first_body_atom(ctx, "use.dl").name.inner.declaration is None
+
+
+def test_unrelated_edit_does_not_mark_other_documents_stale() -> None:
+    ctx = AnalysisContext()
+    ctx.load_document("a.dl", ".decl a(x: number)\n")
+    ctx.load_document("b.dl", ".decl b(x: number)\nb(x) :- a(x).\n")
+    ctx.sync_workspace()
+
+    ctx.load_document("c.dl", ".decl c(x: number)\n")
+
+    assert ctx.stale_uris == {"c.dl"}
+
+
+def test_closed_document_is_read_again_from_disk(tmp_path: Path) -> None:
+    (tmp_path / "a.dl").write_text(".decl edge(x: number, y: number)\n")
+    uri = (tmp_path / "a.dl").as_uri()
+    ctx = AnalysisContext()
+    ctx.load_workspace(tmp_path.as_uri())
+    ctx.open_document(uri, ".decl path(x: number, y: number)\n")
+
+    ctx.close_document(uri)
+
+    assert uri not in ctx.trees
+    assert ctx.workspace.relation_symbols.get_first("edge") is not None
+    assert ctx.workspace.relation_symbols.get_first("path") is None
+
+
+def test_closed_document_outside_of_the_workspace_is_removed() -> None:
+    ctx = AnalysisContext()
+    ctx.sync_document("untitled:1", ".decl edge(x: number, y: number)\n")
+
+    ctx.close_document("untitled:1")
+
+    assert "untitled:1" not in ctx.workspace.documents
+    assert ctx.workspace.relation_symbols.get_first("edge") is None
+
+
+def test_deleted_file_unresolves_references(tmp_path: Path) -> None:
+    (tmp_path / "decl.dl").write_text(".decl edge(x: number, y: number)\n")
+    (tmp_path / "use.dl").write_text(".decl path(x: number)\npath(x) :- edge(x, _).\n")
+    ctx = AnalysisContext()
+    ctx.load_workspace(tmp_path.as_uri())
+    use_uri = (tmp_path / "use.dl").as_uri()
+    ctx.build_document(use_uri)
+    ctx.sync_workspace()
+    assert get_first_body_atom(ctx, use_uri).name.inner.declaration is not None
+
+    (tmp_path / "decl.dl").unlink()
+    ctx.load_file((tmp_path / "decl.dl").as_uri())
+    ctx.sync_workspace()
+
+    assert not ctx.workspace.has_document((tmp_path / "decl.dl").as_uri())
+    assert get_first_body_atom(ctx, use_uri).name.inner.declaration is None